@@ -4,6 +4,8 @@ OUTPUT_FILE=$1
 
 touch $OUTPUT_FILE
 
+python3 -m torch2trt.test --unit || exit 1
+
 echo "| Name | Data Type | Input Shapes | torch2trt kwargs | Max Error | Throughput (PyTorch) | Throughput (TensorRT) | Latency (PyTorch) | Latency (TensorRT) |" >> $OUTPUT_FILE
 echo "|------|-----------|--------------|------------------|-----------|----------------------|-----------------------|-------------------|--------------------|" >> $OUTPUT_FILE
 
@@ -1,5 +1,11 @@
 from .torch2trt import *
 from .converters import *
+from .replicas import *
+from .arena import *
+from .archive import *
+from .coverage import *
+from .partition import *
+from .precision import *
 import tensorrt as trt
 
 
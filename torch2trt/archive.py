@@ -0,0 +1,235 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tensorrt as trt
+from .torch2trt import TRTModule
+from .file_lock import locked
+from .compatibility import compute_capability, check_compatibility
+
+
+# file layout: header | engine | record | engine | record ... , the header points to the last index record,
+# each record holds the entries it adds (None for a removed name) and points to the previous record
+ARCHIVE_MAGIC = b'T2TARCH3'
+ARCHIVE_HEADER = struct.Struct('<8sQQQ')  # magic, last record offset, last record size, generation
+ENGINE_ALIGNMENT = max(4096, mmap.ALLOCATIONGRANULARITY)  # engines can be mapped on their own
+
+
+def _align(offset, alignment=ENGINE_ALIGNMENT):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def engine_bindings(engine):
+    bindings = []
+    for i in range(engine.num_bindings):
+        bindings.append({
+            'name': engine.get_binding_name(i),
+            'is_input': engine.binding_is_input(i),
+            'shape': list(engine.get_binding_shape(i)),
+            'dtype': str(engine.get_binding_dtype(i)),
+        })
+    return bindings
+
+
+def _read_header(f):
+    f.seek(0)
+    magic, index_offset, index_size, generation = ARCHIVE_HEADER.unpack(f.read(ARCHIVE_HEADER.size))
+    if magic != ARCHIVE_MAGIC:
+        raise RuntimeError('%s is not a torch2trt engine archive' % f.name)
+    return index_offset, index_size, generation
+
+
+def _read_index(f):
+    """Returns the index and generation of the archive, replaying its records from the first"""
+    offset, size, generation = _read_header(f)
+    records = []
+    while size > 0:
+        f.seek(offset)
+        record = json.loads(f.read(size).decode('utf-8'))
+        records.append(record['entries'])
+        offset, size = record['previous'] or (0, 0)
+    index = {}
+    for entries in reversed(records):
+        for name, entry in entries.items():
+            if entry is None:
+                index.pop(name, None)
+            else:
+                index[name] = entry
+    return index, generation
+
+
+def _record_bytes(entries, previous):
+    return json.dumps({'previous': previous, 'entries': entries}).encode('utf-8')
+
+
+def _write_record(f, entries, offset, generation, previous=None):
+    data = _record_bytes(entries, previous)
+    f.seek(offset)
+    f.write(data)
+    f.flush()
+    os.fsync(f.fileno())
+    # the header is updated last, a crash leaves the previous record as the last one
+    f.seek(0)
+    f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, offset, len(data), generation))
+    f.flush()
+
+
+def _compacted_size(index):
+    """Size of the archive holding only the engines of index"""
+    offset = ARCHIVE_HEADER.size
+    for entry in index.values():
+        offset = _align(offset) + entry['size']
+    return offset + len(_record_bytes(index, None))
+
+
+class EngineArchive(object):
+    """Many serialized engines in one file, with an index read once and engines mapped on demand.
+
+    Each index entry holds the TensorRT version, GPU architecture, bindings,
+    input / output names, metadata, byte range and sha256 checksum of an engine.
+    Appending writes the engine and an index record with only its entry after the end
+    of the file, so appends and removes don't rewrite the index. Reading the index
+    replays every record since the last compact(), and entries that were replaced or
+    removed keep their bytes until compact() rewrites the file with a single record.
+    Every write bumps the generation in the header, load() and verify() re-read the
+    index when another process changed the archive (or compact() replaced the file).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            with locked(path), open(path, 'wb') as f:
+                f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, 0, 0, 0))
+        self.reload()
+
+    def reload(self):
+        """Reads the index, e.g. after another process appended to the archive"""
+        with open(self.path, 'rb') as f:
+            self._refresh(f, force=True)
+
+    def _refresh(self, f, force=False):
+        # f stays open while engines are mapped from it, compact() replaces the file but not its contents
+        with locked(self.path):
+            self._update_index(f, force)
+
+    def _update_index(self, f, force=False):
+        """Re-reads the index if the archive changed, the caller holds the lock"""
+        version = (os.fstat(f.fileno()).st_ino, _read_header(f)[2])
+        if force or version != self.version:
+            self.index = _read_index(f)[0]
+            self.version = version
+
+    def _append_record(self, f, entries, offset):
+        """Writes a record after the last one and updates the index, the caller holds the lock"""
+        self._update_index(f)
+        last_offset, last_size, generation = _read_header(f)
+        previous = [last_offset, last_size] if last_size > 0 else None
+        _write_record(f, entries, offset, generation + 1, previous)
+        index = dict(self.index)
+        for name, entry in entries.items():
+            if entry is None:
+                del index[name]
+            else:
+                index[name] = entry
+        self.index, self.version = index, (os.fstat(f.fileno()).st_ino, generation + 1)
+
+    def names(self):
+        return list(self.index.keys())
+
+    def info(self, name):
+        return self.index[name]
+
+    def append(self, name, module_trt):
+        """Adds the engine of a TRTModule under name, replacing an entry with the same name"""
+        data = bytes(module_trt.engine.serialize())
+        entry = {
+            'tensorrt_version': trt.__version__,
+            'gpu_architecture': compute_capability(),
+            'bindings': engine_bindings(module_trt.engine),
+            'input_names': module_trt.input_names,
+            'output_names': module_trt.output_names,
+            'refit_map': module_trt.refit_map,
+            'metadata': module_trt.metadata,
+            'size': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+        }
+
+        with locked(self.path), open(self.path, 'r+b') as f:
+            entry['offset'] = _align(f.seek(0, os.SEEK_END))
+            f.seek(entry['offset'])
+            f.write(data)
+            self._append_record(f, {name: entry}, entry['offset'] + entry['size'])
+
+    def remove(self, name):
+        with locked(self.path), open(self.path, 'r+b') as f:
+            self._update_index(f)
+            if name not in self.index:
+                raise KeyError(name)
+            self._append_record(f, {name: None}, f.seek(0, os.SEEK_END))
+
+    def _map(self, name):
+        """Returns the index entry and a read only map of the bytes of an engine"""
+        with open(self.path, 'rb') as f:
+            self._refresh(f)
+            entry = self.index[name]
+            return entry, mmap.mmap(f.fileno(), entry['size'], offset=entry['offset'], access=mmap.ACCESS_READ)
+
+    def verify(self, name):
+        """Returns True if the engine bytes match the checksum of the index"""
+        entry, engine_map = self._map(name)
+        try:
+            return hashlib.sha256(engine_map).hexdigest() == entry['sha256']
+        finally:
+            engine_map.close()
+
+    def load(self, name, verify=False, arena=None):
+        """Maps and deserializes one engine, returns a TRTModule"""
+        entry, engine_map = self._map(name)
+        problems = check_compatibility({
+            'tensorrt_version': entry['tensorrt_version'],
+            'compute_capability': entry['gpu_architecture'],
+        })
+        if len(problems) > 0:
+            engine_map.close()
+            raise RuntimeError('Engine %s in %s can not run here (%s)' % (name, self.path, ', '.join(problems)))
+
+        try:
+            if verify and hashlib.sha256(engine_map).hexdigest() != entry['sha256']:
+                raise RuntimeError('Checksum mismatch for engine %s in %s' % (name, self.path))
+            with trt.Logger() as logger, trt.Runtime(logger) as runtime:
+                engine = runtime.deserialize_cuda_engine(engine_map)
+        finally:
+            engine_map.close()
+
+        if engine is None:
+            raise RuntimeError('Failed to deserialize engine %s from %s' % (name, self.path))
+        module_trt = TRTModule(engine, entry['input_names'], entry['output_names'], entry['refit_map'], arena=arena)
+        module_trt.metadata = entry['metadata']
+        return module_trt
+
+    def garbage_bytes(self):
+        """Bytes compact() would reclaim, alignment padding of the live engines is not garbage"""
+        self.reload()
+        return os.path.getsize(self.path) - _compacted_size(self.index)
+
+    def compact(self):
+        """Rewrites the archive with only the live engines"""
+        tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+        with locked(self.path):
+            with open(self.path, 'rb') as src:
+                index, generation = _read_index(src)
+                with open(tmp_path, 'wb') as dst:
+                    dst.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, 0, 0, 0))
+                    offset = ARCHIVE_HEADER.size
+                    for entry in index.values():
+                        src.seek(entry['offset'])
+                        data = src.read(entry['size'])
+                        entry['offset'] = _align(offset)
+                        dst.seek(entry['offset'])
+                        dst.write(data)
+                        offset = entry['offset'] + entry['size']
+                    _write_record(dst, index, offset, generation + 1)
+                    version = (os.fstat(dst.fileno()).st_ino, generation + 1)
+            os.replace(tmp_path, self.path)
+        self.index, self.version = index, version
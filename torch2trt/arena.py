@@ -0,0 +1,190 @@
+import threading
+import weakref
+from contextlib import contextmanager
+import torch
+
+
+# TensorRT needs the device memory of an execution context aligned to 256 bytes
+ARENA_ALIGNMENT = 256
+
+
+def _align(size, alignment=ARENA_ALIGNMENT):
+    return (size + alignment - 1) // alignment * alignment
+
+
+def plan_slots(sizes, max_concurrent, alignment=ARENA_ALIGNMENT):
+    """Returns the (offset, size) of the arena slots for engines needing sizes bytes.
+
+    Any max_concurrent of the engines can run at once: slot i is as large as the
+    i-th largest engine, so the arena is the size of the largest concurrent set.
+
+    >>> plan_slots([1000], 4)
+    [(0, 1024)]
+    """
+    slot_sizes = sorted((_align(size, alignment) for size in sizes), reverse=True)[:max_concurrent]
+    slots = []
+    offset = 0
+    for size in slot_sizes:
+        slots.append((offset, size))
+        offset += size
+    return slots
+
+
+class SlotPool(object):
+    """Hands out arena slots, blocking while no free slot is large enough.
+
+    Each request gets the smallest free slot that fits it, which keeps the
+    large slots for the large engines. The pool only does bookkeeping, so it can
+    be driven without a GPU.
+
+    >>> pool = SlotPool(plan_slots([1000, 300, 5000], 2))
+    >>> small = pool.acquire(300)
+    >>> small
+    (5120, 1024)
+    >>> large = pool.acquire(5000)
+    >>> large
+    (0, 5120)
+    >>> pool.acquire(300, timeout=0.01) is None
+    True
+    >>> pool.release(small)
+    >>> pool.acquire(1000)
+    (5120, 1024)
+    """
+
+    def __init__(self, slots):
+        self.slots = list(slots)
+        self.free = list(slots)
+        self.condition = threading.Condition()
+
+    def _fitting_slot(self, size):
+        fitting = [slot for slot in self.free if slot[1] >= size]
+        if len(fitting) == 0:
+            return None
+        return min(fitting, key=lambda slot: slot[1])
+
+    def acquire(self, size, timeout=None):
+        """Returns a free slot of at least size bytes, None if none was released before timeout"""
+        if not any(slot[1] >= size for slot in self.slots):
+            raise ValueError('No arena slot can hold %d bytes' % size)
+        with self.condition:
+            if not self.condition.wait_for(lambda: self._fitting_slot(size) is not None, timeout):
+                return None
+            slot = self._fitting_slot(size)
+            self.free.remove(slot)
+            return slot
+
+    def release(self, slot):
+        with self.condition:
+            self.free.append(slot)
+            self.condition.notify_all()
+
+
+class DeviceMemoryArena(object):
+    """Scratch device memory shared by the execution contexts of several TRTModules.
+
+    Attached modules create their contexts without device memory and borrow a
+    slot of the arena for each call. The arena holds max_concurrent slots, sized
+    for the largest attached engines, and calls beyond that wait for a slot.
+    A slot is handed to the next call after an event recorded on the stream of the
+    previous one, so calls on different streams don't overwrite each other.
+    Modules are held weakly, the slots are re-planned once a collected or
+    detached module changes the sizes and no call is in flight. Attaching or
+    detaching waits for the calls in flight, and holds back new calls meanwhile.
+    A thread must not attach or detach inside a call of its own, it would wait for itself.
+    """
+
+    def __init__(self, max_concurrent=1, device=None):
+        self.max_concurrent = max_concurrent
+        self.device = torch.device('cuda') if device is None else torch.device(device)
+        self.sizes = weakref.WeakKeyDictionary()  # attached module -> device memory it needs
+        self.buffer = None
+        self.pool = None
+        self.planned_sizes = None
+        self.events = {}
+        self.active = 0  # calls that hold or wait for a slot
+        self.pending = 0  # attach / detach calls waiting for the calls in flight
+        self.condition = threading.Condition()
+
+    def _wait_idle(self, timeout):
+        """Waits, holding the condition, until no call uses the arena. New calls wait for the pending change."""
+        self.pending += 1
+        try:
+            if not self.condition.wait_for(lambda: self.active == 0, timeout):
+                raise RuntimeError('Timed out waiting for the calls using the arena to finish')
+        finally:
+            self.pending -= 1
+            self.condition.notify_all()
+
+    def attach(self, module, engine=None, timeout=None):
+        """Replaces the execution context of module by one of engine (module.engine by default) that borrows memory from the arena.
+
+        Waits until no call uses the arena, raises RuntimeError if that takes longer than timeout seconds.
+        """
+        engine = module.engine if engine is None else engine
+        with self.condition:
+            self._wait_idle(timeout)
+            self.sizes[module] = engine.device_memory_size
+        module.arena = self
+        module.context = engine.create_execution_context_without_device_memory()
+        return module
+
+    def detach(self, module, timeout=None):
+        """Gives module back an execution context with its own device memory, waits like attach"""
+        with self.condition:
+            self._wait_idle(timeout)
+            if module not in self.sizes:
+                raise ValueError('The module is not attached to this arena')
+            del self.sizes[module]
+        module.arena = None
+        module.context = module.engine.create_execution_context()
+        return module
+
+    def plan(self):
+        """Returns the (offset, size) slots for the attached modules"""
+        return plan_slots(self.sizes.values(), self.max_concurrent)
+
+    def _allocate(self):
+        # calls on other streams may still use the old buffer
+        for event in self.events.values():
+            event.synchronize()
+        slots = self.plan()
+        total = sum(size for _, size in slots)
+        self.buffer = None
+        self.buffer = torch.empty(total + ARENA_ALIGNMENT, dtype=torch.uint8, device=self.device)
+        self.base_ptr = _align(self.buffer.data_ptr())
+        self.pool = SlotPool(slots)
+        self.planned_sizes = sorted(self.sizes.values())
+        self.events = {}
+
+    @property
+    def size(self):
+        """Bytes of device memory held by the arena"""
+        return 0 if self.buffer is None else self.buffer.numel()
+
+    @contextmanager
+    def reserve(self, module):
+        """Yields the device pointer of a slot for one call of module"""
+        with self.condition:
+            if module not in self.sizes:
+                raise ValueError('The module is not attached to this arena')
+            self.condition.wait_for(lambda: self.pending == 0)
+            if self.active == 0 and self.planned_sizes != sorted(self.sizes.values()):
+                self._allocate()
+            self.active += 1
+            pool = self.pool
+            size = self.sizes[module]
+
+        try:
+            slot = pool.acquire(size)
+            stream = torch.cuda.current_stream(self.device)
+            if slot in self.events:
+                stream.wait_event(self.events[slot])
+            try:
+                yield self.base_ptr + slot[0]
+            finally:
+                self.events[slot] = stream.record_event()
+                pool.release(slot)
+        finally:
+            with self.condition:
+                self.active -= 1
+                self.condition.notify_all()
@@ -0,0 +1,58 @@
+import tensorrt as trt
+import torch
+
+
+def compute_capability():
+    if not torch.cuda.is_available():
+        return None
+    return '%d.%d' % torch.cuda.get_device_capability()
+
+
+def runtime_environment():
+    """Returns the versions and device an engine is built or deserialized with"""
+    return {
+        'tensorrt_version': trt.__version__,
+        'torch_version': torch.__version__,
+        'compute_capability': compute_capability(),
+    }
+
+
+def build_metadata(builder_flags, profiles):
+    """Returns the metadata stamped on a built engine"""
+    metadata = runtime_environment()
+    metadata['device_name'] = torch.cuda.get_device_name() if torch.cuda.is_available() else None
+    metadata['builder_flags'] = builder_flags
+    metadata['profiles'] = profiles
+    return metadata
+
+
+def _release(version):
+    return version.split('.')[:3]  # engines need the same major.minor.patch release
+
+
+def check_compatibility(metadata, environment=None):
+    """Returns why an engine built with metadata can't be deserialized in environment, an empty list if it can.
+
+    Metadata without a field, e.g. from engines saved before it was recorded, is not checked.
+
+    >>> environment = {'tensorrt_version': '8.6.1.6', 'torch_version': '2.1.0', 'compute_capability': '8.6'}
+    >>> check_compatibility(dict(environment, torch_version='2.0.1', tensorrt_version='8.6.1'), environment)
+    []
+    >>> check_compatibility(dict(environment, tensorrt_version='8.5.3.1', compute_capability='7.5'), environment)
+    ['built with TensorRT 8.5.3.1, running 8.6.1.6', 'built for compute capability 7.5, running on 8.6']
+    >>> check_compatibility({}, environment)
+    []
+    """
+    if environment is None:
+        environment = runtime_environment()
+
+    problems = []
+    built_version = metadata.get('tensorrt_version', None)
+    if built_version is not None and _release(built_version) != _release(environment['tensorrt_version']):
+        problems.append('built with TensorRT %s, running %s' % (built_version, environment['tensorrt_version']))
+
+    built_capability = metadata.get('compute_capability', None)
+    if built_capability is not None and built_capability != environment['compute_capability']:
+        problems.append('built for compute capability %s, running on %s' % (built_capability, environment['compute_capability']))
+
+    return problems
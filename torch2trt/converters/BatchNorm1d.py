@@ -13,8 +13,8 @@ def convert_BatchNorm1d(ctx):
     input_trt = trt_(ctx.network, input)
     output = ctx.method_return
     
-    scale = module.weight.detach().cpu().numpy() / np.sqrt(module.running_var.detach().cpu().numpy() + module.eps)
-    bias = module.bias.detach().cpu().numpy() - module.running_mean.detach().cpu().numpy() * scale
+    scale = ctx.get_weight(module.weight) / np.sqrt(ctx.get_weight(module.running_var) + module.eps)
+    bias = ctx.get_weight(module.bias) - ctx.get_weight(module.running_mean) * scale
     power = np.ones_like(scale)
     
     # reshape to 2D
@@ -26,7 +26,7 @@ def convert_BatchNorm1d(ctx):
             layer.reshape_dims = (input.shape[1], input.shape[2], 1)
     else:
         input_shape_trt = ctx.network.add_shape(input_trt).get_output(0)
-        one_trt = trt_(ctx.network, torch.tensor([1],dtype=torch.int32).to(input.device))
+        one_trt = trt_(ctx.network, torch.tensor([1],dtype=torch.int32))
         if len(input.shape)==2:
             new_input_shape_trt = ctx.network.add_concatenation([input_shape_trt, one_trt, one_trt]).get_output(0)
         else:
@@ -35,6 +35,12 @@ def convert_BatchNorm1d(ctx):
         layer.set_input(1, new_input_shape_trt)
 
     layer = ctx.network.add_scale(layer.get_output(0), trt.ScaleMode.CHANNEL, bias, scale, power)
+    ctx.add_refit_layer(layer, 'batchnorm', {
+        'weight': module.weight,
+        'bias': module.bias,
+        'running_mean': module.running_mean,
+        'running_var': module.running_var,
+    }, eps=module.eps)
 
     # reshape back to 1D
     conv_out_trt = layer.get_output(0)
@@ -8,11 +8,17 @@ def convert_BatchNorm2d(ctx):
     input_trt = trt_(ctx.network, input)
     output = ctx.method_return
     
-    scale = module.weight.detach().cpu().numpy() / np.sqrt(module.running_var.detach().cpu().numpy() + module.eps)
-    bias = module.bias.detach().cpu().numpy() - module.running_mean.detach().cpu().numpy() * scale
+    scale = ctx.get_weight(module.weight) / np.sqrt(ctx.get_weight(module.running_var) + module.eps)
+    bias = ctx.get_weight(module.bias) - ctx.get_weight(module.running_mean) * scale
     power = np.ones_like(scale)
 
     layer = ctx.network.add_scale(input_trt, trt.ScaleMode.CHANNEL, bias, scale, power)    
+    ctx.add_refit_layer(layer, 'batchnorm', {
+        'weight': module.weight,
+        'bias': module.bias,
+        'running_mean': module.running_mean,
+        'running_var': module.running_var,
+    }, eps=module.eps)
 
 
     output._trt = layer.get_output(0)
\ No newline at end of file
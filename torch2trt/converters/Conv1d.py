@@ -18,11 +18,11 @@ def convert_Conv1d(ctx):
     padding = (module.padding[0], 0)
     dilation = (module.dilation[0], 1)
 
-    kernel = module.weight.detach().cpu().numpy()[..., None]
+    kernel = ctx.get_weight(module.weight)[..., None]
     
     bias = trt.Weights(torch_dtype_to_trt(module.weight.dtype))
     if module.bias is not None:
-        bias = module.bias.detach().cpu().numpy()
+        bias = ctx.get_weight(module.bias)
         
     # reshape to 2D
     if not support_dynamic_shape:
@@ -30,7 +30,7 @@ def convert_Conv1d(ctx):
         layer.reshape_dims = (-1, input.shape[-1], 1)
     else:
         input_shape_trt = ctx.network.add_shape(input_trt).get_output(0)
-        one_trt = trt_(ctx.network, torch.tensor([1],dtype=torch.int32).to(input.device))
+        one_trt = trt_(ctx.network, torch.tensor([1],dtype=torch.int32))
         new_input_shape_trt = ctx.network.add_concatenation([input_shape_trt, one_trt]).get_output(0)
         layer = ctx.network.add_shuffle(input_trt)
         layer.set_input(1, new_input_shape_trt)
@@ -48,6 +48,8 @@ def convert_Conv1d(ctx):
 
     if module.groups is not None:
         layer.num_groups = module.groups
+
+    ctx.add_refit_layer(layer, 'kernel_bias', {'weight': module.weight, 'bias': module.bias})
         
     # reshape back to 1D
     conv_out_trt = layer.get_output(0)
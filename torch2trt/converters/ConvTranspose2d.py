@@ -20,11 +20,11 @@ def convert_ConvTranspose2d(ctx):
     if not isinstance(padding, tuple):
         padding = (padding, ) * 2
         
-    kernel = module.weight.detach().cpu().numpy()
+    kernel = ctx.get_weight(module.weight)
     
     bias = trt.Weights(torch_dtype_to_trt(module.weight.dtype))
     if module.bias is not None:
-        bias = module.bias.detach().cpu().numpy()
+        bias = ctx.get_weight(module.bias)
 
     layer = ctx.network.add_deconvolution(
         input=input_trt,
@@ -38,4 +38,6 @@ def convert_ConvTranspose2d(ctx):
     if module.groups is not None:
         layer.num_groups = module.groups
 
+    ctx.add_refit_layer(layer, 'kernel_bias', {'weight': module.weight, 'bias': module.bias})
+
     output._trt = layer.get_output(0)
\ No newline at end of file
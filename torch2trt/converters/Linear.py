@@ -3,6 +3,36 @@ from torch2trt.module_test import add_module_test
 import torch
 
 
+# inputs with at least this many rows (product of the leading dims) use a matrix multiply
+LINEAR_GEMM_MIN_ROWS = 64
+
+
+def _use_matrix_multiply(input_trt):
+    shape = tuple(input_trt.shape)
+    if len(shape) < 3:
+        return False
+    rows = 1
+    for d in shape[:-1]:
+        if d < 0:
+            return True  # dynamic token dimensions are expected to be large
+        rows *= d
+    return rows >= LINEAR_GEMM_MIN_ROWS
+
+
+def convert_Linear_matrix_multiply(ctx, module, input_trt):
+    ndims = len(input_trt.shape)
+
+    weight_trt = ctx.get_constant(module.weight, (1,) * (ndims - 2) + tuple(module.weight.shape))
+    layer = ctx.network.add_matrix_multiply(
+        input_trt, trt.MatrixOperation.NONE, weight_trt, trt.MatrixOperation.TRANSPOSE)
+
+    if module.bias is not None:
+        bias_trt = ctx.get_constant(module.bias, (1,) * (ndims - 1) + tuple(module.bias.shape))
+        layer = ctx.network.add_elementwise(layer.get_output(0), bias_trt, trt.ElementWiseOperation.SUM)
+
+    return layer.get_output(0)
+
+
 @tensorrt_converter('torch.nn.Linear.forward')
 def convert_Linear(ctx):
     module = ctx.method_args[0]
@@ -10,6 +40,10 @@ def convert_Linear(ctx):
     input_trt = trt_(ctx.network, input)
     output = ctx.method_return
 
+    if _use_matrix_multiply(input_trt):
+        output._trt = convert_Linear_matrix_multiply(ctx, module, input_trt)
+        return
+
     ### reshape to ...xNx1x1
     layer = ctx.network.add_shuffle(input_trt)
     layer.reshape_dims = (0,)*len(input_trt.shape) + (1, 1) 
@@ -17,14 +51,15 @@ def convert_Linear(ctx):
     ### add fully connected
     bias = trt.Weights(torch_dtype_to_trt(module.weight.dtype))
     if module.bias is not None:
-        bias = module.bias.detach().cpu().numpy()
+        bias = ctx.get_weight(module.bias)
     
     layer = ctx.network.add_convolution(
         input=layer.get_output(0),
         num_output_maps=module.out_features,
         kernel_shape=(1, 1),
-        kernel=module.weight.detach().cpu().numpy(),
+        kernel=ctx.get_weight(module.weight),
         bias=bias)
+    ctx.add_refit_layer(layer, 'kernel_bias', {'weight': module.weight, 'bias': module.bias})
 
     # layer = ctx.network.add_fully_connected(
     #     input=layer.get_output(0),
@@ -53,3 +88,31 @@ def test_Linear_basic():
 @add_module_test(torch.float32, torch.device('cuda'), [(1, 3, 4, 10)])
 def test_Linear_no_bias():
     return torch.nn.Linear(10, 5, bias=False)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(1, 64, 10)])
+@add_module_test(torch.float32, torch.device('cuda'), [(1, 128, 10)])
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 8, 8, 10)])
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 8, 16, 10)])
+@add_module_test(torch.float16, torch.device('cuda'), [(1, 128, 10)], fp16_mode=True)
+def test_Linear_matrix_multiply():
+    return torch.nn.Linear(10, 5)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(1, 64, 10)])
+@add_module_test(torch.float32, torch.device('cuda'), [(1, 128, 10)])
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 8, 8, 10)])
+def test_Linear_matrix_multiply_no_bias():
+    return torch.nn.Linear(10, 5, bias=False)
+
+
+# dynamic leading dims always take the matrix multiply, even below LINEAR_GEMM_MIN_ROWS
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 64, 10)], opt_shape_param=[[[1, 64, 10], [2, 64, 10], [4, 64, 10]]])
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 3, 10)], opt_shape_param=[[[1, 3, 10], [2, 3, 10], [4, 3, 10]]])
+def test_Linear_matrix_multiply_dynamic():
+    return torch.nn.Linear(10, 5)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 64, 10)], opt_shape_param=[[[1, 64, 10], [2, 64, 10], [4, 64, 10]]])
+def test_Linear_matrix_multiply_dynamic_no_bias():
+    return torch.nn.Linear(10, 5, bias=False)
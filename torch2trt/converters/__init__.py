@@ -24,6 +24,7 @@ from .identity import *
 from .Identity import *
 from .instance_norm import *
 from .Linear import *
+from .attention import *
 from .LogSoftmax import *
 from .max_pool2d import *
 from .max import *
@@ -55,6 +56,8 @@ from .matmul import *
 from .interpolate_custom import *
 from .topk import *
 from .index_select import *
+from .gather import *
+from .nms import *
 from .addcmul import *
 from .conv2d import *
 from .view_as import *
@@ -64,12 +67,12 @@ from .flatten import *
 from .stack import *
 from .pixel_shuffle import *
 from .LayerNorm import *
+from .GroupNorm import *
 from .exview import *
 from .size import *
 
 try:
     # custom plugin support
-    from .GroupNorm import *
     from .repeat import *
 except:
     print("plugin not found.")
@@ -0,0 +1,329 @@
+from torch2trt.torch2trt import *
+from torch2trt.module_test import add_module_test
+from .Linear import convert_Linear_matrix_multiply
+import numpy as np
+
+
+def _shuffle(ctx, input_trt, first_transpose=None, reshape_dims=None, second_transpose=None):
+    layer = ctx.network.add_shuffle(input_trt)
+    if first_transpose is not None:
+        layer.first_transpose = first_transpose
+    if reshape_dims is not None:
+        layer.reshape_dims = reshape_dims
+    if second_transpose is not None:
+        layer.second_transpose = second_transpose
+    return layer.get_output(0)
+
+
+def _prepend_ones(ctx, input_trt, count):
+    """Adds count leading unit dims, dynamic dims are kept as placeholders"""
+    ndims = len(input_trt.shape)
+    if count <= 0:
+        return input_trt
+    return _shuffle(ctx, input_trt,
+                    reshape_dims=(0,) * (ndims - 1) + (-1,) + (1,) * count,
+                    second_transpose=tuple(range(ndims, ndims + count)) + tuple(range(ndims)))
+
+
+def _additive_mask(ctx, mask, dtype, keep_value):
+    """Returns a TensorRT tensor to add to the attention scores, boolean masks become 0 / -inf"""
+    if mask.dtype in (torch.bool, torch.uint8):
+        if hasattr(mask, '_trt'):
+            # the traced values would be baked into the engine as a constant
+            raise RuntimeError('Boolean attention masks computed in the network are not supported, pass a float mask.')
+        # host values, the mask may be a meta stand-in of a buffer under meta tracing
+        mask = torch.zeros(mask.shape, dtype=dtype).masked_fill(
+            torch.from_numpy(ctx.get_weight(mask)).bool() != keep_value, float('-inf'))
+    return trt_(ctx.network, mask)
+
+
+def _int_constant(ctx, values):
+    values = np.array(values, dtype=np.int32)
+    return ctx.network.add_constant(values.shape, values).get_output(0)
+
+
+def _linspace(ctx, shape_trts, delta):
+    """Fills a tensor of the concatenated shape with 0 + sum(index * delta)"""
+    layer = ctx.network.add_fill((1,) * len(delta), trt.FillOperation.LINSPACE)
+    layer.set_input(0, ctx.network.add_concatenation(shape_trts).get_output(0))
+    layer.set_input(1, ctx.network.add_constant((), np.zeros((), dtype=np.float32)).get_output(0))
+    delta = np.array(delta, dtype=np.float32)
+    layer.set_input(2, ctx.network.add_constant(delta.shape, delta).get_output(0))
+    return layer.get_output(0)
+
+
+def _causal_mask(ctx, q_trt, k_trt, dtype):
+    """Returns the (L, S) additive causal mask, built from the shapes when a sequence length is dynamic"""
+    length, source_length = q_trt.shape[-2], k_trt.shape[-2]
+    if length >= 0 and source_length >= 0:
+        mask = torch.ones((length, source_length), dtype=torch.bool).tril()
+        return _additive_mask(ctx, mask, dtype, keep_value=True)
+
+    # (L, 1) row and (1, S) column indices, the columns after the row are masked
+    length_trt = tensor_trt_get_shape_trt(ctx.network, q_trt, len(q_trt.shape) - 2, 1)
+    source_length_trt = tensor_trt_get_shape_trt(ctx.network, k_trt, len(k_trt.shape) - 2, 1)
+    one_trt = _int_constant(ctx, [1])
+    rows_trt = _linspace(ctx, [length_trt, one_trt], [1, 0])
+    columns_trt = _linspace(ctx, [one_trt, source_length_trt], [0, 1])
+    masked_trt = ctx.network.add_elementwise(
+        columns_trt, rows_trt, trt.ElementWiseOperation.GREATER).get_output(0)
+
+    zero_trt, minus_inf_trt = trt_(ctx.network, torch.zeros((1, 1), dtype=dtype),
+                                   torch.full((1, 1), float('-inf'), dtype=dtype))
+    return ctx.network.add_select(masked_trt, minus_inf_trt, zero_trt).get_output(0)
+
+
+def _add_attention_projection(ctx, module, input_trt, roles):
+    """One GEMM computing the projections of all roles that read input_trt"""
+    ndims = len(input_trt.shape)
+    embed_dim = module.embed_dim
+    scale = float(embed_dim // module.num_heads) ** -0.5
+
+    if module._qkv_same_embed_dim:
+        weights = dict((role, module.in_proj_weight) for role in roles)
+    else:
+        weights = dict((role, getattr(module, role + '_proj_weight')) for role in roles)
+
+    # q is scaled on the host instead of scaling the scores
+    weight = pack_projection_weights(
+        dict((role, ctx.get_weight(w)) for role, w in weights.items()), roles, embed_dim, scale)
+    weight_layer = ctx.network.add_constant((1,) * (ndims - 2) + weight.shape, weight)
+    ctx.add_refit_layer(weight_layer, 'attention_projection', weights,
+                        roles=roles, embed_dim=embed_dim, scale=scale)
+    layer = ctx.network.add_matrix_multiply(
+        input_trt, trt.MatrixOperation.NONE, weight_layer.get_output(0), trt.MatrixOperation.TRANSPOSE)
+
+    if module.in_proj_bias is not None:
+        biases = dict((role, module.in_proj_bias) for role in roles)
+        bias = pack_projection_weights(
+            dict((role, ctx.get_weight(b)) for role, b in biases.items()), roles, embed_dim, scale)
+        bias_layer = ctx.network.add_constant((1,) * (ndims - 1) + bias.shape, bias)
+        ctx.add_refit_layer(bias_layer, 'attention_projection', biases,
+                            roles=roles, embed_dim=embed_dim, scale=scale)
+        layer = ctx.network.add_elementwise(
+            layer.get_output(0), bias_layer.get_output(0), trt.ElementWiseOperation.SUM)
+
+    return layer.get_output(0)
+
+
+def _select_heads(ctx, heads_trt, index, count):
+    """Takes (1, N, H, L, D) from the stacked (count, N, H, L, D) projections"""
+    if count == 1:
+        return heads_trt
+    indices = np.array([index], dtype=np.int32)
+    indices_trt = ctx.network.add_constant(indices.shape, indices).get_output(0)
+    return ctx.network.add_gather(heads_trt, indices_trt, 0).get_output(0)
+
+
+def _is_MultiheadAttention_supported(ctx):
+    module = ctx.method_args[0]
+    return module.bias_k is None and not module.add_zero_attn
+
+
+@tensorrt_converter('torch.nn.MultiheadAttention.forward', is_supported=_is_MultiheadAttention_supported)
+def convert_MultiheadAttention(ctx):
+    module = ctx.method_args[0]
+    query = get_arg(ctx, 'query', pos=1, default=None)
+    key = get_arg(ctx, 'key', pos=2, default=None)
+    value = get_arg(ctx, 'value', pos=3, default=None)
+    key_padding_mask = get_arg(ctx, 'key_padding_mask', pos=4, default=None)
+    need_weights = get_arg(ctx, 'need_weights', pos=5, default=True)
+    attn_mask = get_arg(ctx, 'attn_mask', pos=6, default=None)
+    average_attn_weights = get_arg(ctx, 'average_attn_weights', pos=7, default=True)
+    outputs = ctx.method_return
+
+    if not _is_MultiheadAttention_supported(ctx):
+        print('Warning: %s with add_bias_kv or add_zero_attn is not supported, it is not converted.' % ctx.method_str)
+        ctx.unsupported_methods.append(ctx.method_str)
+        return
+
+    batch_first = getattr(module, 'batch_first', False)
+    num_heads = module.num_heads
+    head_dim = module.embed_dim // num_heads
+    dtype = query.dtype
+
+    # project inputs shared by several roles with a single GEMM, self attention is one QKV GEMM
+    inputs = [query, key, value]
+    heads = [None] * 3
+    for i in range(3):
+        if heads[i] is not None:
+            continue
+        group = [j for j in range(i, 3) if inputs[j] is inputs[i]]
+        roles = ''.join('qkv'[j] for j in group)
+
+        input_trt = trt_(ctx.network, inputs[i])
+        projection_trt = _add_attention_projection(ctx, module, input_trt, roles)
+
+        # (L, N, G*E) -> (G, N, H, L, D)
+        heads_trt = _shuffle(ctx, projection_trt,
+                             reshape_dims=(0, 0, len(group), num_heads, head_dim),
+                             second_transpose=(2, 0, 3, 1, 4) if batch_first else (2, 1, 3, 0, 4))
+        for index, j in enumerate(group):
+            heads[j] = _select_heads(ctx, heads_trt, index, len(group))
+    q_trt, k_trt, v_trt = heads
+
+    # (1, N, H, L, S)
+    scores_trt = ctx.network.add_matrix_multiply(
+        q_trt, trt.MatrixOperation.NONE, k_trt, trt.MatrixOperation.TRANSPOSE).get_output(0)
+
+    if attn_mask is not None:
+        mask_trt = _additive_mask(ctx, attn_mask, dtype, keep_value=False)
+        if len(attn_mask.shape) == 3:
+            # (N*H, L, S) -> (N, H, L, S)
+            mask_trt = _shuffle(ctx, mask_trt, first_transpose=(1, 2, 0),
+                                reshape_dims=(0, 0, -1, num_heads), second_transpose=(2, 3, 0, 1))
+        mask_trt = _prepend_ones(ctx, mask_trt, 5 - len(mask_trt.shape))
+        scores_trt = ctx.network.add_elementwise(
+            scores_trt, mask_trt, trt.ElementWiseOperation.SUM).get_output(0)
+
+    if key_padding_mask is not None:
+        # (N, S) -> (1, N, 1, 1, S)
+        mask_trt = _additive_mask(ctx, key_padding_mask, dtype, keep_value=False)
+        mask_trt = _prepend_ones(ctx, _shuffle(ctx, mask_trt, reshape_dims=(0, 1, 1, -1)), 1)
+        scores_trt = ctx.network.add_elementwise(
+            scores_trt, mask_trt, trt.ElementWiseOperation.SUM).get_output(0)
+
+    layer = ctx.network.add_softmax(scores_trt)
+    layer.axes = 1 << 4
+    probs_trt = layer.get_output(0)
+
+    # (1, N, H, L, D) -> (L, N, E)
+    attn_trt = ctx.network.add_matrix_multiply(
+        probs_trt, trt.MatrixOperation.NONE, v_trt, trt.MatrixOperation.NONE).get_output(0)
+    attn_trt = _shuffle(ctx, attn_trt,
+                        first_transpose=(1, 3, 2, 4, 0) if batch_first else (3, 1, 2, 4, 0),
+                        reshape_dims=(0, 0, -1))
+    outputs[0]._trt = convert_Linear_matrix_multiply(ctx, module.out_proj, attn_trt)
+
+    if need_weights and outputs[1] is not None:
+        if average_attn_weights:
+            # (1, N, L, S) -> (N, L, S)
+            weights_trt = ctx.network.add_reduce(
+                probs_trt, trt.ReduceOperation.AVG, 1 << 2, False).get_output(0)
+            outputs[1]._trt = _shuffle(ctx, weights_trt, first_transpose=(1, 2, 3, 0), reshape_dims=(0, 0, -1))
+        else:
+            outputs[1]._trt = _shuffle(ctx, probs_trt, first_transpose=(1, 2, 3, 4, 0), reshape_dims=(0, 0, 0, -1))
+
+
+@tensorrt_converter('torch.nn.functional.scaled_dot_product_attention')
+def convert_scaled_dot_product_attention(ctx):
+    query = get_arg(ctx, 'query', pos=0, default=None)
+    key = get_arg(ctx, 'key', pos=1, default=None)
+    value = get_arg(ctx, 'value', pos=2, default=None)
+    attn_mask = get_arg(ctx, 'attn_mask', pos=3, default=None)
+    is_causal = get_arg(ctx, 'is_causal', pos=5, default=False)
+    scale = get_arg(ctx, 'scale', pos=6, default=None)
+    output = ctx.method_return
+
+    if scale is None:
+        scale = float(int(query.shape[-1])) ** -0.5
+
+    q_trt, k_trt, v_trt = trt_(ctx.network, query, key, value)
+    ndims = len(q_trt.shape)
+
+    # scale q, it is smaller than the scores
+    _, scale_trt = trt_(ctx.network, query, scale)
+    q_trt = ctx.network.add_elementwise(q_trt, scale_trt, trt.ElementWiseOperation.PROD).get_output(0)
+
+    scores_trt = ctx.network.add_matrix_multiply(
+        q_trt, trt.MatrixOperation.NONE, k_trt, trt.MatrixOperation.TRANSPOSE).get_output(0)
+
+    mask_trt = None
+    if is_causal:
+        mask_trt = _causal_mask(ctx, q_trt, k_trt, query.dtype)
+    elif attn_mask is not None:
+        mask_trt = _additive_mask(ctx, attn_mask, query.dtype, keep_value=True)
+
+    if mask_trt is not None:
+        mask_trt = _prepend_ones(ctx, mask_trt, ndims - len(mask_trt.shape))
+        scores_trt = ctx.network.add_elementwise(
+            scores_trt, mask_trt, trt.ElementWiseOperation.SUM).get_output(0)
+
+    layer = ctx.network.add_softmax(scores_trt)
+    layer.axes = 1 << (ndims - 1)
+
+    output._trt = ctx.network.add_matrix_multiply(
+        layer.get_output(0), trt.MatrixOperation.NONE, v_trt, trt.MatrixOperation.NONE).get_output(0)
+
+
+class SelfAttention(torch.nn.Module):
+    def __init__(self, embed_dim, num_heads, need_weights=True):
+        super(SelfAttention, self).__init__()
+        self.attention = torch.nn.MultiheadAttention(embed_dim, num_heads)
+        self.need_weights = need_weights
+
+    def forward(self, x):
+        output, weights = self.attention(x, x, x, need_weights=self.need_weights)
+        if weights is None:
+            return output
+        return output, weights
+
+
+class CrossAttention(torch.nn.Module):
+    def __init__(self, embed_dim, num_heads, kdim=None):
+        super(CrossAttention, self).__init__()
+        self.attention = torch.nn.MultiheadAttention(embed_dim, num_heads, kdim=kdim, vdim=kdim)
+
+    def forward(self, x, memory):
+        return self.attention(x, memory, memory, need_weights=False)[0]
+
+
+class MaskedSelfAttention(torch.nn.Module):
+    def __init__(self, embed_dim, num_heads, length):
+        super(MaskedSelfAttention, self).__init__()
+        self.attention = torch.nn.MultiheadAttention(embed_dim, num_heads)
+        self.register_buffer('mask', torch.ones(length, length, dtype=torch.bool).triu(1))
+
+    def forward(self, x):
+        return self.attention(x, x, x, attn_mask=self.mask, need_weights=False)[0]
+
+
+class ScaledDotProductAttention(torch.nn.Module):
+    def __init__(self, is_causal=False):
+        super(ScaledDotProductAttention, self).__init__()
+        self.is_causal = is_causal
+
+    def forward(self, q, k, v):
+        return torch.nn.functional.scaled_dot_product_attention(q, k, v, is_causal=self.is_causal)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(16, 1, 64)])
+@add_module_test(torch.float32, torch.device('cuda'), [(16, 2, 64)])
+def test_MultiheadAttention_self():
+    return SelfAttention(64, 8)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(16, 2, 64)])
+def test_MultiheadAttention_self_no_weights():
+    return SelfAttention(64, 8, need_weights=False)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(16, 2, 64), (20, 2, 64)])
+def test_MultiheadAttention_cross():
+    return CrossAttention(64, 8)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(16, 2, 64), (20, 2, 32)])
+def test_MultiheadAttention_cross_kdim():
+    return CrossAttention(64, 8, kdim=32)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(16, 2, 64)])
+def test_MultiheadAttention_masked():
+    return MaskedSelfAttention(64, 8, 16)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 8, 16, 32), (2, 8, 20, 32), (2, 8, 20, 32)])
+def test_scaled_dot_product_attention():
+    return ScaledDotProductAttention()
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 8, 16, 32), (2, 8, 16, 32), (2, 8, 16, 32)])
+def test_scaled_dot_product_attention_causal():
+    return ScaledDotProductAttention(is_causal=True)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 8, 16, 32), (2, 8, 16, 32), (2, 8, 16, 32)],
+                 opt_shape_param=[[[2, 8, 8, 32], [2, 8, 16, 32], [2, 8, 32, 32]]] * 3)
+def test_scaled_dot_product_attention_causal_dynamic_length():
+    return ScaledDotProductAttention(is_causal=True)
@@ -3,6 +3,11 @@ from torch2trt.module_test import add_module_test
 from .split import convert_split
 
 
+def _int_constant(ctx, values):
+    values = np.array(values, dtype=np.int32)
+    return ctx.network.add_constant(values.shape, values).get_output(0)
+
+
 @tensorrt_converter('torch.chunk')
 @tensorrt_converter('torch.Tensor.chunk')
 def convert_chunk(ctx):
@@ -14,89 +19,78 @@ def convert_chunk(ctx):
         convert_split(ctx)
         return
 
-    # https://github.com/pytorch/pytorch/blob/b90fc52c687a6851047f18ec9d06fb998efe99dd/aten/src/ATen/native/TensorShape.cpp
-
     input = get_arg(ctx, 'input', 0, None)
     input_trt = trt_(ctx.network, input)
     chunks = get_arg(ctx, 'chunks', 1, 0)
     dim = get_arg(ctx, 'dim', 2, 0)
     outputs = ctx.method_return
+    # torch.chunk may return fewer chunks than requested, e.g. 6 split in 4
+    num_outputs = len(outputs)
+
+    input_dim = len(input_trt.shape)
+    if dim < 0:
+        dim = input_dim + dim
 
-    if len(outputs)!=chunks:
+    if all(d >= 0 for d in input_trt.shape):
         convert_split(ctx)
         return
 
     input_shape_trt = tensor_trt_get_shape_trt(ctx.network, input_trt)
     head_shape_trt = slice_shape_trt(ctx.network, input_shape_trt, 0, dim)
-    chunk_shape_trt = slice_shape_trt(ctx.network, input_shape_trt, dim, 1, 1)
     tail_shape_trt = slice_shape_trt(ctx.network, input_shape_trt, dim+1)
 
-    chunk_trt = trt_(ctx.network, int(chunks))
-    one_trt = trt_(ctx.network, 1)
-    zero_trt = trt_(ctx.network, 0)
+    def chunk_shape(chunk_dim_trt):
+        shape_trt = [chunk_dim_trt]
+        if head_shape_trt is not None:
+            shape_trt = [head_shape_trt] + shape_trt
+        if tail_shape_trt is not None:
+            shape_trt = shape_trt + [tail_shape_trt]
+        return ctx.network.add_concatenation(shape_trt).get_output(0)
+
+    if input_trt.shape[dim] >= 0:
+        # static chunk dim, static starts and only the sizes follow the other dims
+        dim_size = input_trt.shape[dim]
+        chunk_size = (dim_size + chunks - 1) // chunks
+        size_trt = chunk_shape(_int_constant(ctx, [chunk_size]))
+        last_size_trt = chunk_shape(_int_constant(ctx, [dim_size - chunk_size * (num_outputs - 1)]))
+
+        for i in range(num_outputs):
+            start = [0] * input_dim
+            start[dim] = i * chunk_size
+            layer = ctx.network.add_slice(input_trt, start, [1]*input_dim, [1]*input_dim)
+            layer.set_input(2, last_size_trt if i == num_outputs - 1 else size_trt)
+            outputs[i]._trt = layer.get_output(0)
+        return
+
+    # https://github.com/pytorch/pytorch/blob/b90fc52c687a6851047f18ec9d06fb998efe99dd/aten/src/ATen/native/TensorShape.cpp
+    chunk_dim_trt = slice_shape_trt(ctx.network, input_shape_trt, dim, 1, 1)
+    chunks_trt = _int_constant(ctx, [chunks])
+    chunks_minus_one_trt = _int_constant(ctx, [chunks - 1])
+    last_index_trt = _int_constant(ctx, [num_outputs - 1])
 
     # chunk 0~n-2
-    chunk_size_trt = ctx.network.add_elementwise(chunk_shape_trt, chunk_trt, trt.ElementWiseOperation.SUM).get_output(0)
-    chunk_size_trt = ctx.network.add_elementwise(chunk_size_trt, one_trt, trt.ElementWiseOperation.SUB).get_output(0)
-    chunk_size_trt = ctx.network.add_elementwise(chunk_size_trt, chunk_trt, trt.ElementWiseOperation.FLOOR_DIV).get_output(0)
-    
+    chunk_size_trt = ctx.network.add_elementwise(chunk_dim_trt, chunks_minus_one_trt, trt.ElementWiseOperation.SUM).get_output(0)
+    chunk_size_trt = ctx.network.add_elementwise(chunk_size_trt, chunks_trt, trt.ElementWiseOperation.FLOOR_DIV).get_output(0)
+
     # chunk n-1
-    chunk_last_trt = ctx.network.add_elementwise(chunk_trt, one_trt, trt.ElementWiseOperation.SUB).get_output(0)
-    chunk_last_trt = ctx.network.add_elementwise(chunk_size_trt, chunk_last_trt, trt.ElementWiseOperation.PROD).get_output(0)
-    chunk_last_trt = ctx.network.add_elementwise(chunk_shape_trt, chunk_last_trt, trt.ElementWiseOperation.SUB).get_output(0)
-
-    stride_trt = ctx.network.add_concatenation([one_trt]*len(input.shape)).get_output(0)
-    if head_shape_trt is not None:
-        head_start_trt = ctx.network.add_concatenation([zero_trt]*dim).get_output(0)
-
-    if tail_shape_trt is not None:
-        tail_start_trt = ctx.network.add_concatenation([zero_trt]*dim).get_output(0)
-
-    start_trt = []
-    size_trt = []
-    chunk_start_trt = zero_trt
-    if head_shape_trt is not None:
-        start_trt.append(head_start_trt)
-        size_trt.append(head_shape_trt)
-    start_trt.append(chunk_start_trt)
-    size_trt.append(chunk_size_trt)
-    if tail_shape_trt is not None:
-        start_trt.append(tail_start_trt)
-        size_trt.append(tail_shape_trt)
-    start_trt = ctx.network.add_concatenation(start_trt).get_output(0)
-    size_trt = ctx.network.add_concatenation(size_trt).get_output(0)
-    
-    input_dim = len(input.shape)
-    for i in range(chunks-1):
+    chunk_last_trt = ctx.network.add_elementwise(chunk_size_trt, last_index_trt, trt.ElementWiseOperation.PROD).get_output(0)
+    chunk_last_trt = ctx.network.add_elementwise(chunk_dim_trt, chunk_last_trt, trt.ElementWiseOperation.SUB).get_output(0)
+
+    # start vectors of all chunks, flattened, from a single product
+    offsets = np.zeros((num_outputs, input_dim), dtype=np.int32)
+    offsets[:, dim] = np.arange(num_outputs)
+    starts_trt = ctx.network.add_elementwise(
+        _int_constant(ctx, offsets.reshape(-1)), chunk_size_trt, trt.ElementWiseOperation.PROD).get_output(0)
+
+    size_trt = chunk_shape(chunk_size_trt)
+    last_size_trt = chunk_shape(chunk_last_trt)
+
+    for i in range(num_outputs):
+        start_trt = ctx.network.add_slice(starts_trt, [i*input_dim], [input_dim], [1]).get_output(0)
         layer = ctx.network.add_slice(input_trt, [0]*input_dim, [1]*input_dim, [1]*input_dim)
         layer.set_input(1, start_trt)
-        layer.set_input(2, size_trt)
-        layer.set_input(3, stride_trt)
+        layer.set_input(2, last_size_trt if i == num_outputs - 1 else size_trt)
         outputs[i]._trt = layer.get_output(0)
-        
-        start_trt = []
-        chunk_start_trt = ctx.network.add_elementwise(chunk_start_trt, chunk_size_trt, trt.ElementWiseOperation.SUM).get_output(0)
-        if head_shape_trt is not None:
-            start_trt.append(head_start_trt)
-        start_trt.append(chunk_start_trt)
-        if tail_shape_trt is not None:
-            start_trt.append(tail_start_trt)
-        start_trt = ctx.network.add_concatenation(start_trt).get_output(0)
-
-    
-    size_trt = []
-    if head_shape_trt is not None:
-        size_trt.append(head_shape_trt)
-    size_trt.append(chunk_last_trt)
-    if tail_shape_trt is not None:
-        size_trt.append(tail_shape_trt)
-    size_trt = ctx.network.add_concatenation(size_trt).get_output(0)
-
-    layer = ctx.network.add_slice(input_trt, [0]*input_dim, [1]*input_dim, [1]*input_dim)
-    layer.set_input(1, start_trt)
-    layer.set_input(2, size_trt)
-    layer.set_input(3, stride_trt)
-    outputs[chunks-1]._trt = layer.get_output(0)
 
 
         
@@ -148,4 +142,9 @@ def test_torch_chunk_3_2():
 
 @add_module_test(torch.float32, torch.device('cuda'), [(1, 3, 3, 3)])
 def test_tensor_chunk_3_2():
-    return TensorChunk(3, 2)
\ No newline at end of file
+    return TensorChunk(3, 2)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(1, 6, 4)], opt_shape_param=[[[1, 6, 4], [2, 6, 4], [4, 6, 4]]])
+def test_torch_chunk_uneven_dynamic():
+    return TorchChunk(4, 1)
@@ -1,5 +1,6 @@
 from torch2trt.torch2trt import *
 from torch2trt.module_test import add_module_test
+from functools import lru_cache
 # from torch2trt.plugins import *
 
 # def convert_exview(ctx):
@@ -20,96 +21,152 @@ from torch2trt.module_test import add_module_test
 #     output._trt = custom_layer.get_output(0)
 
 
-def next_symbol_exview(exp, start_pos):
-    if start_pos >= len(exp):
-        print("next_symbol_exview out of range", exp, start_pos)
-        next_pos = start_pos
-        symbol = -1
-        isnumber = False
-        return isnumber, symbol, next_pos
-
-    next_pos = start_pos+1    
-    if exp[start_pos]<'0' or exp[start_pos]>'9':
-        symbol = exp[start_pos]
-        isnumber = False
-        return isnumber, symbol, next_pos
-    
-    symbol = int(exp[start_pos])
-    while next_pos<len(exp) and exp[next_pos]>='0' and exp[next_pos]<='9':
-        symbol = symbol*10 + int(exp[next_pos])
-        next_pos += 1
-    isnumber = True
-    return isnumber, int(symbol), next_pos
-
-def get_value_exview_impl(ctx, exp, inputs, start_pos):
-    if start_pos >= len(exp):
-        print("get_value_exview_impl out of range", exp, start_pos)
-        return None, None
-    
-    isnumber, symbol, next_pos = next_symbol_exview(exp, start_pos)
-
-    if isnumber:
-        return trt_(ctx.network, torch.tensor([symbol],dtype=torch.int32).cuda(0)), next_pos
-    if symbol.isalpha():
-        desc_id = ord(symbol.lower())-ord('a')
-        isnumber, symbol, next_pos = next_symbol_exview(exp, next_pos)
-        if not isnumber:
-            print("wrong expression1:", exp, "with symbol:", symbol)
-            return None, next_pos
-        return ctx.network.add_slice(inputs[desc_id],[symbol],[1],[1]).get_output(0), next_pos
-    elif symbol == '(':
-        result = parse_exview_string_impl(ctx, exp, inputs, start_pos+1)
-        if next_pos>=len(exp) or exp[next_pos]!=')':
-            print("wrong expression2:", exp, "with symbol:", symbol)
-            return None, next_pos
-        return result, next_pos+1
-
+# precedence of the binary operators, all left associative
+EXVIEW_OPERATORS = {'+': 1, '-': 1, '*': 2, '/': 2}
+
+
+def tokenize_exview(exp):
+    tokens = []
+    pos = 0
+    while pos < len(exp):
+        c = exp[pos]
+        if c.isspace():
+            pos += 1
+        elif c.isdigit():
+            end = pos
+            while end < len(exp) and exp[end].isdigit():
+                end += 1
+            tokens.append(('num', int(exp[pos:end])))
+            pos = end
+        elif c.isalpha():
+            end = pos + 1
+            while end < len(exp) and exp[end].isdigit():
+                end += 1
+            if end == pos + 1:
+                raise ValueError('exview: missing dim index after %s in %s' % (c, exp))
+            tokens.append(('dim', ord(c.lower()) - ord('a'), int(exp[pos + 1:end])))
+            pos = end
+        elif c in EXVIEW_OPERATORS or c in '()':
+            tokens.append((c, ))
+            pos += 1
+        else:
+            raise ValueError('exview: unexpected symbol %s in %s' % (c, exp))
+    return tokens
+
+
+def _parse_exview_primary(exp, tokens, pos):
+    if pos >= len(tokens):
+        raise ValueError('exview: unexpected end of %s' % exp)
+    token = tokens[pos]
+    if token[0] in ('num', 'dim'):
+        return token, pos + 1
+    if token[0] == '(':
+        node, pos = _parse_exview_expression(exp, tokens, pos + 1, 1)
+        if pos >= len(tokens) or tokens[pos][0] != ')':
+            raise ValueError('exview: missing ) in %s' % exp)
+        return node, pos + 1
+    raise ValueError('exview: unexpected %s in %s' % (token[0], exp))
+
+
+def _parse_exview_expression(exp, tokens, pos, min_precedence):
+    # precedence climbing
+    lhs, pos = _parse_exview_primary(exp, tokens, pos)
+    while pos < len(tokens) and EXVIEW_OPERATORS.get(tokens[pos][0], 0) >= min_precedence:
+        op = tokens[pos][0]
+        rhs, pos = _parse_exview_expression(exp, tokens, pos + 1, EXVIEW_OPERATORS[op] + 1)
+        lhs = (op, lhs, rhs)
+    return lhs, pos
+
+
+@lru_cache(maxsize=1024)
+def compile_exview(exp):
+    """Compiles a dim expression into a tuple AST, ``a0`` is dim 0 of the first tensor,
+    e.g. ``a0+b1*2`` is ``('+', ('dim', 0, 0), ('*', ('dim', 1, 1), ('num', 2)))``"""
+    tokens = tokenize_exview(exp)
+    node, pos = _parse_exview_expression(exp, tokens, 0, 1)
+    if pos != len(tokens):
+        raise ValueError('exview: unexpected %s in %s' % (tokens[pos][0], exp))
+    return node
+
+
+def _exview_memo(ctx):
+    # shape tensors, literals and sub expressions shared within one conversion
+    if not hasattr(ctx, 'exview_memo'):
+        ctx.exview_memo = {}
+    return ctx.exview_memo
+
+
+def exview_shape_trt(ctx, tensor_trt):
+    memo = _exview_memo(ctx)
+    key = ('shape', tensor_trt.name)
+    if key not in memo:
+        memo[key] = ctx.network.add_shape(tensor_trt).get_output(0)
+    return memo[key]
+
+
+def exview_value_trt(ctx, value):
+    """Values are python ints for static dims and literals, shape tensors otherwise"""
+    if not isinstance(value, int):
+        return value
+    memo = _exview_memo(ctx)
+    key = ('literal', value)
+    if key not in memo:
+        memo[key] = ctx.network.add_constant((1,), np.array([value], dtype=np.int32)).get_output(0)
+    return memo[key]
+
+
+EXVIEW_ELEMENTWISE_OPS = {
+    '+': trt.ElementWiseOperation.SUM,
+    '-': trt.ElementWiseOperation.SUB,
+    '*': trt.ElementWiseOperation.PROD,
+    '/': trt.ElementWiseOperation.FLOOR_DIV,
+}
+
+
+def fold_exview_op(ctx, a, b, op):
+    if isinstance(a, int) and isinstance(b, int):
+        if op == '+':
+            return a + b
+        if op == '-':
+            return a - b
+        if op == '*':
+            return a * b
+        return a // b
+    return ctx.network.add_elementwise(
+        exview_value_trt(ctx, a), exview_value_trt(ctx, b), EXVIEW_ELEMENTWISE_OPS[op]).get_output(0)
+
+
+def evaluate_exview(ctx, node, tensors_shape_trt, tensors_shape=None):
+    """Evaluates an exview AST, folding static dims to python ints"""
+    if node[0] == 'num':
+        return node[1]
+    if node[0] == 'dim':
+        _, desc_id, index = node
+        if tensors_shape is not None and tensors_shape[desc_id][index] >= 0:
+            return int(tensors_shape[desc_id][index])
+
+    memo = _exview_memo(ctx)
+    key = (node, tuple(t.name for t in tensors_shape_trt))
+    if key in memo:
+        return memo[key]
+
+    if node[0] == 'dim':
+        _, desc_id, index = node
+        value = ctx.network.add_slice(tensors_shape_trt[desc_id], [index], [1], [1]).get_output(0)
     else:
-        print("wrong expression3:", exp, "with symbol:", symbol)
-        return None, next_pos
+        op, lhs, rhs = node
+        value = fold_exview_op(ctx,
+                               evaluate_exview(ctx, lhs, tensors_shape_trt, tensors_shape),
+                               evaluate_exview(ctx, rhs, tensors_shape_trt, tensors_shape),
+                               op)
+    memo[key] = value
+    return value
 
-    
-
-def parse_exview_string_impl(ctx, exp, inputs, start_pos):
-    if start_pos >= len(exp):
-        print("parse_exview_string_impl out of range", exp, start_pos)
-        return None, None
-
-    return_value, next_pos = get_value_exview_impl(ctx, exp, inputs, start_pos)
-    if return_value is None:
-        return None, next_pos
-
-    for _ in range(next_pos, len(exp)):
-        isnumber, symbol, next_pos = next_symbol_exview(exp, next_pos)
-
-        chr_sym = str(symbol)
-        if not isnumber and chr_sym==')':
-            next_pos-=1
-            break
-
-        result, next_pos = get_value_exview_impl(ctx, exp, inputs, next_pos)
-
-        elementwise_op = None
-        if chr_sym == "+":
-            elementwise_op = trt.ElementWiseOperation.SUM
-        if chr_sym == "-":
-            elementwise_op = trt.ElementWiseOperation.SUB
-        if chr_sym == "*":
-            elementwise_op = trt.ElementWiseOperation.PROD
-        if chr_sym == "/":
-            elementwise_op = trt.ElementWiseOperation.FLOOR_DIV
-        
-        if elementwise_op is not None:
-            return_value = ctx.network.add_elementwise(return_value, result, elementwise_op).get_output(0)
-        if next_pos>=len(exp):
-            break
-    
-    return return_value, next_pos
 
+def parse_exview_string(ctx, exp, tensors_shape_trt, tensors_shape=None):
+    """Returns a python int if the expression only involves static dims, a shape tensor otherwise"""
+    return evaluate_exview(ctx, compile_exview(exp), tensors_shape_trt, tensors_shape)
 
-def parse_exview_string(ctx, exp, tensors_shape_trt):
-    result, _ = parse_exview_string_impl(ctx, exp, tensors_shape_trt, 0)
-    return result
 
 def convert_exview(ctx):
     input = ctx.method_args[0]
@@ -119,11 +176,16 @@ def convert_exview(ctx):
     tensors_trt = [trt_(ctx.network, t) for t in tensors]
     output = ctx.method_return
 
-    tensors_shape_trt = [ctx.network.add_shape(t).get_output(0) for t in tensors_trt]
+    tensors_shape_trt = [exview_shape_trt(ctx, t) for t in tensors_trt]
+    tensors_shape = [tuple(t.shape) for t in tensors_trt]
     
-    shape_trt = [parse_exview_string(ctx, exp, tensors_shape_trt) for exp in exps]
-    shape_trt = ctx.network.add_concatenation(shape_trt).get_output(0)
+    shape = [parse_exview_string(ctx, exp, tensors_shape_trt, tensors_shape) for exp in exps]
     layer = ctx.network.add_shuffle(input_trt)
-    layer.set_input(1, shape_trt)
+    if all(isinstance(s, int) for s in shape):
+        layer.reshape_dims = tuple(shape)
+    else:
+        shape_trt = [exview_value_trt(ctx, s) for s in shape]
+        shape_trt = ctx.network.add_concatenation(shape_trt).get_output(0)
+        layer.set_input(1, shape_trt)
 
-    output._trt = layer.get_output(0)
\ No newline at end of file
+    output._trt = layer.get_output(0)
@@ -0,0 +1,61 @@
+from torch2trt.torch2trt import *
+from torch2trt.module_test import add_module_test
+
+
+@tensorrt_converter('torch.gather')
+@tensorrt_converter('torch.Tensor.gather')
+def convert_gather(ctx):
+    input = ctx.method_args[0]
+    dim = get_arg(ctx, 'dim', pos=1, default=None)
+    index = get_arg(ctx, 'index', pos=2, default=None)
+    output = ctx.method_return
+
+    assert hasattr(trt, 'GatherMode'), 'torch.gather needs the element gather mode of TensorRT 8.0+'
+    if dim < 0:
+        dim = len(input.shape) + dim
+    if not ctx.support_dynamic_shape:
+        dim -= 1
+
+    input_trt = trt_(ctx.network, input)
+    index_trt = trt_(ctx.network, index)
+
+    layer = ctx.network.add_gather(input_trt, index_trt, dim)
+    layer.mode = trt.GatherMode.ELEMENT
+    output._trt = layer.get_output(0)
+
+
+class GatherTestModule(torch.nn.Module):
+    def __init__(self, dim):
+        super(GatherTestModule, self).__init__()
+        self.dim = dim
+
+    def forward(self, x):
+        index = x.topk(2, dim=self.dim)[1]
+        return torch.gather(x, self.dim, index)
+
+
+class TopkDecodeTestModule(torch.nn.Module):
+    """sigmoid, top-k and gather of the matching boxes, as in detection heads"""
+    def __init__(self, k):
+        super(TopkDecodeTestModule, self).__init__()
+        self.k = k
+
+    def forward(self, logits, boxes):
+        scores, index = logits.sigmoid().topk(self.k, dim=1)
+        return scores, boxes.gather(1, index)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(1, 5, 6)])
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 5, 6)])
+def test_gather_dim1():
+    return GatherTestModule(1)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(1, 5, 6)])
+def test_gather_dim_negative():
+    return GatherTestModule(-1)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(1, 100), (1, 100)])
+def test_topk_decode():
+    return TopkDecodeTestModule(10)
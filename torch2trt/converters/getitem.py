@@ -102,7 +102,8 @@ def convert_tensor_getitem(ctx):
     
     # Step 4 - Add shuffle layer to insert dimensions for 'None' slices and remove dimensions for 'int' slices
     
-    num_non_slice = len([s for s in slices if not isinstance(s, slice)])
+    # index tensors are already gathered to their shape, which may depend on the data (e.g. nms indices)
+    num_non_slice = len([s for e, s in enumerate(slices) if not isinstance(s, slice) and e not in gather_index])
     if num_non_slice > 0:
         layer = ctx.network.add_shuffle(output_trt)
         if support_dynamic_shape:
@@ -1,5 +1,6 @@
 from torch2trt.torch2trt import *
 from torch2trt.module_test import add_module_test
+from .normalization import add_group_norm_plugin, add_normalization
 
 
 def _reshape_1d2d3d(network, x_trt):
@@ -83,13 +84,13 @@ def convert_instance_norm(ctx):
     if not use_input_stats:
         
         # equivalent to batch norm
-        scale = 1.0 / np.sqrt(running_var.detach().cpu().numpy() + eps)
-        offset = -running_mean.detach().cpu().numpy() * scale
+        scale = 1.0 / np.sqrt(ctx.get_weight(running_var) + eps)
+        offset = -ctx.get_weight(running_mean) * scale
         power = np.ones_like(scale)
         
         if weight is not None:
-            scale *= weight.detach().cpu().numpy()
-            offset += bias.detach().cpu().numpy()
+            scale *= ctx.get_weight(weight)
+            offset += ctx.get_weight(bias)
 
         new_input_trt, shape_trt = _reshape_1d2d3d(ctx.network, input_trt)  # reshape if dim!=4
         result_trt = ctx.network.add_scale(new_input_trt, trt.ScaleMode.CHANNEL, offset, scale, power).get_output(0)
@@ -104,33 +105,26 @@ def convert_instance_norm(ctx):
         
     # CASE 2 - USING INPUT STATS
     else:
-        
-        eps_np = np.array([eps], dtype=np.float32)
-        keep_dims = True
+
+        # instance norm is group norm with one group per channel
+        num_channels = int(input.shape[1])
+        result_trt = add_group_norm_plugin(ctx, "instancenorm_" + str(id(output)), input_trt,
+                                           num_channels, num_channels, weight, bias, eps)
+        if result_trt is not None:
+            output._trt = result_trt
+            return
 
         new_input_trt, shape_trt = _reshape_1d2d3d(ctx.network, input_trt)
         # reduce_axes = torch_dim_to_trt_axes(tuple(range(2, input.ndim)))
         reduce_axes = torch_dim_to_trt_axes(tuple(range(2, 4)))
         
-        # compute mean over spatial
-        mean_trt = ctx.network.add_reduce(new_input_trt, trt.ReduceOperation.AVG, reduce_axes, keep_dims).get_output(0)
-        
-        # compute variance over spatial (include eps, to reduce layer count)
-        delta_trt = ctx.network.add_elementwise(new_input_trt, mean_trt, trt.ElementWiseOperation.SUB).get_output(0)
-        var_trt = ctx.network.add_scale(delta_trt, trt.ScaleMode.UNIFORM, np.zeros_like(eps_np), np.ones_like(eps_np), 2 * np.ones_like(eps_np)).get_output(0)
-        var_trt = ctx.network.add_reduce(var_trt, trt.ReduceOperation.AVG, reduce_axes, keep_dims).get_output(0)
-        
-        # compute sqrt(var + eps)
-        var_trt = ctx.network.add_scale(var_trt, trt.ScaleMode.UNIFORM, eps_np, np.ones_like(eps_np), 0.5 * np.ones_like(eps_np)).get_output(0)
-        
-        # compute final result
-        result_trt = ctx.network.add_elementwise(delta_trt, var_trt, trt.ElementWiseOperation.DIV).get_output(0)
+        result_trt = add_normalization(ctx, new_input_trt, reduce_axes, eps)
         
         # compute affine (if applicable)
         if weight is not None:
             
-            weight_np = weight.detach().cpu().numpy()
-            bias_np = bias.detach().cpu().numpy()
+            weight_np = ctx.get_weight(weight)
+            bias_np = ctx.get_weight(bias)
             
             result_trt = ctx.network.add_scale(result_trt, trt.ScaleMode.CHANNEL, bias_np, weight_np, np.ones_like(bias_np)).get_output(0)
             # result_trt = _add_scale_1d2d3d(ctx.network, result_trt, trt.ScaleMode.CHANNEL, bias_np, weight_np, np.ones_like(bias_np), support_dynamic_shape)
@@ -26,7 +26,7 @@ def convert_interpolate(ctx):
         size = None
     
     if isinstance(size, int):
-        size = [size]
+        size = [size]*(len(input.shape)-2)
 
     try:
         mode = get_arg(ctx, 'mode', pos=3, default='nearest')
@@ -43,19 +43,24 @@ def convert_interpolate(ctx):
 
     is_shape_tensor = False
     if size is not None:
+        num_leading = len(input.shape) - len(size)
         for s in size:
             if isinstance(s, IntWarper):
                 is_shape_tensor = True
                 break
+        # batch and channel dims that are dynamic in the profile can't be baked into the output shape
+        for d in input_trt.shape[:num_leading]:
+            if d < 0:
+                is_shape_tensor = True
+                break
 
     if support_dynamic_shape and is_shape_tensor:
-        shape_trt = []
-        size = tuple(input.shape[:(len(input.shape)-len(size))]) + tuple(size)
+        shape_trt = [tensor_trt_get_shape_trt(ctx.network, input_trt, 0, num_leading)]
         for s in size:
             if isinstance(s, IntWarper):
                 shape_trt.append(s._trt)
             else:
-                const_shape_trt = trt_(ctx.network, input.new_tensor([s],dtype=torch.int32))
+                const_shape_trt = trt_(ctx.network, torch.tensor([s],dtype=torch.int32))
                 shape_trt.append(const_shape_trt)
         shape_trt = ctx.network.add_concatenation(shape_trt).get_output(0)
 
@@ -0,0 +1,127 @@
+from torch2trt.torch2trt import *
+from torch2trt.module_test import add_module_test
+
+
+def _scalar_constant(network, value, dtype):
+    return network.add_constant((), np.array([value], dtype=dtype)).get_output(0)
+
+
+def _cast(network, tensor_trt, dtype):
+    if hasattr(network, 'add_cast'):
+        return network.add_cast(tensor_trt, dtype).get_output(0)
+    layer = network.add_identity(tensor_trt)
+    layer.set_output_type(0, dtype)
+    return layer.get_output(0)
+
+
+def add_nms(ctx, boxes_trt, scores_trt, iou_threshold):
+    """Adds a single class NMS of [N, 4] corner boxes, returns the [K] indices of the kept boxes, by decreasing score.
+
+    K depends on the data, TRTModule allocates such outputs once the engine ran.
+    Returns None if the network has no NMS layer (TensorRT < 8.5).
+    """
+    network = ctx.network
+    if not hasattr(network, 'add_nms'):
+        return None
+
+    # the nms layer takes [batch, num_boxes, 4] boxes and [batch, num_boxes, num_classes] scores
+    layer = network.add_shuffle(boxes_trt)
+    layer.reshape_dims = (1, -1, 4)
+    boxes_trt = layer.get_output(0)
+    layer = network.add_shuffle(scores_trt)
+    layer.reshape_dims = (1, -1, 1)
+    scores_trt = layer.get_output(0)
+
+    # every box may be kept, the limit is a scalar shape tensor
+    layer = network.add_shuffle(tensor_trt_get_shape_trt(network, boxes_trt, 1, 1))
+    layer.reshape_dims = ()
+    max_output_boxes_trt = layer.get_output(0)
+
+    layer = network.add_nms(boxes_trt, scores_trt, max_output_boxes_trt)
+    layer.bounding_box_format = trt.BoundingBoxFormat.CORNER_PAIRS
+    layer.set_input(3, _scalar_constant(network, iou_threshold, np.float32))
+    selected_trt = layer.get_output(0)  # [K, 3] (batch index, class index, box index)
+
+    return network.add_gather(selected_trt, _scalar_constant(network, 2, np.int32), 1).get_output(0)
+
+
+def _warn_nms_unsupported(ctx):
+    print('Warning: %s needs the NMS layer of TensorRT 8.5+, it is not converted.' % ctx.method_str)
+    ctx.unsupported_methods.append(ctx.method_str)
+
+
+@tensorrt_converter('torchvision.ops.nms')
+@tensorrt_converter('torchvision.ops.boxes.nms')
+def convert_nms(ctx):
+    boxes = get_arg(ctx, 'boxes', pos=0, default=None)
+    scores = get_arg(ctx, 'scores', pos=1, default=None)
+    iou_threshold = get_arg(ctx, 'iou_threshold', pos=2, default=None)
+    output = ctx.method_return
+
+    boxes_trt = trt_(ctx.network, boxes)
+    scores_trt = trt_(ctx.network, scores)
+    keep_trt = add_nms(ctx, boxes_trt, scores_trt, iou_threshold)
+    if keep_trt is None:
+        _warn_nms_unsupported(ctx)
+        return
+    output._trt = keep_trt
+
+
+@tensorrt_converter('torchvision.ops.batched_nms')
+@tensorrt_converter('torchvision.ops.boxes.batched_nms')
+def convert_batched_nms(ctx):
+    boxes = get_arg(ctx, 'boxes', pos=0, default=None)
+    scores = get_arg(ctx, 'scores', pos=1, default=None)
+    idxs = get_arg(ctx, 'idxs', pos=2, default=None)
+    iou_threshold = get_arg(ctx, 'iou_threshold', pos=3, default=None)
+    output = ctx.method_return
+    network = ctx.network
+
+    boxes_trt = trt_(network, boxes)
+    scores_trt = trt_(network, scores)
+    idxs_trt = _cast(network, trt_(network, idxs), trt.float32)
+
+    # offset the boxes of each category so boxes of different categories never overlap, as torchvision does
+    max_coordinate_trt = network.add_reduce(boxes_trt, trt.ReduceOperation.MAX, 3, True).get_output(0)
+    one_trt = network.add_constant((1, 1), np.ones((1, 1), dtype=np.float32)).get_output(0)
+    step_trt = network.add_elementwise(max_coordinate_trt, one_trt, trt.ElementWiseOperation.SUM).get_output(0)
+    layer = network.add_shuffle(idxs_trt)
+    layer.reshape_dims = (-1, 1)
+    offsets_trt = network.add_elementwise(layer.get_output(0), step_trt, trt.ElementWiseOperation.PROD).get_output(0)
+    boxes_trt = network.add_elementwise(boxes_trt, offsets_trt, trt.ElementWiseOperation.SUM).get_output(0)
+
+    keep_trt = add_nms(ctx, boxes_trt, scores_trt, iou_threshold)
+    if keep_trt is None:
+        _warn_nms_unsupported(ctx)
+        return
+    output._trt = keep_trt
+
+
+class NmsTestModule(torch.nn.Module):
+    def __init__(self, iou_threshold, batched):
+        super(NmsTestModule, self).__init__()
+        self.iou_threshold = iou_threshold
+        self.batched = batched
+
+    def forward(self, x):
+        import torchvision  # optional, the converters are hooked by name and don't need it
+
+        # x is [N, 4 + num_classes]: x, y, width, height and class logits
+        boxes = torch.cat([x[:, 0:2], x[:, 0:2] + x[:, 2:4].abs()], 1)
+        scores, idxs = x[:, 4:].sigmoid().topk(1, dim=1)
+        scores = scores.view(-1)
+        if self.batched:
+            keep = torchvision.ops.batched_nms(boxes, scores, idxs.view(-1), self.iou_threshold)
+        else:
+            keep = torchvision.ops.nms(boxes, scores, self.iou_threshold)
+        return keep, boxes[keep]
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(64, 5)])
+def test_nms():
+    return NmsTestModule(0.5, batched=False)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(64, 8)])
+def test_batched_nms():
+    return NmsTestModule(0.5, batched=True)
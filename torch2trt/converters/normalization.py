@@ -0,0 +1,82 @@
+from torch2trt.torch2trt import *
+
+try:
+    # fused normalization kernels from the plugin library
+    from torch2trt.plugins import create_groupnorm_plugin, create_layernorm_plugin
+except OSError:
+    create_groupnorm_plugin = None
+    create_layernorm_plugin = None
+
+
+NORM_PLUGINS = {
+    'group_norm': ('GroupNormPluginDynamic', create_groupnorm_plugin),
+    'layer_norm': ('LayerNormPluginDynamic', create_layernorm_plugin),
+}
+
+
+def get_norm_plugin(kind):
+    """Returns the plugin factory of a normalization kind, None if the plugin library does not provide it"""
+    name, create_plugin = NORM_PLUGINS[kind]
+    if create_plugin is None:
+        return None
+    if trt.get_plugin_registry().get_plugin_creator(name, '1', '') is None:
+        return None
+    return create_plugin
+
+
+def _affine_arrays(ctx, weight, bias, num_elements):
+    if weight is None:
+        return np.ones(num_elements, dtype=np.float32), np.zeros(num_elements, dtype=np.float32)
+    weight_np = ctx.get_weight(weight).reshape(-1).astype(np.float32)
+    bias_np = ctx.get_weight(bias).reshape(-1).astype(np.float32)
+    return weight_np, bias_np
+
+
+def add_group_norm_plugin(ctx, name, input_trt, num_groups, num_channels, weight, bias, eps):
+    """Adds a fused group normalization layer, returns None if the plugin is not available"""
+    create_plugin = get_norm_plugin('group_norm')
+    if create_plugin is None:
+        return None
+
+    weight_np, bias_np = _affine_arrays(ctx, weight, bias, num_channels)
+    plugin = create_plugin(name,
+                           num_groups=num_groups,
+                           num_channels=num_channels,
+                           W=weight_np,
+                           B=bias_np,
+                           eps=eps)
+    return ctx.network.add_plugin_v2(inputs=[input_trt], plugin=plugin).get_output(0)
+
+
+def add_layer_norm_plugin(ctx, name, input_trt, normalized_shape, weight, bias, eps):
+    """Adds a fused layer normalization layer, returns None if the plugin is not available"""
+    create_plugin = get_norm_plugin('layer_norm')
+    if create_plugin is None:
+        return None
+
+    weight_np, bias_np = _affine_arrays(ctx, weight, bias, int(np.prod(normalized_shape)))
+    plugin = create_plugin(name,
+                           normalized_shape=normalized_shape,
+                           W=weight_np,
+                           B=bias_np,
+                           eps=eps)
+    return ctx.network.add_plugin_v2(inputs=[input_trt], plugin=plugin).get_output(0)
+
+
+def add_normalization(ctx, input_trt, reduce_axes, eps):
+    """Normalizes input_trt over reduce_axes with reduce and elementwise layers"""
+    eps_np = np.array([eps], dtype=np.float32)
+    keep_dims = True
+
+    mean_trt = ctx.network.add_reduce(input_trt, trt.ReduceOperation.AVG, reduce_axes, keep_dims).get_output(0)
+
+    # compute variance over spatial (include eps, to reduce layer count)
+    delta_trt = ctx.network.add_elementwise(input_trt, mean_trt, trt.ElementWiseOperation.SUB).get_output(0)
+    var_trt = ctx.network.add_scale(delta_trt, trt.ScaleMode.UNIFORM, np.zeros_like(eps_np), np.ones_like(eps_np), 2 * np.ones_like(eps_np)).get_output(0)
+    var_trt = ctx.network.add_reduce(var_trt, trt.ReduceOperation.AVG, reduce_axes, keep_dims).get_output(0)
+
+    # compute sqrt(var + eps)
+    var_trt = ctx.network.add_scale(var_trt, trt.ScaleMode.UNIFORM, eps_np, np.ones_like(eps_np), 0.5 * np.ones_like(eps_np)).get_output(0)
+
+    # compute final result
+    return ctx.network.add_elementwise(delta_trt, var_trt, trt.ElementWiseOperation.DIV).get_output(0)
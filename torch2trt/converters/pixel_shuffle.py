@@ -22,7 +22,7 @@ def convert_pixel_shuffle(ctx):
         input_shape_trt, [3], [1], [1]).get_output(0)
 
     upscale_shape_trt = trt_(ctx.network, torch.tensor(
-        [upscale_factor], dtype=torch.int32).to(input.device))
+        [upscale_factor], dtype=torch.int32))
     upscale_p2_trt = ctx.network.add_elementwise(
         upscale_shape_trt, upscale_shape_trt, trt.ElementWiseOperation.PROD).get_output(0)
     new_channel_shape_trt = ctx.network.add_elementwise(
@@ -22,7 +22,7 @@ def convert_prelu(ctx):
     
    
     # y = prelu(x) = relu(x) - alpha * relu(-x)
-    weight_trt = ctx.network.add_constant(weight_shape, -weight.detach().view(weight_shape).cpu().numpy()).get_output(0) # detach so considered leaf
+    weight_trt = ctx.network.add_constant(weight_shape, -ctx.get_weight(weight).reshape(weight_shape)).get_output(0)
     
     # x >= 0
     a = ctx.network.add_activation(input_trt, trt.ActivationType.RELU).get_output(0)
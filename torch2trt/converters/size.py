@@ -18,9 +18,15 @@ class ShapeWarper(tuple):
         return torch.Size(self).numel()
 
 def create_shape_warper(shape, trt, ctx):
-    trt_shape = ctx.network.add_shape(trt).get_output(0)
+    # static dims (same min/opt/max in the profile) stay python ints, arithmetic on them adds no layers
+    trt_shape = None
     new_shape = []
     for i in range(len(shape)):
+        if trt.shape[i] >= 0:
+            new_shape.append(int(shape[i]))
+            continue
+        if trt_shape is None:
+            trt_shape = ctx.network.add_shape(trt).get_output(0)
         int_warper=  IntWarper(shape[i])
         trt_int = ctx.network.add_slice(trt_shape,[i],[1],[1]).get_output(0)
         int_warper._trt = trt_int
@@ -48,11 +54,22 @@ def convert_shapewarper_numel(ctx):
     shape = ctx.method_args[0]
     
     num = ctx.method_return
-    
-    num_trt = shape[i]._trt
-    for i in range(1, len(shape)):
-        other_trt = shape[i]._trt
-        num_trt = ctx.network.add_elementwise(num_trt, other_trt, trt.ElementWiseOperation.PROD).get_output(0)
+
+    # fold the static dims into a single constant
+    static_num = 1
+    num_trt = None
+    for s in shape:
+        if not isinstance(s, IntWarper):
+            static_num *= s
+        elif num_trt is None:
+            num_trt = s._trt
+        else:
+            num_trt = ctx.network.add_elementwise(num_trt, s._trt, trt.ElementWiseOperation.PROD).get_output(0)
+
+    if num_trt is None:
+        return
+    if static_num != 1:
+        num_trt = ctx.network.add_elementwise(num_trt, get_intwarper_trt(static_num, ctx), trt.ElementWiseOperation.PROD).get_output(0)
     intwarper = IntWarper(num)
     intwarper._trt = num_trt
 
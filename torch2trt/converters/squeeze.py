@@ -24,7 +24,7 @@ def convert_squeeze(ctx):
     output = ctx.method_return
 
     reverse_dim = list(filter(lambda x: x not in dim, range(len(input.shape))))
-    reverse_dim_trt = trt_(ctx.network, torch.tensor(reverse_dim,dtype=torch.int32).to(input.device))
+    reverse_dim_trt = trt_(ctx.network, torch.tensor(reverse_dim,dtype=torch.int32))
 
     new_shape_trt = ctx.network.add_gather(shape_trt, reverse_dim_trt, 0).get_output(0)
 
@@ -24,12 +24,6 @@ def convert_view(ctx):
             is_shape_tensor = True
             break
 
-    ## negative shape might cause overflow, forbid for now
-    for s in size:
-        if s<0:
-            is_shape_tensor=True
-            break
-
     ## compute shape tensor
     if support_dynamic_shape and is_shape_tensor:
         shape_trt = []
@@ -39,7 +33,7 @@ def convert_view(ctx):
             else:
                 if s<0:
                     print("warning: negative index of view/reshape might cause overflow!")
-                const_shape_trt = trt_(ctx.network, input.new_tensor([s],dtype=torch.int32))
+                const_shape_trt = trt_(ctx.network, torch.tensor([s],dtype=torch.int32))
                 shape_trt.append(const_shape_trt)
 
         shape_trt = ctx.network.add_concatenation(shape_trt).get_output(0)
@@ -48,7 +42,8 @@ def convert_view(ctx):
     if support_dynamic_shape and is_shape_tensor:
         layer.set_input(1, shape_trt)
     elif support_dynamic_shape:
-        layer.reshape_dims = output.shape
+        # static sizes, -1 is resolved by TensorRT so dynamic input dims stay valid
+        layer.reshape_dims = tuple(size)
     else:
         layer.reshape_dims = tuple(output.shape[1:])
     output._trt = layer.get_output(0)
@@ -84,3 +79,14 @@ def test_view_2d():
 @add_module_test(torch.float32, torch.device('cuda'), [(1, 3, 3, 3)])
 def test_view_3d():
     return View(1, 1, 1, -1)
+
+
+class ViewBatch(torch.nn.Module):
+    def forward(self, x):
+        return x.view(x.size(0), -1)
+
+
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 3, 4, 5)])
+@add_module_test(torch.float32, torch.device('cuda'), [(2, 3, 4, 5)], opt_shape_param=[[[1, 3, 4, 5], [2, 3, 4, 5], [4, 3, 4, 5]]])
+def test_view_batch():
+    return ViewBatch()
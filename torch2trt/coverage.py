@@ -0,0 +1,93 @@
+import os
+import traceback
+import torch
+from .torch2trt import CONVERTERS, ConversionContext
+
+
+PACKAGE_DIRS = (os.path.dirname(__file__), os.path.dirname(torch.__file__))
+
+
+def _returns_tensor(outputs):
+    if isinstance(outputs, torch.Tensor):
+        return True
+    if isinstance(outputs, (tuple, list)):
+        return any(_returns_tensor(o) for o in outputs)
+    return False
+
+
+def _call_site():
+    """Returns 'file:line in function' of the innermost frame outside torch and torch2trt"""
+    for frame in reversed(traceback.extract_stack()):
+        if not frame.filename.startswith(PACKAGE_DIRS):
+            return '%s:%d in %s' % (frame.filename, frame.lineno, frame.name)
+    return '<unknown>'
+
+
+def _is_supported(converter, ctx):
+    if not _returns_tensor(ctx.method_return):
+        return True
+    if not converter['is_real']:
+        return False
+    return converter['is_supported'] is None or converter['is_supported'](ctx)
+
+
+def _record_converter(converter):
+    def record(ctx):
+        ctx.calls.append({
+            'method': ctx.method_str,
+            'supported': _is_supported(converter, ctx),
+            'modules': tuple(ctx.module_stack),
+            'call_site': _call_site(),
+        })
+    return {'converter': record, 'is_real': converter['is_real'], 'is_supported': None}
+
+
+def trace_calls(module, inputs):
+    """Runs module once with the conversion hooks attached, without building a network.
+
+    Returns the list of hooked method calls, in execution order. Each call is a dict
+    with the method name, whether a real converter supports the call, the names of the
+    modules it was called from (outermost first) and its call site. Calls made inside
+    a real converter are not listed, they are not converted either.
+    """
+    converters = {method: _record_converter(converter) for method, converter in CONVERTERS.items()}
+
+    with ConversionContext(None, converters=converters) as ctx:
+        ctx.calls = []
+        handles = ctx.track_modules(module)
+
+        try:
+            with torch.no_grad():
+                module(*inputs)
+        finally:
+            for handle in handles:
+                handle.remove()
+
+    return ctx.calls
+
+
+def converter_coverage(module, inputs):
+    """Lists the methods called by module that have no TensorRT converter.
+
+    Returns a dict mapping each unsupported method to the call sites it was called from.
+    An empty dict means module can be converted by torch2trt.
+    """
+    unsupported = {}
+    for call in trace_calls(module, inputs):
+        if not call['supported']:
+            call_sites = unsupported.setdefault(call['method'], [])
+            if call['call_site'] not in call_sites:
+                call_sites.append(call['call_site'])
+    return unsupported
+
+
+def print_coverage(module, inputs):
+    unsupported = converter_coverage(module, inputs)
+    if len(unsupported) == 0:
+        print('All methods have a converter.')
+        return
+    print('Unsupported methods:')
+    for method, call_sites in unsupported.items():
+        print('  %s' % method)
+        for call_site in call_sites:
+            print('    %s' % call_site)
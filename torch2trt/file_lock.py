@@ -0,0 +1,19 @@
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # no locking between processes
+
+
+@contextmanager
+def locked(path):
+    """Holds an exclusive lock on path + '.lock' inside the block, shared with other processes"""
+    with open(path + '.lock', 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,156 @@
+import copy
+import torch
+
+try:
+    from torch.overrides import TorchFunctionMode
+except ImportError:
+    TorchFunctionMode = None
+
+
+FOLDABLE_MODULES = (torch.nn.Conv1d, torch.nn.Conv2d, torch.nn.ConvTranspose2d, torch.nn.Linear)
+FOLDABLE_BATCHNORMS = (torch.nn.BatchNorm1d, torch.nn.BatchNorm2d)
+
+
+def _can_fold(module, bn):
+    if not isinstance(module, FOLDABLE_MODULES) or not isinstance(bn, FOLDABLE_BATCHNORMS):
+        return False
+    if bn.training or bn.running_mean is None or bn.running_var is None:
+        return False  # normalizes with batch statistics
+    if isinstance(module, torch.nn.Linear):
+        return module.out_features == bn.num_features
+    return module.out_channels == bn.num_features
+
+
+def _candidate_pairs(module):
+    """Yields (parent, name, bn_name) for foldable modules directly followed by a batchnorm sibling"""
+    for parent in module.modules():
+        children = list(parent.named_children())
+        for (name, child), (bn_name, bn) in zip(children[:-1], children[1:]):
+            if _can_fold(child, bn):
+                yield parent, name, bn_name
+
+
+# methods that read the shape of a tensor, not its values
+SHAPE_METHODS = ('__get__', 'dim', 'size', 'numel')
+
+
+def _tensors(value):
+    if isinstance(value, torch.Tensor):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            for tensor in _tensors(item):
+                yield tensor
+    elif isinstance(value, dict):
+        for item in value.values():
+            for tensor in _tensors(item):
+                yield tensor
+
+
+if TorchFunctionMode is not None:
+    class _UseCounter(TorchFunctionMode):
+        """Counts the torch calls reading the values of the watched tensors"""
+
+        def __init__(self):
+            super(_UseCounter, self).__init__()
+            self.uses = {}
+
+        def watch(self, tensor):
+            # ids of tensors freed before this one was created may be reused, count from here
+            self.uses[id(tensor)] = 0
+
+        def add_uses(self, value):
+            for tensor in _tensors(value):
+                if id(tensor) in self.uses:
+                    self.uses[id(tensor)] += 1
+
+        def __torch_function__(self, func, types, args=(), kwargs=None):
+            kwargs = {} if kwargs is None else kwargs
+            if getattr(func, '__name__', None) not in SHAPE_METHODS:
+                self.add_uses((args, kwargs))
+            return func(*args, **kwargs)
+
+
+def _check_dataflow(module, pairs, inputs):
+    """Keeps the pairs where the module output is only used by the batchnorm, called once"""
+    if TorchFunctionMode is None:
+        print('Warning: fold_batchnorm needs torch.overrides.TorchFunctionMode to check the dataflow, nothing is folded.')
+        return []
+
+    calls = {}
+    handles = []
+    counter = _UseCounter()
+
+    def record(key):
+        def hook(m, hook_inputs, output):
+            calls.setdefault(key, []).append((hook_inputs[0], output))
+            if isinstance(output, torch.Tensor):
+                counter.watch(output)
+        return hook
+
+    for parent, name, bn_name in pairs:
+        handles.append(getattr(parent, name).register_forward_hook(record((id(parent), name))))
+        handles.append(getattr(parent, bn_name).register_forward_hook(record((id(parent), bn_name))))
+
+    try:
+        with torch.no_grad(), counter:
+            outputs = module(*inputs)
+        counter.add_uses(outputs)
+    finally:
+        for handle in handles:
+            handle.remove()
+
+    checked = []
+    for parent, name, bn_name in pairs:
+        module_calls = calls.get((id(parent), name), [])
+        bn_calls = calls.get((id(parent), bn_name), [])
+        if len(module_calls) != 1 or len(bn_calls) != 1:
+            continue
+        output, bn_input = module_calls[0][1], bn_calls[0][0]
+        if bn_input is not output or counter.uses.get(id(output), 0) != 1:
+            continue  # the batchnorm must be the only reader of the module output
+        if isinstance(getattr(parent, name), torch.nn.Linear) and output.dim() != 2:
+            continue  # batchnorm normalizes dim 1, not the features
+        checked.append((parent, name, bn_name))
+    return checked
+
+
+def _fold(module, bn):
+    with torch.no_grad():
+        scale = bn.running_var.add(bn.eps).rsqrt()
+        if bn.weight is not None:
+            scale = scale * bn.weight
+        shift = -bn.running_mean * scale
+        if bn.bias is not None:
+            shift = shift + bn.bias
+
+        weight = module.weight
+        if isinstance(module, torch.nn.ConvTranspose2d):
+            # weight is (in, out / groups, k, k)
+            groups = module.groups
+            view_shape = (groups, weight.shape[0] // groups, weight.shape[1]) + tuple(weight.shape[2:])
+            scale_shape = (groups, 1, weight.shape[1]) + (1,) * (weight.dim() - 2)
+            weight.copy_((weight.view(view_shape) * scale.view(scale_shape).to(weight.dtype)).view(weight.shape))
+        else:
+            weight.mul_(scale.view((-1,) + (1,) * (weight.dim() - 1)).to(weight.dtype))
+
+        if module.bias is None:
+            module.bias = torch.nn.Parameter(torch.zeros_like(shift).to(weight.dtype))
+        module.bias.copy_(module.bias * scale.to(weight.dtype) + shift.to(weight.dtype))
+
+
+def fold_batchnorm_modules(module, inputs):
+    """Returns a copy of module with eval mode batchnorms folded into the preceding conv / linear.
+
+    Candidates are modules directly followed by a batchnorm sibling. They are
+    checked with a forward pass over inputs, the batchnorm must be called once
+    on the module output and be its only reader, e.g. a residual connection
+    reading the module output keeps the pair unfolded. Folded batchnorms are
+    replaced by Identity.
+    """
+    module = copy.deepcopy(module)
+    pairs = _check_dataflow(module, list(_candidate_pairs(module)), inputs)
+    for parent, name, bn_name in pairs:
+        _fold(getattr(parent, name), getattr(parent, bn_name))
+        setattr(parent, bn_name, torch.nn.Identity())
+    return module, len(pairs)
@@ -0,0 +1,220 @@
+import builtins
+import copy
+import importlib
+import operator
+import threading
+import torch
+import torch.fx
+from collections import OrderedDict
+from .torch2trt import CONVERTERS, attach_converter
+
+
+# python operators recorded by fx, with the dunder method the hook front end patches
+OPERATOR_METHODS = {
+    operator.add: '__add__',
+    operator.sub: '__sub__',
+    operator.mul: '__mul__',
+    operator.truediv: '__truediv__',
+    operator.floordiv: '__floordiv__',
+    operator.mod: '__mod__',
+    operator.pow: '__pow__',
+    operator.matmul: '__matmul__',
+    operator.neg: '__neg__',
+    operator.getitem: '__getitem__',
+    operator.eq: '__eq__',
+    operator.ne: '__ne__',
+    operator.lt: '__lt__',
+    operator.le: '__le__',
+    operator.gt: '__gt__',
+    operator.ge: '__ge__',
+    operator.and_: '__and__',
+    operator.or_: '__or__',
+    operator.iadd: '__iadd__',
+    operator.isub: '__isub__',
+    operator.imul: '__imul__',
+    operator.itruediv: '__itruediv__',
+}
+
+# captured graphs, by module class, submodule structure and attributes, and number of inputs,
+# least recently used first, shared by the conversions running in other threads
+FX_GRAPH_CACHE = OrderedDict()
+FX_GRAPH_CACHE_SIZE = 64
+FX_GRAPH_CACHE_LOCK = threading.Lock()
+
+# attributes every module has, only training changes what is traced
+MODULE_INTERNALS = set(torch.nn.Module().__dict__) - {'training'}
+
+
+def converter_methods():
+    """Maps the functions and methods that have a converter to their method string"""
+    methods = {}
+    namespace = {'torch': torch}
+    for method_str, converter in CONVERTERS.items():
+        root = method_str.split('.')[0]
+        try:
+            if root not in namespace:
+                namespace[root] = importlib.import_module(root)
+            method = eval(method_str, namespace)
+        except (ImportError, AttributeError):
+            continue
+        try:
+            if method not in methods or converter['is_real']:
+                methods[method] = method_str
+        except TypeError:
+            continue  # unhashable
+    return methods
+
+
+def _method_str(obj, name):
+    if isinstance(obj, torch.Tensor):
+        return 'torch.Tensor.' + name
+    cls = type(obj)
+    return '%s.%s.%s' % (cls.__module__, cls.__name__, name)
+
+
+def _module_names(node):
+    """Returns the names of the submodules node was traced in, outermost first"""
+    names = []
+    for key, value in node.meta.get('nn_module_stack', {}).items():
+        names.append(value[0] if isinstance(value, tuple) else key)
+    return names
+
+
+class ConverterTracer(torch.fx.Tracer):
+    """Traces through every module, except the ones with a converter for their forward"""
+
+    def __init__(self, methods):
+        functions = tuple(m for m in methods if type(m).__name__ == 'function')
+        super(ConverterTracer, self).__init__(autowrap_functions=functions)
+        self.methods = methods
+
+    def is_leaf_module(self, m, module_qualified_name):
+        method_str = self.methods.get(type(m).forward, None)
+        return method_str is not None and CONVERTERS[method_str]['is_real']
+
+
+def _freeze(value):
+    """Returns a hashable stand-in for an attribute value, raises TypeError if there is none"""
+    if isinstance(value, torch.Tensor):
+        return 'tensor'  # traced as a reference to the attribute, not its values
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, ) + tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return ('dict', ) + tuple(sorted((repr(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return ('set', frozenset(_freeze(v) for v in value))
+    hash(value)
+    return (type(value), value)
+
+
+def _graph_key(module, num_inputs):
+    """Cache key of the graph of module, None if an attribute can't be part of the key.
+
+    fx bakes python attribute values into the graph, e.g. chunk counts or dims,
+    so every attribute of every submodule is part of the key.
+    """
+    submodules = []
+    for name, m in module.named_modules():
+        attributes = tuple(sorted((k, v) for k, v in m.__dict__.items() if k not in MODULE_INTERNALS))
+        try:
+            submodules.append((name, type(m), _freeze(attributes)))
+        except TypeError:
+            return None
+    return (type(module), tuple(submodules), num_inputs)
+
+
+def _cached_graph(key):
+    with FX_GRAPH_CACHE_LOCK:
+        graph = FX_GRAPH_CACHE.get(key, None)
+        if graph is not None:
+            FX_GRAPH_CACHE.move_to_end(key)
+        return graph
+
+
+def _cache_graph(key, graph):
+    with FX_GRAPH_CACHE_LOCK:
+        FX_GRAPH_CACHE[key] = graph
+        FX_GRAPH_CACHE.move_to_end(key)
+        while len(FX_GRAPH_CACHE) > FX_GRAPH_CACHE_SIZE:
+            FX_GRAPH_CACHE.popitem(last=False)
+
+
+def capture_graph(module, num_inputs):
+    """Symbolically traces module, returns a GraphModule or None if module can't be traced.
+
+    The graph is cached per module class, submodules, attributes and number of inputs,
+    later captures of an identical module bind a copy of the graph to the new instance.
+    The cache keeps the FX_GRAPH_CACHE_SIZE most recently used graphs.
+    """
+    key = _graph_key(module, num_inputs)
+    graph = _cached_graph(key) if key is not None else None
+    if graph is None:
+        try:
+            graph = ConverterTracer(converter_methods()).trace(module)
+        except Exception as e:
+            print('Warning: fx tracing failed (%s), falling back to method hooks.' % e)
+            return None
+        if key is None:
+            return torch.fx.GraphModule(module, graph)
+        _cache_graph(key, graph)
+    # each GraphModule owns its graph, the cached one is never bound to a module
+    return torch.fx.GraphModule(module, copy.deepcopy(graph))
+
+
+class ConverterInterpreter(torch.fx.Interpreter):
+    """Runs a captured graph and calls the converter of each node, like the hooks would"""
+
+    def __init__(self, graph_module, ctx):
+        super(ConverterInterpreter, self).__init__(graph_module)
+        self.ctx = ctx
+        self.methods = converter_methods()
+
+    def _convert(self, method_str, method, args, kwargs):
+        if method_str not in CONVERTERS:
+            return method(*args, **kwargs)
+        return attach_converter(self.ctx, method, CONVERTERS[method_str], method_str)(*args, **kwargs)
+
+    def run_node(self, n):
+        self.ctx.module_stack = _module_names(n)
+        return super(ConverterInterpreter, self).run_node(n)
+
+    def call_function(self, target, args, kwargs):
+        if target is builtins.getattr and args[1] == 'shape' and isinstance(args[0], torch.Tensor):
+            return self._convert('torch.Tensor.size', torch.Tensor.size, args[:1], kwargs)
+
+        if target in OPERATOR_METHODS:
+            name = OPERATOR_METHODS[target]
+            if len(args) == 2 and _method_str(args[0], name) not in CONVERTERS \
+                    and _method_str(args[1], '__r' + name[2:]) in CONVERTERS:
+                # reflected operator, e.g. 2 * x calls x.__rmul__(2)
+                name = '__r' + name[2:]
+                args = (args[1], args[0])
+            method_str = _method_str(args[0], name)
+            if method_str not in CONVERTERS:
+                return target(*args, **kwargs)
+            return self._convert(method_str, getattr(type(args[0]), name), args, kwargs)
+
+        try:
+            method_str = self.methods.get(target, None)
+        except TypeError:
+            method_str = None
+        if method_str is None:
+            return target(*args, **kwargs)
+        return self._convert(method_str, target, args, kwargs)
+
+    def call_method(self, target, args, kwargs):
+        self_obj = args[0]
+        return self._convert(_method_str(self_obj, target), getattr(type(self_obj), target), args, kwargs)
+
+    def call_module(self, target, args, kwargs):
+        submodule = self.fetch_attr(target)
+        self.ctx.module_stack = self.ctx.module_stack + [target]
+        method_str = self.methods.get(type(submodule).forward, None)
+        if method_str is None:
+            return submodule(*args, **kwargs)
+        return self._convert(method_str, type(submodule).forward, (submodule, ) + tuple(args), kwargs)
+
+
+def convert_graph(ctx, graph_module, inputs):
+    """Converts a captured graph on inputs, returns the outputs with their TensorRT tensors"""
+    return ConverterInterpreter(graph_module, ctx).run(*inputs)
@@ -0,0 +1,422 @@
+import numpy as np
+import tensorrt as trt
+
+
+class NetworkGraph(object):
+    """Producer/consumer view of a TensorRT network, used by the optimization passes.
+
+    TensorRT can not remove layers from a network, so passes rewire the
+    consumers of a layer instead. Layers whose outputs end up unused are
+    dropped by the builder.
+    """
+
+    def __init__(self, network):
+        self.network = network
+        self.producers = {}
+        self.consumers = {}
+        for i in range(network.num_layers):
+            layer = network.get_layer(i)
+            for j in range(layer.num_inputs):
+                tensor = layer.get_input(j)
+                if tensor is not None:
+                    self.consumers.setdefault(tensor.name, []).append((layer, j))
+            for j in range(layer.num_outputs):
+                self.producers[layer.get_output(j).name] = layer
+        self.output_names = set(network.get_output(i).name for i in range(network.num_outputs))
+        self.arrays = []  # weights set by the passes must outlive the build
+        self.removed = set()
+
+    def layers(self):
+        for i in range(self.network.num_layers):
+            layer = self.network.get_layer(i)
+            if layer.name not in self.removed:
+                yield layer
+
+    def get_producer(self, tensor):
+        return self.producers.get(tensor.name, None)
+
+    def get_consumers(self, tensor):
+        return self.consumers.get(tensor.name, [])
+
+    def is_output(self, tensor):
+        return tensor.name in self.output_names
+
+    def has_single_use(self, tensor):
+        return not self.is_output(tensor) and len(self.get_consumers(tensor)) == 1
+
+    def set_input(self, layer, index, tensor):
+        old_tensor = layer.get_input(index)
+        self.consumers[old_tensor.name] = [
+            (l, i) for l, i in self.get_consumers(old_tensor) if not (l.name == layer.name and i == index)
+        ]
+        layer.set_input(index, tensor)
+        self.consumers.setdefault(tensor.name, []).append((layer, index))
+        self._remove_if_unused(self.get_producer(old_tensor))
+
+    def _remove_if_unused(self, layer):
+        """Drops a layer whose outputs are unused, so it no longer counts as a consumer of its inputs"""
+        if layer is None or layer.name in self.removed:
+            return
+        for j in range(layer.num_outputs):
+            output = layer.get_output(j)
+            if self.is_output(output) or len(self.get_consumers(output)) > 0:
+                return
+        self.removed.add(layer.name)
+        for j in range(layer.num_inputs):
+            tensor = layer.get_input(j)
+            if tensor is not None:
+                self.consumers[tensor.name] = [
+                    (l, i) for l, i in self.get_consumers(tensor) if l.name != layer.name
+                ]
+                self._remove_if_unused(self.get_producer(tensor))
+
+    def replace_uses(self, old_tensor, new_tensor):
+        """Makes all consumers of old_tensor read new_tensor, fails for network outputs"""
+        if self.is_output(old_tensor):
+            return False
+        for layer, index in list(self.get_consumers(old_tensor)):
+            self.set_input(layer, index, new_tensor)
+        return True
+
+    def num_dead_layers(self):
+        """Counts layers that don't contribute to any network output"""
+        live_tensors = set(self.output_names)
+        num_dead = 0
+        for i in reversed(range(self.network.num_layers)):
+            layer = self.network.get_layer(i)
+            outputs = [layer.get_output(j).name for j in range(layer.num_outputs)]
+            if not any(name in live_tensors for name in outputs):
+                num_dead += 1
+                continue
+            for j in range(layer.num_inputs):
+                tensor = layer.get_input(j)
+                if tensor is not None:
+                    live_tensors.add(tensor.name)
+        return num_dead
+
+
+# SHUFFLE ELIMINATION
+
+
+def _identity(ndims):
+    return tuple(range(ndims))
+
+
+def _shuffle_params(layer):
+    """Returns (first_transpose, reshape_dims, second_transpose) of a static shuffle layer.
+
+    reshape_dims is None if the shuffle does not reshape. Returns None for
+    shuffles that can't be rewritten, e.g. with a shape tensor input.
+    """
+    if layer.type != trt.LayerType.SHUFFLE:
+        return None
+    if layer.num_inputs > 1 and layer.get_input(1) is not None:
+        return None
+    layer.__class__ = trt.IShuffleLayer
+    if not getattr(layer, 'zero_is_placeholder', True):
+        return None
+
+    ndims = len(layer.get_input(0).shape)
+    first = tuple(layer.first_transpose[i] for i in range(ndims))
+
+    try:
+        reshape = tuple(layer.reshape_dims)
+    except ValueError:
+        reshape = None  # reshape_dims was never set
+    if reshape is not None and len(reshape) == 0 and ndims > 0:
+        return None  # can't tell "not set" from a reshape to a scalar
+
+    out_ndims = ndims if reshape is None else len(reshape)
+    second = tuple(layer.second_transpose[i] for i in range(out_ndims))
+    return first, reshape, second
+
+
+def _resolve_reshape(reshape, shape):
+    """Replaces 0 placeholders with the dimensions of shape, None if they are not static"""
+    dims = []
+    for i, d in enumerate(reshape):
+        if d == 0:
+            if i >= len(shape) or shape[i] < 0:
+                return None
+            d = shape[i]
+        dims.append(d)
+    return tuple(dims)
+
+
+def _is_identity_shuffle(layer, params):
+    first, reshape, second = params
+    input_shape = tuple(layer.get_input(0).shape)
+    if first != _identity(len(first)) or second != _identity(len(second)):
+        return False
+    if reshape is None:
+        return True
+    if len(reshape) != len(input_shape):
+        return False
+
+    # every dimension is kept, a single -1 must then match the remaining volume
+    num_inferred = 0
+    for d, input_d in zip(reshape, input_shape):
+        if d == -1:
+            num_inferred += 1
+        elif d != 0 and d != input_d:
+            return False
+    return num_inferred <= 1
+
+
+def _merge_shuffles(graph, layer_a, params_a, layer_b, params_b):
+    """Merges layer_a into its only consumer layer_b, returns True on success"""
+    first_a, reshape_a, second_a = params_a
+    first_b, reshape_b, second_b = params_b
+    input_a = layer_a.get_input(0)
+
+    if reshape_a is None:
+        # a only permutes, fold it into the first transpose of b
+        permutation = tuple(first_a[second_a[i]] for i in range(len(second_a)))
+        layer_b.first_transpose = tuple(permutation[i] for i in first_b)
+        graph.set_input(layer_b, 0, input_a)
+        return True
+
+    if reshape_b is None:
+        # b only permutes, fold it into the second transpose of a
+        if graph.is_output(layer_b.get_output(0)):
+            return False  # b has to stay, a must keep its permutation
+        permutation = tuple(first_b[second_b[i]] for i in range(len(second_b)))
+        layer_a.second_transpose = tuple(second_a[i] for i in permutation)
+        return graph.replace_uses(layer_b.get_output(0), layer_a.get_output(0))
+
+    if second_a == _identity(len(second_a)) and first_b == _identity(len(first_b)):
+        # reshape followed by reshape
+        reshape = _resolve_reshape(reshape_b, tuple(layer_a.get_output(0).shape))
+        if reshape is None:
+            return False
+        layer_b.first_transpose = first_a
+        layer_b.reshape_dims = reshape
+        graph.set_input(layer_b, 0, input_a)
+        return True
+
+    return False
+
+
+def eliminate_shuffles(graph):
+    """Composes adjacent shuffles, removes identity reshapes and cancels inverse permutations.
+
+    Returns the number of rewrites applied.
+    """
+    num_rewrites = 0
+    changed = True
+    while changed:
+        changed = False
+        for layer in graph.layers():
+            params = _shuffle_params(layer)
+            if params is None:
+                continue
+
+            output = layer.get_output(0)
+            if len(graph.get_consumers(output)) == 0:
+                continue  # dead, or a network output
+
+            if _is_identity_shuffle(layer, params):
+                if graph.replace_uses(output, layer.get_input(0)):
+                    num_rewrites += 1
+                    changed = True
+                continue
+
+            input = layer.get_input(0)
+            producer = graph.get_producer(input)
+            if producer is None or not graph.has_single_use(input):
+                continue
+            producer_params = _shuffle_params(producer)
+            if producer_params is None:
+                continue
+            if _merge_shuffles(graph, producer, producer_params, layer, params):
+                num_rewrites += 1
+                changed = True
+
+    return num_rewrites
+
+
+# PATTERN REWRITERS
+
+
+LAYER_CLASSES = {
+    trt.LayerType.CONVOLUTION: trt.IConvolutionLayer,
+    trt.LayerType.DECONVOLUTION: trt.IDeconvolutionLayer,
+    trt.LayerType.SCALE: trt.IScaleLayer,
+}
+
+
+REWRITERS = {}
+
+
+def tensorrt_rewriter(name, pattern):
+    """Registers a rewrite rule for a chain of layer types.
+
+    The rewriter is called with the graph and the matched layers, each layer
+    being the only consumer of the previous one. It returns True if it
+    rewrote the chain.
+    """
+    def register_rewriter(rewriter):
+        REWRITERS[name] = {'pattern': tuple(pattern), 'rewriter': rewriter}
+        return rewriter
+
+    return register_rewriter
+
+
+def _match(graph, layer, pattern):
+    layers = []
+    for i, layer_type in enumerate(pattern):
+        if layer.type != layer_type:
+            return None
+        if layer_type in LAYER_CLASSES:
+            layer.__class__ = LAYER_CLASSES[layer_type]
+        layers.append(layer)
+
+        if i + 1 < len(pattern):
+            output = layer.get_output(0)
+            if layer.num_outputs != 1 or not graph.has_single_use(output):
+                return None
+            layer, index = graph.get_consumers(output)[0]
+            if index != 0:
+                return None
+    return layers
+
+
+def run_rewriters(graph, rewriters=REWRITERS):
+    """Applies the rewrite rules until none matches, returns the hit count of each rule"""
+    hits = dict((name, 0) for name in rewriters)
+    changed = True
+    while changed:
+        changed = False
+        for name, rule in rewriters.items():
+            for layer in list(graph.layers()):
+                if layer.name in graph.removed:
+                    continue
+                layers = _match(graph, layer, rule['pattern'])
+                if layers is not None and rule['rewriter'](graph, layers):
+                    hits[name] += 1
+                    changed = True
+    return hits
+
+
+def _array(weights):
+    return np.asarray(weights).reshape(-1)
+
+
+def _scale_arrays(layer, num_channels):
+    """Returns per channel (scale, shift) of a scale layer, None if it can't be folded"""
+    scale, shift, power = _array(layer.scale), _array(layer.shift), _array(layer.power)
+    if power.size > 0 and not np.all(power == 1):
+        return None
+    if layer.mode == trt.ScaleMode.UNIFORM:
+        size = 1
+    elif layer.mode == trt.ScaleMode.CHANNEL:
+        size = num_channels
+    else:
+        return None
+    scale = np.ones(size, dtype=np.float32) if scale.size == 0 else scale
+    shift = np.zeros(size, dtype=np.float32) if shift.size == 0 else shift
+    return np.broadcast_to(scale, (num_channels,)), np.broadcast_to(shift, (num_channels,))
+
+
+def _is_channel_scale(scale_layer, input):
+    # convolution outputs are ...CHW
+    return scale_layer.mode == trt.ScaleMode.UNIFORM or \
+        getattr(scale_layer, 'channel_axis', len(input.shape) - 3) == len(input.shape) - 3
+
+
+@tensorrt_rewriter('conv_scale', [trt.LayerType.CONVOLUTION, trt.LayerType.SCALE])
+def fold_conv_scale(graph, layers):
+    conv, scale_layer = layers
+    if not _is_channel_scale(scale_layer, conv.get_output(0)):
+        return False
+    num_channels = conv.num_output_maps
+    arrays = _scale_arrays(scale_layer, num_channels)
+    if arrays is None:
+        return False
+    scale, shift = arrays
+
+    kernel = _array(conv.kernel).reshape(num_channels, -1)
+    bias = _array(conv.bias)
+    if bias.size == 0:
+        bias = np.zeros(num_channels, dtype=kernel.dtype)
+
+    kernel = np.ascontiguousarray((kernel * scale[:, None]).astype(kernel.dtype).reshape(-1))
+    bias = np.ascontiguousarray((bias * scale + shift).astype(kernel.dtype))
+    graph.arrays += [kernel, bias]
+    conv.kernel = kernel
+    conv.bias = bias
+    return graph.replace_uses(scale_layer.get_output(0), conv.get_output(0))
+
+
+@tensorrt_rewriter('deconv_scale', [trt.LayerType.DECONVOLUTION, trt.LayerType.SCALE])
+def fold_deconv_scale(graph, layers):
+    deconv, scale_layer = layers
+    if deconv.num_groups != 1 or not _is_channel_scale(scale_layer, deconv.get_output(0)):
+        return False
+    num_channels = deconv.num_output_maps
+    arrays = _scale_arrays(scale_layer, num_channels)
+    if arrays is None:
+        return False
+    scale, shift = arrays
+
+    # deconvolution kernels are (in, out, kernel...)
+    input_shape = deconv.get_input(0).shape
+    kernel = _array(deconv.kernel).reshape(input_shape[len(input_shape) - 3], num_channels, -1)
+    bias = _array(deconv.bias)
+    if bias.size == 0:
+        bias = np.zeros(num_channels, dtype=kernel.dtype)
+
+    kernel = np.ascontiguousarray((kernel * scale[None, :, None]).astype(kernel.dtype).reshape(-1))
+    bias = np.ascontiguousarray((bias * scale + shift).astype(kernel.dtype))
+    graph.arrays += [kernel, bias]
+    deconv.kernel = kernel
+    deconv.bias = bias
+    return graph.replace_uses(scale_layer.get_output(0), deconv.get_output(0))
+
+
+@tensorrt_rewriter('scale_scale', [trt.LayerType.SCALE, trt.LayerType.SCALE])
+def fold_scale_scale(graph, layers):
+    first, second = layers
+    if first.mode != second.mode or first.mode == trt.ScaleMode.ELEMENTWISE:
+        return False
+    if getattr(first, 'channel_axis', 0) != getattr(second, 'channel_axis', 0):
+        return False
+
+    num_channels = max(_array(layer.scale).size for layer in layers)
+    num_channels = max([num_channels] + [_array(layer.shift).size for layer in layers])
+    if num_channels == 0:
+        return False
+    first_arrays = _scale_arrays(first, num_channels)
+    second_arrays = _scale_arrays(second, num_channels)
+    if first_arrays is None or second_arrays is None:
+        return False
+
+    # (x * s1 + b1) * s2 + b2
+    dtype = _array(first.scale).dtype if _array(first.scale).size > 0 else np.float32
+    scale = np.ascontiguousarray((first_arrays[0] * second_arrays[0]).astype(dtype))
+    shift = np.ascontiguousarray((first_arrays[1] * second_arrays[0] + second_arrays[1]).astype(dtype))
+    if first.mode == trt.ScaleMode.UNIFORM:
+        scale, shift = scale[:1], shift[:1]
+    graph.arrays += [scale, shift]
+    first.scale = scale
+    first.shift = shift
+    return graph.replace_uses(second.get_output(0), first.get_output(0))
+
+
+def run_graph_passes(graph, refittable=False):
+    """Runs the graph passes on a network before it is handed to the builder.
+
+    Weight folding rewriters are skipped for refittable engines, the refit map
+    points at the original layer weights.
+    """
+    num_dead = graph.num_dead_layers()
+
+    eliminate_shuffles(graph)
+    hits = {}
+    if not refittable:
+        hits = run_rewriters(graph)
+
+    return {
+        'layers_removed': graph.num_dead_layers() - num_dead,
+        'rewriter_hits': hits,
+    }
@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+import torch
+
+
+def meta_inputs(inputs):
+    """Returns shape only stand-ins for inputs, the TensorRT inputs still live on the GPU"""
+    return [torch.empty_like(tensor, device='meta') for tensor in inputs]
+
+
+@contextmanager
+def meta_parameters(ctx, module):
+    """Swaps the parameters and buffers of module for meta tensors inside the block.
+
+    The forward then only computes shapes. ctx.get_weight still returns the host copy
+    of the original tensor for its meta stand-in, so converters read the real weights.
+    """
+    swapped = []
+    stand_ins = {}  # shared tensors get a shared stand-in
+    for submodule in module.modules():
+        for attr in ['_parameters', '_buffers']:
+            tensors = getattr(submodule, attr)
+            for name, tensor in list(tensors.items()):
+                if tensor is None or tensor.is_meta:
+                    continue
+                if id(tensor) not in stand_ins:
+                    stand_in = torch.empty_like(tensor, device='meta')
+                    if isinstance(tensor, torch.nn.Parameter):
+                        stand_in = torch.nn.Parameter(stand_in, requires_grad=tensor.requires_grad)
+                    ctx.alias_weight(stand_in, tensor)
+                    stand_ins[id(tensor)] = stand_in
+                swapped.append((tensors, name, tensor))
+                tensors[name] = stand_ins[id(tensor)]
+    try:
+        yield module
+    finally:
+        for tensors, name, tensor in swapped:
+            tensors[name] = tensor
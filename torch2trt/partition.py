@@ -0,0 +1,137 @@
+from copy import deepcopy
+import torch
+from .torch2trt import torch2trt
+from .coverage import trace_calls
+
+
+def _is_tensors(values):
+    return all(isinstance(v, torch.Tensor) for v in values)
+
+
+def _capture_module_io(module, inputs):
+    """Returns {name: [(inputs, output), ...]} of every module call during one forward pass"""
+    io = {}
+    handles = []
+
+    def record(name):
+        def hook(m, hook_inputs, output):
+            io.setdefault(name, []).append((hook_inputs, output))
+        return hook
+
+    for name, child in module.named_modules():
+        handles.append(child.register_forward_hook(record(name)))
+
+    try:
+        with torch.no_grad():
+            module(*inputs)
+    finally:
+        for handle in handles:
+            handle.remove()
+    return io
+
+
+def _convertible_modules(module, inputs, min_segment_calls):
+    """Returns a predicate telling whether the submodule of a name can be converted as a whole, and the module io"""
+    calls = trace_calls(module, inputs)
+    io = _capture_module_io(module, inputs)
+
+    num_calls = {}
+    unsupported = set()
+    for call in calls:
+        for name in call['modules']:
+            num_calls[name] = num_calls.get(name, 0) + 1
+            if not call['supported']:
+                unsupported.add(name)
+
+    def convertible(name):
+        if name in unsupported or num_calls.get(name, 0) < min_segment_calls:
+            return False
+        if len(io.get(name, [])) != 1:
+            return False  # the engine is built for the shapes of a single call
+        module_inputs, output = io[name][0]
+        if isinstance(output, tuple) and len(output) < 2:
+            return False  # TRTModule returns a single output as a tensor
+        outputs = output if isinstance(output, tuple) else (output, )
+        return len(module_inputs) > 0 and _is_tensors(module_inputs) and _is_tensors(outputs)
+
+    return convertible, io
+
+
+def _segments(module, convertible, name=''):
+    """Returns the names of the outermost submodules of module, excluding itself, that can be converted as a whole"""
+    names = []
+    for child_name, child in module.named_children():
+        child_name = child_name if name == '' else name + '.' + child_name
+        if convertible(child_name):
+            names.append(child_name)
+        else:
+            names += _segments(child, convertible, child_name)
+    return names
+
+
+def _set_submodule(module, name, submodule):
+    parent_name, _, child_name = name.rpartition('.')
+    parent = module
+    if parent_name != '':
+        for atom in parent_name.split('.'):
+            parent = getattr(parent, atom)
+    setattr(parent, child_name, submodule)
+
+
+def torch2trt_partitioned(module, inputs, min_segment_calls=1, **kwargs):
+    """Converts the submodules of module that have converters for all their methods.
+
+    Runs module once with inputs to find the outermost submodules without unsupported
+    methods, builds one TensorRT engine per submodule from the inputs it received,
+    and returns a copy of module with those submodules replaced by TRTModule.
+    Code outside the converted submodules keeps running in PyTorch.
+    Submodules called more than once, or with non tensor inputs or outputs, are
+    left in PyTorch. Submodules with less than min_segment_calls converted methods
+    are not worth an engine and are left in PyTorch too.
+    Methods without any converter are not seen before building, so a submodule whose
+    conversion fails is left in PyTorch and its own submodules are converted instead.
+    The names of the converted submodules are stored in the partitions attribute of
+    the returned module, and the errors of the failed ones in failed_partitions.
+    Extra keyword arguments are passed to torch2trt for every engine, except
+    opt_shape_param and input / output names that only apply to the whole module.
+    """
+    for key in ['opt_shape_param', 'input_names', 'output_names']:
+        if key in kwargs:
+            print('%s is ignored for partitioned conversion.' % key)
+            kwargs.pop(key)
+
+    module = deepcopy(module)
+    convertible, io = _convertible_modules(module, inputs, min_segment_calls)
+    modules = dict(module.named_modules())
+    partitions = []
+    failed_partitions = {}
+
+    def convert(name):
+        # methods without any converter are not traced, so a segment may still fail to convert
+        module_inputs, _ = io[name][0]
+        try:
+            module_trt = torch2trt(modules[name], list(module_inputs), **kwargs)
+        except Exception as e:
+            print('Conversion of %s failed, converting its submodules instead.' % (name or 'the module'))
+            failed_partitions[name] = '%s: %s' % (type(e).__name__, e)
+            for child_name in _segments(modules[name], convertible, name):
+                convert(child_name)
+            return None
+        partitions.append(name)
+        if name != '':
+            _set_submodule(module, name, module_trt)
+        return module_trt
+
+    if convertible(''):
+        module_trt = convert('')
+        if module_trt is not None:
+            module_trt.partitions = partitions
+            module_trt.failed_partitions = failed_partitions
+            return module_trt
+    else:
+        for name in _segments(module, convertible):
+            convert(name)
+
+    module.partitions = partitions
+    module.failed_partitions = failed_partitions
+    return module
@@ -0,0 +1,87 @@
+import time
+import torch
+from .torch2trt import torch2trt
+
+
+def _flatten_outputs(outputs):
+    if isinstance(outputs, (tuple, list)):
+        return list(outputs)
+    return [outputs]
+
+
+def _max_error(outputs, outputs_ref):
+    return max(torch.max(torch.abs(output.float() - output_ref.float())).item()
+               for output, output_ref in zip(_flatten_outputs(outputs), _flatten_outputs(outputs_ref)))
+
+
+def _latency_ms(module, inputs, num_iters):
+    module(*inputs)  # warm up
+    torch.cuda.current_stream().synchronize()
+    t0 = time.time()
+    for i in range(num_iters):
+        module(*inputs)
+    torch.cuda.current_stream().synchronize()
+    t1 = time.time()
+    return 1000.0 * (t1 - t0) / num_iters
+
+
+def search_precision(module, inputs, tolerance, groups=None, validation_inputs=None, num_iters=50, **kwargs):
+    """Searches the layer groups that have to stay in fp32 for an fp16 engine to stay within tolerance.
+
+    groups are precision override keys (module or method names) and default to the
+    children of module, all other layers run in fp16. The groups are bisected: each
+    tested configuration is built, run on validation_inputs (inputs by default), and
+    its max absolute error against module is compared with tolerance. The search
+    assumes that moving more groups to fp32 does not increase the error.
+
+    Returns the precision_overrides of the fastest tested configuration within
+    tolerance, and the tested configurations as dicts with 'fp32_groups',
+    'max_error' and 'latency_ms'. The overrides are None if tolerance is not met
+    even with all groups in fp32.
+    """
+    if groups is None:
+        groups = [name for name, _ in module.named_children()]
+    if validation_inputs is None:
+        validation_inputs = inputs
+    kwargs['fp16_mode'] = True
+
+    with torch.no_grad():
+        outputs_ref = module(*validation_inputs)
+
+    results = {}
+
+    def within(fp32_groups):
+        key = frozenset(fp32_groups)
+        if key not in results:
+            overrides = {group: torch.float32 for group in fp32_groups}
+            module_trt = torch2trt(module, inputs, precision_overrides=overrides, **kwargs)
+            results[key] = {
+                'fp32_groups': [group for group in groups if group in key],
+                'max_error': _max_error(module_trt(*validation_inputs), outputs_ref),
+                'latency_ms': _latency_ms(module_trt, validation_inputs, num_iters),
+            }
+            print('fp32 groups: %s, max error: %.2E, latency: %.3f ms' % (
+                results[key]['fp32_groups'], results[key]['max_error'], results[key]['latency_ms']))
+        return results[key]['max_error'] <= tolerance
+
+    def search(candidates, required):
+        """Returns the candidates needed in fp32 when required is in fp32 too"""
+        if len(candidates) == 0 or within(required):
+            return []
+        if len(candidates) == 1:
+            return candidates
+        half = len(candidates) // 2
+        left, right = candidates[:half], candidates[half:]
+        left_needed = search(left, required + right)
+        right_needed = search(right, required + left_needed)
+        return left_needed + right_needed
+
+    if not within(groups):
+        return None, list(results.values())
+
+    search(list(groups), [])
+
+    passed = [result for result in results.values() if result['max_error'] <= tolerance]
+    fastest = min(passed, key=lambda result: result['latency_ms'])
+    overrides = {group: torch.float32 for group in fastest['fp32_groups']}
+    return overrides, list(results.values())
@@ -0,0 +1,123 @@
+import numpy as np
+import tensorrt as trt
+import torch
+
+
+LAYOUT_PERMUTATIONS = {
+    'NCHW': (0, 1, 2, 3),
+    'NHWC': (0, 3, 1, 2),  # raw dims read by each model dim
+}
+
+
+def normalize_preprocess_spec(spec):
+    """Fills the defaults of a preprocessing spec.
+
+    dtype: torch dtype of the raw input, layout: 'NHWC' or 'NCHW', mean / std: per
+    channel, in raw values, input_size: (height, width) of the raw images, resized
+    (bilinear) to the model input size when it differs.
+
+    >>> spec = normalize_preprocess_spec({'mean': [123.675, 116.28, 103.53], 'std': [58.395, 57.12, 57.375]})
+    >>> spec['dtype'], spec['layout'], spec['input_size']
+    (torch.uint8, 'NHWC', None)
+    """
+    spec = dict(spec)
+    spec.setdefault('dtype', torch.uint8)
+    spec.setdefault('layout', 'NHWC')
+    spec.setdefault('mean', None)
+    spec.setdefault('std', None)
+    spec.setdefault('input_size', None)
+    assert spec['layout'] in LAYOUT_PERMUTATIONS, 'Unknown layout %s' % spec['layout']
+    return spec
+
+
+def raw_input_shape(spec, shape):
+    """Returns the shape of the raw input for a model input shape (-1 for dynamic dims)
+
+    >>> raw_input_shape(normalize_preprocess_spec({'input_size': (720, 1280)}), (1, 3, 224, 224))
+    (1, 720, 1280, 3)
+    >>> raw_input_shape(normalize_preprocess_spec({'layout': 'NCHW'}), (-1, 3, 224, 224))
+    (-1, 3, 224, 224)
+    """
+    shape = list(shape)
+    if spec['input_size'] is not None:
+        shape[2:] = spec['input_size']
+    permutation = LAYOUT_PERMUTATIONS[spec['layout']]
+    raw_shape = [None] * len(shape)
+    for model_dim, raw_dim in enumerate(permutation):
+        raw_shape[raw_dim] = shape[model_dim]
+    return tuple(raw_shape)
+
+
+def add_preprocessing(network, spec, raw_trt, shape):
+    """Adds the layers turning the raw input into the model input of shape, returns the model input"""
+    input_trt = raw_trt
+    if raw_trt.dtype != trt.float32:
+        if hasattr(network, 'add_cast'):
+            layer = network.add_cast(input_trt, trt.float32)
+        else:
+            layer = network.add_identity(input_trt)
+            layer.set_output_type(0, trt.float32)
+        input_trt = layer.get_output(0)
+
+    permutation = LAYOUT_PERMUTATIONS[spec['layout']]
+    if permutation != tuple(range(len(permutation))):
+        layer = network.add_shuffle(input_trt)
+        layer.first_transpose = permutation
+        input_trt = layer.get_output(0)
+
+    if spec['input_size'] is not None and tuple(spec['input_size']) != tuple(shape[2:]):
+        assert all(s > 0 for s in shape[1:]), 'Resizing in the engine needs a static model input size'
+        layer = network.add_resize(input_trt)
+        if all(s > 0 for s in shape):
+            layer.shape = tuple(shape)
+        else:
+            # the batch of the input, then the model dims, float scales could round the size off by one
+            shape_trt = network.add_shape(input_trt).get_output(0)
+            batch_trt = network.add_slice(shape_trt, [0], [1], [1]).get_output(0)
+            dims_trt = network.add_constant((len(shape) - 1, ), np.array(shape[1:], dtype=np.int32)).get_output(0)
+            layer.set_input(1, network.add_concatenation([batch_trt, dims_trt]).get_output(0))
+        layer.resize_mode = trt.ResizeMode.LINEAR
+        if hasattr(trt, 'ResizeCoordinateTransformation'):
+            # like F.interpolate(mode='bilinear', align_corners=False) and cv2.resize
+            layer.coordinate_transformation = trt.ResizeCoordinateTransformation.HALF_PIXEL
+        else:
+            print('Warning: TensorRT < 8 resizes with asymmetric coordinates, the resized input differs slightly from F.interpolate.')
+            layer.align_corners = False
+        input_trt = layer.get_output(0)
+
+    if spec['mean'] is not None or spec['std'] is not None:
+        num_channels = shape[1]
+        mean = np.zeros(num_channels, dtype=np.float32) if spec['mean'] is None else np.array(spec['mean'], dtype=np.float32)
+        std = np.ones(num_channels, dtype=np.float32) if spec['std'] is None else np.array(spec['std'], dtype=np.float32)
+        # (x - mean) / std = x * (1 / std) - mean / std
+        scale = (1.0 / std).astype(np.float32)
+        shift = (-mean / std).astype(np.float32)
+        layer = network.add_scale(input_trt, trt.ScaleMode.CHANNEL, shift, scale, np.ones_like(scale))
+        input_trt = layer.get_output(0)
+
+    return input_trt
+
+
+def preprocess_tensor(spec, raw, size):
+    """Applies the preprocessing of spec in PyTorch, e.g. for calls running while the engine is rebuilt.
+
+    size is the (height, width) of the model input.
+    """
+    x = raw.float().permute(*LAYOUT_PERMUTATIONS[spec['layout']])
+    if tuple(x.shape[2:]) != tuple(size):
+        x = torch.nn.functional.interpolate(x, size=tuple(size), mode='bilinear', align_corners=False)
+    if spec['mean'] is not None:
+        x = x - torch.tensor(spec['mean'], dtype=x.dtype, device=x.device).view(1, -1, 1, 1)
+    if spec['std'] is not None:
+        x = x / torch.tensor(spec['std'], dtype=x.dtype, device=x.device).view(1, -1, 1, 1)
+    return x
+
+
+def preprocess_metadata(spec):
+    """Returns the spec with plain python values, recorded in TRTModule.metadata"""
+    metadata = dict(spec)
+    metadata['dtype'] = str(spec['dtype'])
+    for key in ['mean', 'std', 'input_size']:
+        if metadata[key] is not None:
+            metadata[key] = [float(v) if key != 'input_size' else int(v) for v in metadata[key]]
+    return metadata
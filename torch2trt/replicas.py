@@ -0,0 +1,139 @@
+import threading
+import torch
+from .torch2trt import TRTModule
+
+
+class RoundRobinPolicy(object):
+    """Dispatches requests to each replica in turn"""
+
+    def __init__(self):
+        self.next_index = 0
+
+    def select(self, replicas):
+        replica = replicas[self.next_index % len(replicas)]
+        self.next_index += 1
+        return replica
+
+
+class LeastOutstandingPolicy(object):
+    """Dispatches requests to the replica with the fewest requests in flight"""
+
+    def select(self, replicas):
+        return min(replicas, key=lambda replica: (replica.outstanding, replica.dispatched))
+
+
+DISPATCH_POLICIES = {
+    'round_robin': RoundRobinPolicy,
+    'least_outstanding': LeastOutstandingPolicy,
+}
+
+
+class Replica(object):
+    """One copy of an engine, its execution context and stream, bound to a device"""
+
+    def __init__(self, device, module=None, stream=None):
+        self.device = device
+        self.module = module
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.outstanding = 0
+        self.dispatched = 0
+
+
+class ReplicaPool(object):
+    """Selects replicas with a dispatch policy and tracks outstanding work.
+
+    The pool never touches the replica device, module or stream, so it can be
+    driven with fake replicas.
+    """
+
+    def __init__(self, replicas, policy='round_robin'):
+        if isinstance(policy, str):
+            policy = DISPATCH_POLICIES[policy]()
+        self.replicas = replicas
+        self.policy = policy
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            replica = self.policy.select(self.replicas)
+            replica.outstanding += 1
+            replica.dispatched += 1
+        return replica
+
+    def release(self, replica):
+        with self.lock:
+            replica.outstanding -= 1
+
+
+def _cuda_devices(devices):
+    if devices is None:
+        devices = range(torch.cuda.device_count())
+    return [torch.device('cuda', d) if isinstance(d, int) else torch.device(d) for d in devices]
+
+
+class TRTReplicaModule(torch.nn.Module):
+    """Runs one serialized engine on several GPUs.
+
+    The engine is deserialized once per device, each replica owns its own
+    execution context and stream, and every call is dispatched to a single
+    replica. Inputs are moved to the selected device and the outputs are
+    returned on that device.
+    """
+
+    def __init__(self, module_trt=None, devices=None, policy='round_robin'):
+        super(TRTReplicaModule, self).__init__()
+        self._register_state_dict_hook(TRTReplicaModule._on_state_dict)
+        self.devices = devices
+        self.policy = policy
+        self.pool = None
+        if module_trt is not None:
+            self._create_replicas(module_trt.state_dict())
+
+    def _create_replicas(self, module_state):
+        replicas = []
+        for device in _cuda_devices(self.devices):
+            with torch.cuda.device(device):
+                module = TRTModule()
+                module.load_state_dict(module_state)
+                replicas.append(Replica(device, module, torch.cuda.Stream(device)))
+        self.pool = ReplicaPool(replicas, self.policy)
+
+    @property
+    def replicas(self):
+        return self.pool.replicas
+
+    def _on_state_dict(self, state_dict, prefix, local_metadata):
+        # stored in TRTModule layout, so the state can also be loaded by a single TRTModule
+        module_state = self.replicas[0].module.state_dict()
+        for key, value in module_state.items():
+            state_dict[prefix + key] = value
+        state_dict[prefix + 'devices'] = [str(replica.device) for replica in self.replicas]
+
+    def _load_from_state_dict(self, state_dict, prefix, local_metadata, strict, missing_keys, unexpected_keys, error_msgs):
+        module_state = {}
+        for key, value in state_dict.items():
+            if key.startswith(prefix):
+                module_state[key[len(prefix):]] = value
+        devices = module_state.pop('devices', None)
+        if self.devices is None:
+            self.devices = devices
+        self._create_replicas(module_state)
+
+    def forward(self, *inputs):
+        replica = self.pool.acquire()
+        try:
+            with replica.lock:
+                # inputs may still be written by the producer's stream
+                for tensor in inputs:
+                    if tensor.is_cuda:
+                        replica.stream.wait_stream(torch.cuda.current_stream(tensor.device))
+
+                with torch.cuda.device(replica.device), torch.cuda.stream(replica.stream):
+                    inputs = tuple(tensor.to(replica.device, non_blocking=True) for tensor in inputs)
+                    outputs = replica.module(*inputs)
+                replica.stream.synchronize()
+        finally:
+            self.pool.release(replica)
+
+        return outputs
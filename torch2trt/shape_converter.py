@@ -1,23 +1,42 @@
+import threading
+from contextvars import ContextVar
 import torch
 
 
-def get_tensor_shape(self):
-    return self.size()
+# Tensor.shape returns Tensor.size() while a ShapeConverter is active in the calling thread,
+# so the size converter sees the shape queries
+_active = ContextVar('torch2trt_shape_converter_active', default=False)
+_tensor_shape = torch.Tensor.shape
+_own_shape = 'shape' in torch.Tensor.__dict__  # False if inherited from the C base class
+_num_entered = 0
+_lock = threading.Lock()
+
 
+def get_tensor_shape(self):
+    if _active.get():
+        return self.size()
+    return _tensor_shape.__get__(self, type(self))
 
-old_get_attribute = torch.Tensor.__getattribute__
-def new_getattribute__(self, name):
-    if name is 'shape':
-        return get_tensor_shape(self)
-    else:
-        return old_get_attribute(self, name)
 
 class ShapeConverter:
     def __init__(self):
-        pass
+        self.tokens = []
 
     def __enter__(self):
-        torch.Tensor.__getattribute__ = new_getattribute__
+        global _num_entered
+        self.tokens.append(_active.set(True))
+        with _lock:
+            if _num_entered == 0:
+                torch.Tensor.shape = property(get_tensor_shape)
+            _num_entered += 1
 
     def __exit__(self, type, val, tb):
-        torch.Tensor.__getattribute__ = old_get_attribute
\ No newline at end of file
+        global _num_entered
+        with _lock:
+            _num_entered -= 1
+            if _num_entered == 0:
+                if _own_shape:
+                    torch.Tensor.shape = _tensor_shape
+                else:
+                    del torch.Tensor.shape
+        _active.reset(self.tokens.pop())
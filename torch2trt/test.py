@@ -4,9 +4,43 @@ import time
 import argparse
 import re
 import runpy
+import sys
+import doctest
+import importlib
+import traceback
 from termcolor import colored
 
 
+# modules whose docstring examples are run by --unit
+DOCTEST_MODULES = [
+    'torch2trt.workspace',
+    'torch2trt.arena',
+    'torch2trt.compatibility',
+    'torch2trt.preprocess',
+]
+
+# modules whose test_* functions are run by --unit
+UNIT_TEST_MODULES = [
+    'torch2trt.tests.unit.arena',
+    'torch2trt.tests.unit.archive',
+    'torch2trt.tests.unit.conversion_context',
+    'torch2trt.tests.unit.coverage',
+    'torch2trt.tests.unit.exview',
+    'torch2trt.tests.unit.fold_batchnorm',
+    'torch2trt.tests.unit.fx_frontend',
+    'torch2trt.tests.unit.graph',
+    'torch2trt.tests.unit.meta_tracing',
+    'torch2trt.tests.unit.partition',
+    'torch2trt.tests.unit.precision',
+    'torch2trt.tests.unit.preprocess',
+    'torch2trt.tests.unit.rebuild',
+    'torch2trt.tests.unit.refit',
+    'torch2trt.tests.unit.replicas',
+    'torch2trt.tests.unit.weights',
+    'torch2trt.tests.unit.workspace',
+]
+
+
 def run(self):
     # create module
     module = self.module_fn()
@@ -84,6 +118,36 @@ def run(self):
     ms_trt = 1000.0 * (t1 - t0) / 50.0
     
     return max_error, fps, fps_trt, ms, ms_trt
+
+
+
+def run_unit_tests(name):
+    """Runs the doctests and unit tests of the modules matching name, returns the number of failures"""
+    num_failed = 0
+    for module_name in DOCTEST_MODULES:
+        if not re.search(name, module_name):
+            continue
+        result = doctest.testmod(importlib.import_module(module_name))
+        line = '| %s | doctest | %d / %d passed |' % (module_name, result.attempted - result.failed, result.attempted)
+        print(colored(line, 'red') if result.failed > 0 else line)
+        num_failed += result.failed
+
+    for module_name in UNIT_TEST_MODULES:
+        if not re.search(name, module_name):
+            continue
+        module = importlib.import_module(module_name)
+        for test_name in sorted(dir(module)):
+            if not test_name.startswith('test_'):
+                continue
+            try:
+                getattr(module, test_name)()
+                print('| %s.%s | passed |' % (module_name, test_name))
+            except Exception:
+                traceback.print_exc()
+                print(colored('| %s.%s | failed |' % (module_name, test_name), 'red'))
+                num_failed += 1
+
+    return num_failed
         
         
 if __name__ == '__main__':
@@ -93,7 +157,11 @@ if __name__ == '__main__':
     parser.add_argument('--name', help='Regular expression to filter modules to test by name', type=str, default='.*')
     parser.add_argument('--tolerance', help='Maximum error to print warning for entry', type=float, default='-1')
     parser.add_argument('--include', help='Addition python file to include defining additional tests', action='append', default=[])
+    parser.add_argument('--unit', help='Run the unit tests and doctests instead of the module tests', action='store_true')
     args = parser.parse_args()
+
+    if args.unit:
+        sys.exit(1 if run_unit_tests(args.name) > 0 else 0)
     
     for include in args.include:
         runpy.run_module(include)
@@ -0,0 +1,35 @@
+import time
+import torch
+from torch2trt import torch2trt
+
+
+class ChunkSum(torch.nn.Module):
+    def __init__(self, chunks, dim=1):
+        super(ChunkSum, self).__init__()
+        self.chunks = chunks
+        self.dim = dim
+
+    def forward(self, x):
+        return torch.cat([torch.relu(c) for c in x.chunk(self.chunks, self.dim)], self.dim)
+
+
+if __name__ == '__main__':
+    # builder time and layer count of the chunk lowering versus the number of chunks
+    print('| chunks | chunk dim | layers | build s | max error |')
+    for chunks in [2, 4, 8, 16, 32, 64]:
+        for dynamic in [False, True]:
+            module = ChunkSum(chunks).cuda().eval()
+            inputs = (torch.randn(1, 256, 32, 32).cuda(), )
+            opt_shape_param = [[
+                [1, 128 if dynamic else 256, 16, 16],
+                [1, 256, 32, 32],
+                [1, 512 if dynamic else 256, 64, 64],
+            ]]
+
+            t0 = time.time()
+            module_trt = torch2trt(module, inputs, opt_shape_param=opt_shape_param, max_workspace_size=1 << 30)
+            t1 = time.time()
+            max_error = torch.max(torch.abs(module(*inputs) - module_trt(*inputs))).item()
+
+            print('| %d | %s | %d | %.3f | %.2E |' % (
+                chunks, 'dynamic' if dynamic else 'static', module_trt.network.num_layers, t1 - t0, max_error))
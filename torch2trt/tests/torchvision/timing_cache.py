@@ -0,0 +1,36 @@
+from torch2trt import *
+import os
+import re
+import argparse
+import tempfile
+from torch2trt.module_test import MODULE_TESTS
+from . import classification
+
+
+def build_seconds(test, **kwargs):
+    module = test.module_fn().to(test.device).type(test.dtype).eval()
+    inputs = [torch.zeros(shape).to(test.device).type(test.dtype) for shape in test.input_shapes]
+    kwargs.update(test.torch2trt_kwargs)
+    kwargs.setdefault('max_workspace_size', 1 << 28)
+    module_trt = torch2trt(module, inputs, **kwargs)
+    return module_trt.conversion_stats['build_seconds']
+
+
+if __name__ == '__main__':
+    # builder time of the torchvision models without, with an empty, and with a filled timing cache
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--name', help='Regular expression to filter modules to test by name', type=str, default='.*')
+    args = parser.parse_args()
+
+    cache_path = os.path.join(tempfile.mkdtemp(), 'timing.cache')
+
+    print('| model | no cache s | cold cache s | warm cache s | saved |')
+    for test in MODULE_TESTS:
+        name = test.module_name()
+        if not re.search(args.name, name):
+            continue
+
+        t_none = build_seconds(test)
+        t_cold = build_seconds(test, timing_cache=cache_path)
+        t_warm = build_seconds(test, timing_cache=cache_path)
+        print('| %s | %.2f | %.2f | %.2f | %.0f%% |' % (name, t_none, t_cold, t_warm, 100.0 * (1.0 - t_warm / t_none)))
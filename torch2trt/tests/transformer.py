@@ -0,0 +1,127 @@
+import time
+import torch
+from torch2trt import torch2trt
+from torch2trt.module_test import add_module_test
+
+
+class MLPBlock(torch.nn.Module):
+    def __init__(self, dim=256, hidden_dim=1024):
+        super(MLPBlock, self).__init__()
+        self.fc1 = torch.nn.Linear(dim, hidden_dim)
+        self.fc2 = torch.nn.Linear(hidden_dim, dim)
+
+    def forward(self, x):
+        return x + self.fc2(torch.relu(self.fc1(x)))
+
+
+class AttentionBlock(torch.nn.Module):
+    def __init__(self, dim=256, num_heads=8):
+        super(AttentionBlock, self).__init__()
+        self.num_heads = num_heads
+        self.head_dim = dim // num_heads
+        self.q = torch.nn.Linear(dim, dim)
+        self.k = torch.nn.Linear(dim, dim)
+        self.v = torch.nn.Linear(dim, dim)
+        self.proj = torch.nn.Linear(dim, dim)
+
+    def _split_heads(self, x):
+        n, l, _ = x.shape
+        return x.view(n, l, self.num_heads, self.head_dim).permute(0, 2, 1, 3)
+
+    def forward(self, x):
+        n, l, c = x.shape
+        q = self._split_heads(self.q(x)) * (self.head_dim ** -0.5)
+        k = self._split_heads(self.k(x))
+        v = self._split_heads(self.v(x))
+        attn = torch.softmax(torch.matmul(q, k.transpose(2, 3)), dim=-1)
+        y = torch.matmul(attn, v).permute(0, 2, 1, 3).reshape(n, l, c)
+        return x + self.proj(y)
+
+
+class FusedAttentionBlock(torch.nn.Module):
+    def __init__(self, dim=256, num_heads=8):
+        super(FusedAttentionBlock, self).__init__()
+        self.attention = torch.nn.MultiheadAttention(dim, num_heads, batch_first=True)
+
+    @classmethod
+    def from_decomposed(cls, block):
+        fused = cls(block.q.in_features, block.num_heads)
+        with torch.no_grad():
+            fused.attention.in_proj_weight.copy_(torch.cat([block.q.weight, block.k.weight, block.v.weight]))
+            fused.attention.in_proj_bias.copy_(torch.cat([block.q.bias, block.k.bias, block.v.bias]))
+            fused.attention.out_proj.weight.copy_(block.proj.weight)
+            fused.attention.out_proj.bias.copy_(block.proj.bias)
+        return fused
+
+    def forward(self, x):
+        return x + self.attention(x, x, x, need_weights=False)[0]
+
+
+@add_module_test(torch.float16, torch.device('cuda'), [(1, 128, 256)], fp16_mode=True)
+@add_module_test(torch.float16, torch.device('cuda'), [(8, 128, 256)], fp16_mode=True)
+def mlp_block():
+    return MLPBlock()
+
+
+@add_module_test(torch.float16, torch.device('cuda'), [(1, 128, 256)], fp16_mode=True)
+@add_module_test(torch.float16, torch.device('cuda'), [(8, 128, 256)], fp16_mode=True)
+def attention_block():
+    return AttentionBlock()
+
+
+@add_module_test(torch.float16, torch.device('cuda'), [(1, 128, 256)], fp16_mode=True)
+@add_module_test(torch.float16, torch.device('cuda'), [(8, 128, 256)], fp16_mode=True)
+def fused_attention_block():
+    return FusedAttentionBlock()
+
+
+def benchmark(module, inputs, num_iters=50):
+    torch.cuda.current_stream().synchronize()
+    t0 = time.time()
+    for i in range(num_iters):
+        module(*inputs)
+    torch.cuda.current_stream().synchronize()
+    t1 = time.time()
+    return 1000.0 * (t1 - t0) / num_iters
+
+
+if __name__ == '__main__':
+    # compares the 1x1 convolution and matrix multiply lowerings of torch.nn.Linear
+    import importlib
+    linear_converter = importlib.import_module('torch2trt.converters.Linear')
+    default_min_rows = linear_converter.LINEAR_GEMM_MIN_ROWS
+
+    print('| module | input shape | conv ms | gemm ms | max error conv | max error gemm |')
+    for module_fn in [mlp_block, attention_block]:
+        for shape in [(1, 128, 256), (8, 128, 256), (32, 128, 256)]:
+            module = module_fn().cuda().half().eval()
+            inputs = (torch.randn(shape).cuda().half(), )
+            output = module(*inputs)
+
+            results = []
+            for min_rows in [float('inf'), 0]:
+                linear_converter.LINEAR_GEMM_MIN_ROWS = min_rows
+                module_trt = torch2trt(module, inputs, fp16_mode=True, max_workspace_size=1 << 30)
+                max_error = torch.max(torch.abs(output - module_trt(*inputs))).item()
+                results += [benchmark(module_trt, inputs), max_error]
+            linear_converter.LINEAR_GEMM_MIN_ROWS = default_min_rows
+
+            print('| %s | %s | %.3f | %.3f | %.2E | %.2E |' % (
+                (module_fn.__name__, str(shape)) + (results[0], results[2], results[1], results[3])))
+
+    # compares the fused MultiheadAttention converter against the same block built from matmul/softmax ops
+    print('')
+    print('| input shape | decomposed layers | fused layers | decomposed ms | fused ms | max error fused |')
+    for shape in [(1, 128, 256), (8, 128, 256), (32, 128, 256)]:
+        decomposed = attention_block().cuda().half().eval()
+        fused = FusedAttentionBlock.from_decomposed(decomposed).cuda().half().eval()
+        inputs = (torch.randn(shape).cuda().half(), )
+        output = decomposed(*inputs)
+
+        decomposed_trt = torch2trt(decomposed, inputs, fp16_mode=True, max_workspace_size=1 << 30)
+        fused_trt = torch2trt(fused, inputs, fp16_mode=True, max_workspace_size=1 << 30)
+        max_error = torch.max(torch.abs(output - fused_trt(*inputs))).item()
+
+        print('| %s | %d | %d | %.3f | %.3f | %.2E |' % (
+            str(shape), decomposed_trt.network.num_layers, fused_trt.network.num_layers,
+            benchmark(decomposed_trt, inputs), benchmark(fused_trt, inputs), max_error))
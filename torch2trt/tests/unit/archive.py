@@ -0,0 +1,73 @@
+import os
+import json
+import tempfile
+from torch2trt.archive import EngineArchive, _read_header
+from torch2trt.tests.unit.helpers import FakeModule
+
+
+def _archive_path():
+    return os.path.join(tempfile.mkdtemp(), 'engines.t2t')
+
+
+def test_append_replace_remove():
+    archive = EngineArchive(_archive_path())
+    archive.append('a', FakeModule(data=b'a' * 5000))
+    archive.append('b', FakeModule(data=b'b' * 3000))
+    archive.append('a', FakeModule(data=b'A' * 100))
+    assert sorted(archive.names()) == ['a', 'b']
+    assert archive.info('a')['size'] == 100
+    assert archive.verify('a') and archive.verify('b')
+
+    archive.remove('b')
+    assert archive.names() == ['a']
+    assert EngineArchive(archive.path).names() == ['a']
+
+
+def test_index_reloaded_after_compact_in_other_instance():
+    path = _archive_path()
+    first = EngineArchive(path)
+    first.append('a', FakeModule(data=b'a' * 5000))
+    first.append('b', FakeModule(data=b'b' * 3000))
+
+    second = EngineArchive(path)
+    second.remove('a')
+    second.compact()
+
+    # first still holds the index from before the compaction
+    assert first.verify('b')
+    assert first.names() == ['b']
+
+
+def test_index_reloaded_after_append_in_other_instance():
+    path = _archive_path()
+    first = EngineArchive(path)
+    second = EngineArchive(path)
+    second.append('a', FakeModule(data=b'a' * 10))
+    assert first.verify('a')
+
+
+def test_garbage_bytes():
+    archive = EngineArchive(_archive_path())
+    archive.append('a', FakeModule(data=b'a' * 5000))
+    archive.compact()
+    assert archive.garbage_bytes() == 0  # alignment padding is not garbage
+
+    archive.append('b', FakeModule(data=b'b' * 3000))
+    archive.remove('a')
+    assert archive.garbage_bytes() >= 5000
+
+    archive.compact()
+    assert archive.garbage_bytes() == 0
+    assert archive.verify('b')
+
+
+def test_append_writes_only_its_record():
+    archive = EngineArchive(_archive_path())
+    for name in ['a', 'b', 'c']:
+        archive.append(name, FakeModule(data=name.encode() * 10))
+    with open(archive.path, 'rb') as f:
+        offset, size, generation = _read_header(f)
+        f.seek(offset)
+        assert list(json.loads(f.read(size).decode('utf-8'))['entries']) == ['c']
+    assert generation == 3
+    assert EngineArchive(archive.path).names() == ['a', 'b', 'c']
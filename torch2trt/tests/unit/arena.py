@@ -0,0 +1,72 @@
+import gc
+import threading
+import torch
+from torch2trt.arena import DeviceMemoryArena
+from torch2trt.tests.unit.helpers import FakeModule, assert_raises
+
+
+def test_attach_plans_slots():
+    arena = DeviceMemoryArena(max_concurrent=2)
+    modules = [arena.attach(FakeModule(size)) for size in [1000, 300, 5000]]
+    assert arena.plan() == [(0, 5120), (5120, 1024)]
+    assert all(m.context == 'arena memory' and m.arena is arena for m in modules)
+
+
+def test_detach():
+    arena = DeviceMemoryArena(max_concurrent=2)
+    small, large = arena.attach(FakeModule(300)), arena.attach(FakeModule(5000))
+    arena.detach(large)
+    assert arena.plan() == [(0, 512)]
+    assert large.context == 'own memory' and large.arena is None
+    assert_raises(ValueError, arena.detach, large)
+
+
+def test_collected_module_released():
+    arena = DeviceMemoryArena(max_concurrent=1)
+    small, large = arena.attach(FakeModule(300)), arena.attach(FakeModule(5000))
+    del large
+    gc.collect()
+    assert arena.plan() == [(0, 512)]
+
+
+def test_reserve_replans_after_attach():
+    if not torch.cuda.is_available():
+        return
+    arena = DeviceMemoryArena(max_concurrent=1)
+    small = arena.attach(FakeModule(300))
+    with arena.reserve(small):
+        pass
+    small_size = arena.size
+
+    large = arena.attach(FakeModule(1 << 20))
+    with arena.reserve(small):
+        pass
+    assert arena.size > small_size
+
+
+def test_attach_waits_for_calls_in_flight():
+    if not torch.cuda.is_available():
+        return
+    arena = DeviceMemoryArena(max_concurrent=2)
+    first = arena.attach(FakeModule(300))
+    attached = []
+    thread = threading.Thread(target=lambda: attached.append(arena.attach(FakeModule(300))))
+    with arena.reserve(first):
+        assert_raises(RuntimeError, arena.attach, FakeModule(300), timeout=0.01)
+        thread.start()
+        thread.join(timeout=0.1)
+        assert thread.is_alive() and len(attached) == 0
+    thread.join()
+    assert len(attached) == 1 and len(arena.sizes) == 2
+    assert arena.active == 0 and arena.pending == 0
+
+
+def test_reserve_unattached_module_fails():
+    arena = DeviceMemoryArena()
+    arena.attach(FakeModule(300))
+
+    def reserve(module):
+        with arena.reserve(module):
+            pass
+
+    assert_raises(ValueError, reserve, FakeModule(300))
@@ -0,0 +1,83 @@
+import threading
+import torch
+from torch2trt import torch2trt
+from torch2trt.torch2trt import CONVERTERS, _installed_hooks, current_context
+
+
+# set by each converting thread once its context is active, the main thread releases them
+_arrived = [threading.Event(), threading.Event()]
+_release = threading.Event()
+
+
+class Rendezvous(torch.nn.Module):
+    """Blocks the forward of a conversion until the main thread has checked the hooks"""
+
+    def __init__(self, index):
+        super(Rendezvous, self).__init__()
+        self.index = index
+
+    def forward(self, x):
+        _arrived[self.index].set()
+        assert _release.wait(timeout=60)
+        return x
+
+
+def _patchable_attributes():
+    attributes = {}
+    for method in CONVERTERS:
+        if not method.startswith('torch.'):
+            continue
+        try:
+            attributes[method] = eval(method)
+        except AttributeError:
+            pass
+    return attributes
+
+
+def test_concurrent_conversions():
+    for event in _arrived + [_release]:
+        event.clear()
+    original_attributes = _patchable_attributes()
+    original_relu = torch.relu
+    original_shape = torch.Tensor.__dict__.get('shape')
+
+    modules = [
+        torch.nn.Sequential(Rendezvous(0), torch.nn.Conv2d(3, 4, 3), torch.nn.ReLU()).cuda().eval(),
+        torch.nn.Sequential(Rendezvous(1), torch.nn.Conv2d(3, 8, 1), torch.nn.Sigmoid()).cuda().eval(),
+    ]
+    x = torch.randn(1, 3, 16, 16).cuda()
+    results = [None, None]
+
+    def convert(index):
+        try:
+            results[index] = torch2trt(modules[index], [x])
+        except Exception as e:
+            results[index] = e
+            _arrived[index].set()
+
+    threads = [threading.Thread(target=convert, args=(i, )) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    try:
+        assert all(event.wait(timeout=60) for event in _arrived)
+        assert not any(isinstance(result, Exception) for result in results), results
+
+        # both contexts share the patches, this thread has no context and runs the original methods
+        assert torch.relu is not original_relu
+        assert _installed_hooks['torch.relu'][1] == 2
+        assert current_context() is None
+        y = torch.relu(x - 0.5)
+        assert not hasattr(y, '_trt')
+        assert torch.equal(y, original_relu(x - 0.5))
+    finally:
+        _release.set()
+        for thread in threads:
+            thread.join()
+
+    for module, module_trt in zip(modules, results):
+        assert not isinstance(module_trt, Exception), module_trt
+        assert torch.allclose(module_trt(x), module(x), atol=1e-4)
+
+    assert len(_installed_hooks) == 0
+    assert _patchable_attributes() == original_attributes
+    assert torch.Tensor.__dict__.get('shape') is original_shape
@@ -0,0 +1,67 @@
+import io
+import os
+import runpy
+import tempfile
+import contextlib
+import torch
+from torch2trt import trace_calls, converter_coverage, print_coverage
+
+
+# call sites inside the torch2trt package are skipped, so the model lives in a user file
+MODEL_SOURCE = '''
+import torch
+
+
+class CumsumHead(torch.nn.Module):
+    def __init__(self):
+        super(CumsumHead, self).__init__()
+        self.conv = torch.nn.Conv2d(3, 3, 1)
+
+    def forward(self, x):
+        return torch.cumsum(self.conv(x), 1)
+'''
+
+CUMSUM_LINE = 11
+
+
+def _user_model():
+    path = os.path.join(tempfile.mkdtemp(), 'user_model.py')
+    with open(path, 'w') as f:
+        f.write(MODEL_SOURCE)
+    return runpy.run_path(path)['CumsumHead']().eval(), '%s:%d in forward' % (path, CUMSUM_LINE)
+
+
+def _inputs():
+    return [torch.randn(1, 3, 4, 4)]
+
+
+def test_trace_calls_lists_unsupported_method():
+    module, call_site = _user_model()
+    calls = trace_calls(module, _inputs())
+    unsupported = [call for call in calls if not call['supported']]
+    assert [call['method'] for call in unsupported] == ['torch.cumsum']
+    assert unsupported[0]['modules'] == ('', )
+    assert unsupported[0]['call_site'] == call_site
+    assert any(call['supported'] and call['modules'] == ('', 'conv') for call in calls)
+
+
+def test_converter_coverage():
+    module, call_site = _user_model()
+    assert converter_coverage(module, _inputs()) == {'torch.cumsum': [call_site]}
+    assert converter_coverage(torch.nn.Conv2d(3, 3, 1), _inputs()) == {}
+
+
+def test_print_coverage():
+    module, call_site = _user_model()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        print_coverage(module, _inputs())
+    assert output.getvalue().splitlines() == ['Unsupported methods:', '  torch.cumsum', '    ' + call_site]
+
+
+def test_unsupported_module_configuration():
+    x = torch.randn(4, 1, 8)
+    supported = torch.nn.MultiheadAttention(8, 2).eval()
+    unsupported = torch.nn.MultiheadAttention(8, 2, add_bias_kv=True).eval()
+    assert converter_coverage(supported, [x, x, x]) == {}
+    assert list(converter_coverage(unsupported, [x, x, x]).keys()) == ['torch.nn.MultiheadAttention.forward']
@@ -0,0 +1,27 @@
+from torch2trt.converters.exview import compile_exview
+from torch2trt.tests.unit.helpers import assert_raises
+
+
+def test_multiplication_binds_tighter():
+    assert compile_exview('a0+b1*2') == ('+', ('dim', 0, 0), ('*', ('dim', 1, 1), ('num', 2)))
+    assert compile_exview('a0*2+b1') == ('+', ('*', ('dim', 0, 0), ('num', 2)), ('dim', 1, 1))
+
+
+def test_left_associative():
+    assert compile_exview('a0-a1-a2') == ('-', ('-', ('dim', 0, 0), ('dim', 0, 1)), ('dim', 0, 2))
+    assert compile_exview('a0/2/a1') == ('/', ('/', ('dim', 0, 0), ('num', 2)), ('dim', 0, 1))
+
+
+def test_parentheses():
+    assert compile_exview('(a0+1)/2*a1') == \
+        ('*', ('/', ('+', ('dim', 0, 0), ('num', 1)), ('num', 2)), ('dim', 0, 1))
+    assert compile_exview('a0*(a1-a2)') == ('*', ('dim', 0, 0), ('-', ('dim', 0, 1), ('dim', 0, 2)))
+
+
+def test_whitespace_and_multi_digit():
+    assert compile_exview(' a12 + 128 ') == ('+', ('dim', 0, 12), ('num', 128))
+
+
+def test_errors():
+    for exp in ['a0+', '(a0+1', 'a0)', 'a+1', 'a0 % 2', 'a0 a1']:
+        assert_raises(ValueError, compile_exview, exp)
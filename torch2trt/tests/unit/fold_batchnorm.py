@@ -0,0 +1,58 @@
+import torch
+from torch2trt.fold_batchnorm import fold_batchnorm_modules
+
+
+class ConvBn(torch.nn.Module):
+    def __init__(self, residual=False, return_conv=False):
+        super(ConvBn, self).__init__()
+        self.conv = torch.nn.Conv2d(3, 3, 3, padding=1)
+        self.bn = torch.nn.BatchNorm2d(3)
+        self.residual = residual
+        self.return_conv = return_conv
+
+    def forward(self, x):
+        y = self.conv(x)
+        z = self.bn(y)
+        if self.residual:
+            return z + y
+        if self.return_conv:
+            return z, y
+        return z
+
+
+def _eval_module(**kwargs):
+    module = ConvBn(**kwargs)
+    with torch.no_grad():
+        module.bn.running_mean.uniform_(-1, 1)
+        module.bn.running_var.uniform_(0.5, 2)
+        module.bn.weight.uniform_(0.5, 2)
+        module.bn.bias.uniform_(-1, 1)
+    return module.eval()
+
+
+def _outputs(module, x):
+    with torch.no_grad():
+        outputs = module(x)
+    return outputs if isinstance(outputs, tuple) else (outputs, )
+
+
+def _check_fold(expected_count, **kwargs):
+    module = _eval_module(**kwargs)
+    x = torch.randn(2, 3, 8, 8)
+    folded, count = fold_batchnorm_modules(module, [x])
+    assert count == expected_count
+    assert isinstance(folded.bn, torch.nn.Identity) == (expected_count == 1)
+    for output, folded_output in zip(_outputs(module, x), _outputs(folded, x)):
+        assert torch.allclose(output, folded_output, atol=1e-5)
+
+
+def test_conv_bn_folded():
+    _check_fold(1)
+
+
+def test_conv_output_read_by_residual_not_folded():
+    _check_fold(0, residual=True)
+
+
+def test_conv_output_returned_not_folded():
+    _check_fold(0, return_conv=True)
@@ -0,0 +1,54 @@
+import torch
+from torch2trt import torch2trt
+from torch2trt import fx_frontend
+from torch2trt.fx_frontend import capture_graph
+
+
+class ScaleSum(torch.nn.Module):
+    def __init__(self, scale, dim):
+        super(ScaleSum, self).__init__()
+        self.scale = scale
+        self.dim = dim
+
+    def forward(self, x):
+        return (x * self.scale).sum(self.dim)
+
+
+def test_graph_not_shared_by_instances_with_different_attributes():
+    x = torch.randn(1, 3, 4, 5)
+    first, second = ScaleSum(2.0, 1), ScaleSum(3.0, 2)
+    first_graph, second_graph = capture_graph(first, 1), capture_graph(second, 1)
+    assert torch.allclose(first_graph(x), first(x))
+    assert torch.allclose(second_graph(x), second(x))
+
+
+def test_graph_copied_for_identical_instances():
+    x = torch.randn(1, 3, 4, 5)
+    first, second = ScaleSum(2.0, 1), ScaleSum(2.0, 1)
+    first_graph, second_graph = capture_graph(first, 1), capture_graph(second, 1)
+    assert first_graph.graph is not second_graph.graph
+    assert first_graph.graph.owning_module is first_graph
+    assert second_graph.graph.owning_module is second_graph
+    assert torch.allclose(second_graph(x), second(x))
+
+
+def test_graph_cache_bounded():
+    x = torch.randn(1, 3, 4, 5)
+    size = fx_frontend.FX_GRAPH_CACHE_SIZE
+    fx_frontend.FX_GRAPH_CACHE_SIZE = 2
+    try:
+        modules = [ScaleSum(float(scale), 1) for scale in range(4)]
+        for module in modules:
+            capture_graph(module, 1)
+        assert len(fx_frontend.FX_GRAPH_CACHE) == 2
+        assert torch.allclose(capture_graph(modules[0], 1)(x), modules[0](x))
+    finally:
+        fx_frontend.FX_GRAPH_CACHE_SIZE = size
+
+
+def test_convert_instances_with_different_attributes():
+    x = torch.randn(1, 3, 4, 5).cuda()
+    for module in [ScaleSum(2.0, 1), ScaleSum(3.0, 2)]:
+        module = module.cuda().eval()
+        module_trt = torch2trt(module, [x], frontend='fx')
+        assert torch.allclose(module_trt(x), module(x), atol=1e-4)
@@ -0,0 +1,156 @@
+import numpy as np
+import tensorrt as trt
+from torch2trt.graph import NetworkGraph, eliminate_shuffles, run_rewriters, run_graph_passes, _array
+
+
+class Network(object):
+    """An explicit batch network, holding the builder it was created with"""
+
+    def __init__(self):
+        self.logger = trt.Logger()
+        self.builder = trt.Builder(self.logger)
+        self.network = self.builder.create_network(1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH))
+
+    def input(self, shape):
+        return self.network.add_input('input', trt.float32, shape)
+
+    def shuffle(self, tensor, first_transpose=None, reshape_dims=None):
+        layer = self.network.add_shuffle(tensor)
+        if first_transpose is not None:
+            layer.first_transpose = first_transpose
+        if reshape_dims is not None:
+            layer.reshape_dims = reshape_dims
+        return layer
+
+    def relu(self, tensor):
+        return self.network.add_activation(tensor, trt.ActivationType.RELU)
+
+    def channel_scale(self, tensor, scale, shift):
+        power = np.ones_like(scale)
+        return self.network.add_scale(tensor, trt.ScaleMode.CHANNEL, shift, scale, power)
+
+
+def _permutation(layer_permutation, ndims):
+    return tuple(layer_permutation[i] for i in range(ndims))
+
+
+def test_inverse_permutations_cancel():
+    net = Network()
+    x = net.input((1, 2, 3, 4))
+    a = net.shuffle(x, first_transpose=(0, 2, 3, 1))
+    b = net.shuffle(a.get_output(0), first_transpose=(0, 3, 1, 2))
+    relu = net.relu(b.get_output(0))
+    net.network.mark_output(relu.get_output(0))
+
+    assert eliminate_shuffles(NetworkGraph(net.network)) == 2
+    assert relu.get_input(0).name == x.name
+
+
+def test_reshapes_merge():
+    net = Network()
+    x = net.input((1, 2, 3, 4))
+    a = net.shuffle(x, reshape_dims=(1, 6, 4))
+    b = net.shuffle(a.get_output(0), reshape_dims=(1, 24))
+    relu = net.relu(b.get_output(0))
+    net.network.mark_output(relu.get_output(0))
+
+    assert eliminate_shuffles(NetworkGraph(net.network)) == 1
+    assert b.get_input(0).name == x.name
+    assert tuple(b.reshape_dims) == (1, 24)
+
+
+def test_identity_reshape_removed():
+    net = Network()
+    x = net.input((1, 2, 3, 4))
+    a = net.shuffle(x, reshape_dims=(0, 0, -1, 4))
+    relu = net.relu(a.get_output(0))
+    net.network.mark_output(relu.get_output(0))
+
+    assert eliminate_shuffles(NetworkGraph(net.network)) == 1
+    assert relu.get_input(0).name == x.name
+
+
+def test_output_shuffle_kept():
+    net = Network()
+    x = net.input((1, 2, 3, 4))
+    a = net.shuffle(x, first_transpose=(0, 1, 3, 2))
+    net.network.mark_output(a.get_output(0))
+
+    assert eliminate_shuffles(NetworkGraph(net.network)) == 0
+
+
+def test_permutation_of_used_output_not_merged():
+    # b is a network output that is also consumed, a must keep its permutation
+    net = Network()
+    x = net.input((1, 2, 3, 4))
+    a = net.shuffle(x, reshape_dims=(1, 6, 4))
+    b = net.shuffle(a.get_output(0), first_transpose=(0, 2, 1))
+    relu = net.relu(b.get_output(0))
+    net.network.mark_output(b.get_output(0))
+    net.network.mark_output(relu.get_output(0))
+
+    assert eliminate_shuffles(NetworkGraph(net.network)) == 0
+    assert _permutation(a.second_transpose, 3) == (0, 1, 2)
+    assert b.get_input(0).name == a.get_output(0).name
+    assert relu.get_input(0).name == b.get_output(0).name
+
+
+def test_conv_scale_folded():
+    net = Network()
+    x = net.input((1, 3, 8, 8))
+    kernel = np.random.rand(4, 3, 3, 3).astype(np.float32)
+    bias = np.random.rand(4).astype(np.float32)
+    conv = net.network.add_convolution_nd(x, 4, (3, 3), kernel, bias)
+    scale = np.random.rand(4).astype(np.float32)
+    shift = np.random.rand(4).astype(np.float32)
+    scale_layer = net.channel_scale(conv.get_output(0), scale, shift)
+    relu = net.relu(scale_layer.get_output(0))
+    net.network.mark_output(relu.get_output(0))
+
+    hits = run_rewriters(NetworkGraph(net.network))
+    assert hits['conv_scale'] == 1
+    assert relu.get_input(0).name == conv.get_output(0).name
+    assert np.allclose(_array(conv.kernel).reshape(4, -1), kernel.reshape(4, -1) * scale[:, None])
+    assert np.allclose(_array(conv.bias), bias * scale + shift)
+
+
+def test_scale_scale_folded():
+    net = Network()
+    x = net.input((1, 4, 8, 8))
+    scales = [np.random.rand(4).astype(np.float32) for i in range(2)]
+    shifts = [np.random.rand(4).astype(np.float32) for i in range(2)]
+    first = net.channel_scale(x, scales[0], shifts[0])
+    second = net.channel_scale(first.get_output(0), scales[1], shifts[1])
+    relu = net.relu(second.get_output(0))
+    net.network.mark_output(relu.get_output(0))
+
+    hits = run_rewriters(NetworkGraph(net.network))
+    assert hits['scale_scale'] == 1
+    assert relu.get_input(0).name == first.get_output(0).name
+    assert np.allclose(_array(first.scale), scales[0] * scales[1])
+    assert np.allclose(_array(first.shift), shifts[0] * scales[1] + shifts[1])
+
+
+def test_scale_with_power_not_folded():
+    net = Network()
+    x = net.input((1, 3, 8, 8))
+    kernel = np.random.rand(4, 3, 3, 3).astype(np.float32)
+    conv = net.network.add_convolution_nd(x, 4, (3, 3), kernel, np.zeros(4, dtype=np.float32))
+    ones = np.ones(4, dtype=np.float32)
+    scale_layer = net.network.add_scale(conv.get_output(0), trt.ScaleMode.CHANNEL, ones, ones, 2 * ones)
+    net.network.mark_output(scale_layer.get_output(0))
+
+    assert run_rewriters(NetworkGraph(net.network))['conv_scale'] == 0
+
+
+def test_refittable_skips_rewriters():
+    net = Network()
+    x = net.input((1, 4, 8, 8))
+    ones = np.ones(4, dtype=np.float32)
+    first = net.channel_scale(x, ones, ones)
+    second = net.channel_scale(first.get_output(0), ones, ones)
+    net.network.mark_output(second.get_output(0))
+
+    stats = run_graph_passes(NetworkGraph(net.network), refittable=True)
+    assert stats['rewriter_hits'] == {}
+    assert second.get_input(0).name == first.get_output(0).name
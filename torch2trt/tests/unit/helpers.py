@@ -0,0 +1,39 @@
+class FakeEngine(object):
+    """Stands in for a TensorRT engine, with the attributes read by the arena and the archive"""
+
+    num_bindings = 0
+
+    def __init__(self, device_memory_size=0, data=b''):
+        self.device_memory_size = device_memory_size
+        self.data = data
+
+    def serialize(self):
+        return self.data
+
+    def create_execution_context(self):
+        return 'own memory'
+
+    def create_execution_context_without_device_memory(self):
+        return 'arena memory'
+
+
+class FakeModule(object):
+    """Stands in for a TRTModule, the arena and the archive only read the engine, the names and the metadata"""
+
+    def __init__(self, device_memory_size=0, data=b''):
+        self.engine = FakeEngine(device_memory_size, data)
+        self.context = None
+        self.arena = None
+        self.input_names = ['input_0']
+        self.output_names = ['output_0']
+        self.refit_map = None
+        self.metadata = {}
+
+
+def assert_raises(exception, fn, *args, **kwargs):
+    """Fails unless fn(*args, **kwargs) raises exception, returns the raised exception"""
+    try:
+        fn(*args, **kwargs)
+    except exception as e:
+        return e
+    raise AssertionError('%s did not raise %s' % (getattr(fn, '__name__', fn), exception.__name__))
@@ -0,0 +1,63 @@
+import torch
+from torch2trt import torch2trt
+
+
+def _conv_net():
+    module = torch.nn.Sequential(
+        torch.nn.Conv2d(3, 8, 3, padding=1), torch.nn.BatchNorm2d(8), torch.nn.ReLU(),
+        torch.nn.Conv2d(8, 4, 3, stride=2)).cuda().eval()
+    with torch.no_grad():
+        module[1].running_mean.uniform_(-1, 1)
+        module[1].running_var.uniform_(0.5, 2)
+    return module
+
+
+class Squeeze(torch.nn.Module):
+    def forward(self, x):
+        return x.squeeze(2)
+
+
+class Flatten(torch.nn.Module):
+    def forward(self, x):
+        return x.view(x.size(0), -1)
+
+
+def _check_meta_tracing(module, shape, **kwargs):
+    module = module.cuda().eval()
+    x = torch.randn(*shape).cuda()
+    module_trt = torch2trt(module, [x], meta_tracing=True, **kwargs)
+    assert torch.allclose(module_trt(x), module(x), atol=1e-4)
+
+
+def test_meta_tracing_matches_pytorch():
+    module = _conv_net()
+    x = torch.randn(2, 3, 32, 32).cuda()
+    module_trt = torch2trt(module, [x], meta_tracing=True)
+    assert torch.allclose(module_trt(x), module(x), atol=1e-4)
+
+
+def test_meta_tracing_restores_parameters():
+    module = _conv_net()
+    tensors = list(module.parameters()) + list(module.buffers())
+    torch2trt(module, [torch.randn(1, 3, 32, 32).cuda()], meta_tracing=True)
+    restored = list(module.parameters()) + list(module.buffers())
+    assert all(tensor is original for tensor, original in zip(restored, tensors))
+    assert all(tensor.is_cuda for tensor in restored)
+
+
+# these converters add constants of their own, which must not follow the input to the meta device
+def test_meta_tracing_squeeze():
+    _check_meta_tracing(Squeeze(), (2, 3, 1, 4))
+
+
+def test_meta_tracing_conv1d():
+    module = torch.nn.Sequential(torch.nn.Conv1d(3, 4, 3), torch.nn.BatchNorm1d(4), torch.nn.ReLU())
+    _check_meta_tracing(module, (2, 3, 16))
+
+
+def test_meta_tracing_pixel_shuffle():
+    _check_meta_tracing(torch.nn.PixelShuffle(2), (1, 8, 4, 4))
+
+
+def test_meta_tracing_dynamic_view():
+    _check_meta_tracing(Flatten(), (2, 3, 4, 4), opt_shape_param=[[[1, 3, 4, 4], [2, 3, 4, 4], [4, 3, 4, 4]]])
@@ -0,0 +1,50 @@
+import torch
+from torch2trt import torch2trt_partitioned, TRTModule
+
+
+def _conv_relu():
+    return torch.nn.Sequential(torch.nn.Conv2d(3, 3, 3, padding=1), torch.nn.ReLU())
+
+
+class CumsumBetween(torch.nn.Module):
+    """torch.cumsum has a dummy converter, the partitioning sees it before building"""
+
+    def __init__(self):
+        super(CumsumBetween, self).__init__()
+        self.features = _conv_relu()
+        self.head = _conv_relu()
+
+    def forward(self, x):
+        return self.head(torch.cumsum(self.features(x), 1))
+
+
+class UnhookedOutput(torch.nn.Module):
+    """torch.special.expit has no converter at all, only the build of the whole module fails"""
+
+    def __init__(self):
+        super(UnhookedOutput, self).__init__()
+        self.features = _conv_relu()
+
+    def forward(self, x):
+        return torch.special.expit(self.features(x))
+
+
+def _check_partitioned(module, partitions, failed_partitions):
+    module = module.cuda().eval()
+    x = torch.randn(1, 3, 8, 8).cuda()
+    module_trt = torch2trt_partitioned(module, [x])
+    assert module_trt.partitions == partitions
+    assert sorted(module_trt.failed_partitions.keys()) == failed_partitions
+    for name in partitions:
+        assert isinstance(dict(module_trt.named_modules())[name], TRTModule)
+    assert torch.allclose(module_trt(x), module(x), atol=1e-4)
+    return module_trt
+
+
+def test_unsupported_method_runs_in_pytorch():
+    _check_partitioned(CumsumBetween(), ['features', 'head'], [])
+
+
+def test_failed_segment_falls_back_to_submodules():
+    module_trt = _check_partitioned(UnhookedOutput(), ['features'], [''])
+    assert 'RuntimeError' in module_trt.failed_partitions['']
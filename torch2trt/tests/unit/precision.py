@@ -0,0 +1,46 @@
+import tensorrt as trt
+import torch
+from torch2trt import torch2trt, search_precision
+
+
+def _conv_relu_conv():
+    return torch.nn.Sequential(
+        torch.nn.Conv2d(3, 8, 3), torch.nn.ReLU(), torch.nn.Conv2d(8, 8, 3)).cuda().eval()
+
+
+def _layers(network, layer_type):
+    layers = [network.get_layer(i) for i in range(network.num_layers)]
+    return [layer for layer in layers if layer.type == layer_type]
+
+
+def test_override_sets_layer_precision():
+    module = _conv_relu_conv()
+    x = torch.randn(1, 3, 16, 16).cuda()
+    module_trt = torch2trt(module, [x], fp16_mode=True, precision_overrides={'0': torch.float32})
+
+    first, second = _layers(module_trt.network, trt.LayerType.CONVOLUTION)
+    assert first.precision_is_set and first.precision == trt.float32
+    assert first.get_output_type(0) == trt.float32
+    assert not second.precision_is_set
+    assert torch.allclose(module_trt(x), module(x), atol=1e-2)
+
+
+def test_search_precision_within_tolerance():
+    module = _conv_relu_conv()
+    x = torch.randn(1, 3, 16, 16).cuda()
+    tolerance = 1e-1
+    overrides, results = search_precision(module, [x], tolerance, num_iters=2)
+
+    assert overrides is not None
+    assert all(group in ['0', '1', '2'] and dtype == torch.float32 for group, dtype in overrides.items())
+    selected = [result for result in results if set(result['fp32_groups']) == set(overrides)]
+    assert len(selected) == 1 and selected[0]['max_error'] <= tolerance
+    assert all(set(result.keys()) == {'fp32_groups', 'max_error', 'latency_ms'} for result in results)
+
+
+def test_search_precision_tolerance_not_met():
+    module = _conv_relu_conv()
+    x = torch.randn(1, 3, 16, 16).cuda()
+    overrides, results = search_precision(module, [x], -1, num_iters=2)
+    assert overrides is None
+    assert [result['fp32_groups'] for result in results] == [['0', '1', '2']]
@@ -0,0 +1,49 @@
+import torch
+from torch2trt import torch2trt, TRTModule
+from torch2trt.preprocess import normalize_preprocess_spec, preprocess_tensor
+
+
+MEAN = [123.675, 116.28, 103.53]
+STD = [58.395, 57.12, 57.375]
+
+
+def test_preprocess_tensor_nhwc():
+    spec = normalize_preprocess_spec({'mean': MEAN, 'std': STD})
+    raw = torch.randint(0, 256, (2, 8, 6, 3), dtype=torch.uint8)
+    expected = (raw.float().permute(0, 3, 1, 2) - torch.tensor(MEAN).view(1, 3, 1, 1)) / torch.tensor(STD).view(1, 3, 1, 1)
+    assert torch.allclose(preprocess_tensor(spec, raw, (8, 6)), expected)
+
+
+def test_preprocess_tensor_resizes():
+    spec = normalize_preprocess_spec({'layout': 'NCHW', 'input_size': (16, 12)})
+    raw = torch.randint(0, 256, (1, 3, 16, 12), dtype=torch.uint8)
+    assert tuple(preprocess_tensor(spec, raw, (8, 6)).shape) == (1, 3, 8, 6)
+
+
+def test_fallback_preprocesses_raw_inputs():
+    module = torch.nn.Conv2d(3, 4, 3).cuda().eval()
+    x = torch.zeros(1, 3, 16, 16).cuda()
+    spec = {'mean': MEAN, 'std': STD}
+    module_trt = torch2trt(module, [x], preprocess=spec, rebuild_source='module', max_workspace_size=1 << 25)
+
+    state = module_trt.state_dict()
+    state['metadata'] = dict(state['metadata'], tensorrt_version='0.0.0')
+    loaded = TRTModule()
+    loaded.load_state_dict(state)
+
+    raw = torch.randint(0, 256, (1, 16, 16, 3), dtype=torch.uint8).cuda()
+    expected = module(preprocess_tensor(normalize_preprocess_spec(spec), raw, (16, 16)))
+    assert torch.allclose(loaded(raw), expected, atol=1e-3)  # the fallback, or the engine if already rebuilt
+    loaded.rebuild_thread.join()
+    assert torch.allclose(loaded(raw), expected, atol=1e-3)
+
+
+def test_engine_resize_matches_pytorch():
+    module = torch.nn.Conv2d(3, 3, 1).cuda().eval()
+    x = torch.zeros(1, 3, 16, 16).cuda()
+    spec = {'mean': MEAN, 'std': STD, 'input_size': (24, 20)}
+    module_trt = torch2trt(module, [x], preprocess=spec, max_workspace_size=1 << 25)
+
+    raw = torch.randint(0, 256, (1, 24, 20, 3), dtype=torch.uint8).cuda()
+    expected = module(preprocess_tensor(normalize_preprocess_spec(spec), raw, (16, 16)))
+    assert torch.allclose(module_trt(raw), expected, atol=1e-3)
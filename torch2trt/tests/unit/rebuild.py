@@ -0,0 +1,93 @@
+import torch
+from torch2trt import torch2trt, TRTModule, DeviceMemoryArena
+from torch2trt.tests.unit.helpers import assert_raises
+
+
+def _converted(**kwargs):
+    module = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3), torch.nn.ReLU()).cuda().eval()
+    x = torch.randn(1, 3, 16, 16).cuda()
+    module_trt = torch2trt(module, [x], max_workspace_size=1 << 25, **kwargs)
+    return module, module_trt, x
+
+
+def _incompatible_state(module_trt):
+    state = module_trt.state_dict()
+    state['metadata'] = dict(state['metadata'], tensorrt_version='0.0.0')
+    return state
+
+
+def _check_rebuilt(loaded, module, x):
+    assert torch.allclose(loaded(x), module(x), atol=1e-4)  # the engine or the fallback, whichever is ready
+    loaded.rebuild_thread.join()
+    assert loaded.engine is not None and loaded.fallback is None
+    assert torch.allclose(loaded(x), module(x), atol=1e-4)
+
+
+def test_rebuild_on_incompatible_metadata():
+    module, module_trt, x = _converted(rebuild_source='module')
+    loaded = TRTModule()
+    loaded.load_state_dict(_incompatible_state(module_trt))
+    _check_rebuilt(loaded, module, x)
+
+
+def test_rebuild_attaches_to_arena():
+    module, module_trt, x = _converted(rebuild_source='module')
+    arena = DeviceMemoryArena()
+    loaded = TRTModule(arena=arena)
+    loaded.load_state_dict(_incompatible_state(module_trt))
+    _check_rebuilt(loaded, module, x)
+    assert loaded.arena is arena and loaded in arena.sizes
+
+
+def test_rebuild_on_undeserializable_engine():
+    module, module_trt, x = _converted(rebuild_source='module')
+    state = module_trt.state_dict()
+    state['engine'] = bytearray(b'not a serialized engine')
+    loaded = TRTModule()
+    loaded.load_state_dict(state)
+    _check_rebuilt(loaded, module, x)
+
+
+def test_undeserializable_engine_without_source_raises():
+    module, module_trt, x = _converted()
+    state = module_trt.state_dict()
+    state['engine'] = bytearray(b'not a serialized engine')
+    e = assert_raises(RuntimeError, TRTModule().load_state_dict, state)
+    assert 'rebuild_source' in str(e)
+
+
+def test_state_dict_during_rebuild():
+    module, module_trt, x = _converted(rebuild_source='module')
+    loaded = TRTModule()
+    loaded.load_state_dict(_incompatible_state(module_trt))
+    state = loaded.state_dict()  # waits for the rebuild
+    assert loaded.engine is not None
+    assert len(state['engine']) > 0
+    assert not any(key.startswith('fallback') for key in state)
+
+
+def test_rebuild_waits_for_busy_arena():
+    module, module_trt, x = _converted(rebuild_source='module')
+    arena = DeviceMemoryArena()
+    busy = arena.attach(_converted()[1])
+    loaded = TRTModule(arena=arena)
+    with arena.reserve(busy):
+        loaded.load_state_dict(_incompatible_state(module_trt))
+        loaded.rebuild_thread.join(timeout=60)
+        assert loaded.rebuild_thread.is_alive()  # built, waiting for the call in flight to attach
+        assert torch.allclose(loaded(x), module(x), atol=1e-4)
+    _check_rebuilt(loaded, module, x)
+    assert loaded in arena.sizes
+
+
+def test_rebuild_on_current_device():
+    if torch.cuda.device_count() < 2:
+        return
+    module, module_trt, x = _converted(rebuild_source='module')
+    device = torch.device('cuda', 1)
+    with torch.cuda.device(device):
+        loaded = TRTModule()
+        loaded.load_state_dict(_incompatible_state(module_trt))
+    module, x = module.to(device), x.to(device)
+    with torch.cuda.device(device):
+        _check_rebuilt(loaded, module, x)
@@ -0,0 +1,70 @@
+import torch
+from torch2trt import torch2trt, TRTModule
+from torch2trt.tests.unit.helpers import assert_raises
+
+
+def _conv_bn():
+    return torch.nn.Sequential(
+        torch.nn.Conv2d(3, 4, 3), torch.nn.BatchNorm2d(4), torch.nn.ReLU()).cuda().eval()
+
+
+def _update_weights(module):
+    conv, bn = module[0], module[1]
+    with torch.no_grad():
+        conv.weight.normal_()
+        conv.bias.uniform_(-1, 1)
+        bn.weight.uniform_(0.5, 2)
+        bn.bias.uniform_(-1, 1)
+        bn.running_mean.uniform_(-1, 1)
+        bn.running_var.uniform_(0.5, 2)
+
+
+def test_refit_from_updated_module():
+    module = _conv_bn()
+    x = torch.randn(1, 3, 16, 16).cuda()
+    module_trt = torch2trt(module, [x], refittable=True)
+    output = module(x)
+
+    _update_weights(module)
+    assert not torch.allclose(module(x), output, atol=1e-3)
+    module_trt.refit_from(module)
+    assert torch.allclose(module_trt(x), module(x), atol=1e-4)
+
+
+def test_refit_map_survives_state_dict():
+    module = _conv_bn()
+    x = torch.randn(1, 3, 16, 16).cuda()
+    module_trt = torch2trt(module, [x], refittable=True)
+
+    loaded = TRTModule()
+    loaded.load_state_dict(module_trt.state_dict())
+    assert loaded.refit_map == module_trt.refit_map
+
+    _update_weights(module)
+    loaded.refit_from(module)
+    assert torch.allclose(loaded(x), module(x), atol=1e-4)
+
+
+def test_refit_without_refittable_raises():
+    module = _conv_bn()
+    x = torch.randn(1, 3, 16, 16).cuda()
+    module_trt = torch2trt(module, [x])
+    e = assert_raises(RuntimeError, module_trt.refit_from, module)
+    assert 'refittable=True' in str(e)
+
+
+def test_refit_refuses_changed_baked_weights():
+    module = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3), torch.nn.PReLU(4)).cuda().eval()
+    x = torch.randn(1, 3, 16, 16).cuda()
+    module_trt = torch2trt(module, [x], refittable=True)
+    assert [entry['params'] for entry in module_trt.refit_map if entry['kind'] == 'baked'] == [{'tensor': '1.weight'}]
+
+    with torch.no_grad():
+        module[0].weight.normal_()
+    module_trt.refit_from(module)  # the prelu slope did not change
+    assert torch.allclose(module_trt(x), module(x), atol=1e-4)
+
+    with torch.no_grad():
+        module[1].weight.uniform_(0.5, 1)
+    e = assert_raises(RuntimeError, module_trt.refit_from, module)
+    assert '1.weight' in str(e)
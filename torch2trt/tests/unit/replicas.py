@@ -0,0 +1,64 @@
+import threading
+from torch2trt.replicas import Replica, ReplicaPool, RoundRobinPolicy, LeastOutstandingPolicy
+
+
+def _fake_replicas(count):
+    # the pool only does the bookkeeping, replicas without module or stream are enough
+    return [Replica('cuda:%d' % i) for i in range(count)]
+
+
+def test_round_robin_cycles():
+    replicas = _fake_replicas(3)
+    policy = RoundRobinPolicy()
+    selected = [policy.select(replicas) for i in range(7)]
+    assert selected == replicas + replicas + replicas[:1]
+
+
+def test_least_outstanding_prefers_idle_replica():
+    replicas = _fake_replicas(2)
+    replicas[0].outstanding = 2
+    assert LeastOutstandingPolicy().select(replicas) is replicas[1]
+
+
+def test_least_outstanding_breaks_ties_by_dispatched():
+    replicas = _fake_replicas(2)
+    replicas[0].dispatched = 5
+    replicas[1].dispatched = 3
+    assert LeastOutstandingPolicy().select(replicas) is replicas[1]
+
+
+def test_pool_policy_by_name():
+    assert isinstance(ReplicaPool(_fake_replicas(1), 'round_robin').policy, RoundRobinPolicy)
+    assert isinstance(ReplicaPool(_fake_replicas(1), 'least_outstanding').policy, LeastOutstandingPolicy)
+
+
+def test_pool_accounting():
+    replicas = _fake_replicas(2)
+    pool = ReplicaPool(replicas, 'least_outstanding')
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second
+    assert (first.outstanding, first.dispatched) == (1, 1)
+
+    pool.release(first)
+    assert (first.outstanding, first.dispatched) == (0, 1)
+    assert pool.acquire() is first  # the only idle replica
+    assert (first.outstanding, first.dispatched) == (1, 2)
+
+
+def test_pool_accounting_concurrent():
+    replicas = _fake_replicas(3)
+    pool = ReplicaPool(replicas, 'least_outstanding')
+
+    def worker():
+        for i in range(200):
+            pool.release(pool.acquire())
+
+    threads = [threading.Thread(target=worker) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(replica.outstanding == 0 for replica in replicas)
+    assert sum(replica.dispatched for replica in replicas) == 800
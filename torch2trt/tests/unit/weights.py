@@ -0,0 +1,92 @@
+import numpy as np
+import tensorrt as trt
+import torch
+from torch2trt import torch2trt
+from torch2trt.torch2trt import ConversionContext, trt_
+
+
+def _network():
+    builder = trt.Builder(trt.Logger(trt.Logger.ERROR))
+    return builder.create_network(1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH))
+
+
+class Twice(torch.nn.Module):
+    """Calls the same conv and linear twice, their weights are read twice"""
+
+    def __init__(self):
+        super(Twice, self).__init__()
+        self.conv = torch.nn.Conv2d(4, 4, 1)
+        self.linear = torch.nn.Linear(8, 8)
+
+    def forward(self, x):
+        return self.linear(self.linear(self.conv(self.conv(x))))
+
+
+def test_constant_added_once():
+    tensor = torch.randn(4, 8)
+    network = _network()
+    with ConversionContext(network) as ctx:
+        first = ctx.get_constant(tensor)
+        second = ctx.get_constant(tensor)
+        reshaped = ctx.get_constant(tensor, (1, 4, 8))
+        assert trt_(network, tensor) is first
+        assert ctx.get_weight(tensor) is ctx.get_weight(tensor)
+
+    assert first is second
+    assert tuple(reshaped.shape) == (1, 4, 8)
+    assert network.num_layers == 2  # one constant per shape
+    # repeated lookups from the same use site are not a saving
+    assert ctx.stats['constant_bytes_saved'] == 0
+    # the reshaped constant and both get_weight calls reuse the first host copy
+    assert ctx.stats['host_copy_bytes_saved'] == 3 * tensor.numel() * tensor.element_size()
+
+
+def test_module_called_twice():
+    module = Twice().cuda().eval()
+    x = torch.randn(1, 4, 16, 8).cuda()  # 64 rows, the linear layer uses the shared constants
+    module_trt = torch2trt(module, [x])
+    stats = module_trt.conversion_stats
+    # the second linear call reuses the weight and bias constants
+    assert stats['constant_bytes_saved'] == (8 * 8 + 8) * 4
+    # the second conv call reuses the host copies of its weight and bias
+    assert stats['host_copy_bytes_saved'] == (4 * 4 + 4) * 4
+    assert torch.allclose(module_trt(x), module(x), atol=1e-4)
+
+
+def _host_buffer(array):
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return id(array)
+
+
+def _prefetched(module, chunk_bytes):
+    ctx = ConversionContext(None)
+    ctx.prefetch_weights(module, chunk_bytes=chunk_bytes)
+    tensors = list(module.parameters()) + list(module.buffers())
+    return ctx, tensors, [ctx.weights[(id(tensor), tensor._version)][1] for tensor in tensors]
+
+
+def test_prefetched_views_match_tensors():
+    module = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3), torch.nn.BatchNorm2d(4)).cuda().eval()
+    ctx, tensors, arrays = _prefetched(module, chunk_bytes=1 << 20)
+    for tensor, array in zip(tensors, arrays):
+        expected = tensor.cpu().numpy()
+        assert array.dtype == expected.dtype and array.shape == expected.shape
+        assert np.array_equal(array, expected)
+        assert ctx.get_weight(tensor) is array
+    assert ctx.stats['host_copy_bytes_saved'] == 0  # the first read of a prefetched weight is not a saving
+
+
+def test_prefetch_chunks():
+    module = torch.nn.Sequential(torch.nn.Linear(16, 16), torch.nn.Linear(16, 16)).cuda().eval()
+    weight_bytes = 16 * 16 * 4
+
+    # float32 tensors fit in one chunk
+    ctx, tensors, arrays = _prefetched(module, chunk_bytes=1 << 20)
+    assert len(set(_host_buffer(array) for array in arrays)) == 1
+
+    # a chunk never grows past chunk_bytes, so each weight and bias gets its own chunk
+    ctx, tensors, arrays = _prefetched(module, chunk_bytes=weight_bytes)
+    assert len(set(_host_buffer(array) for array in arrays)) == 4
+    for tensor, array in zip(tensors, arrays):
+        assert np.array_equal(array, tensor.cpu().numpy())
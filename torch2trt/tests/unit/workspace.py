@@ -0,0 +1,101 @@
+from torch2trt.workspace import workspace_candidates, build_engine, AUTO_WORKSPACE_MAX, AUTO_WORKSPACE_MIN
+from torch2trt.tests.unit.helpers import assert_raises
+
+
+class FakeConfig(object):
+    max_workspace_size = 0
+
+
+class FakeBuilder(object):
+    """Fails with MemoryError above fail_above bytes and records the workspaces tried"""
+
+    def __init__(self, fail_above):
+        self.fail_above = fail_above
+        self.max_workspace_size = 0
+        self.attempts = []
+
+    def _fail(self):
+        raise MemoryError('out of memory')
+
+    def _build(self):
+        self.attempts.append(self.max_workspace_size)
+        if self.max_workspace_size > self.fail_above:
+            return self._fail()
+        return 'engine'
+
+    def build_engine(self, network, config):
+        assert config.max_workspace_size == self.max_workspace_size
+        return self._build()
+
+    def build_cuda_engine(self, network):
+        return self._build()
+
+
+def test_auto_candidates_capped_and_decreasing():
+    workspaces = workspace_candidates('auto', free_memory=1 << 40)
+    assert workspaces[0] == AUTO_WORKSPACE_MAX
+    assert workspaces[-1] == 0
+    assert all(w >= AUTO_WORKSPACE_MIN for w in workspaces[:-1])
+    assert workspaces[:-1] == sorted(workspaces[:-1], reverse=True)
+
+
+def test_auto_candidates_low_memory():
+    assert workspace_candidates('auto', free_memory=AUTO_WORKSPACE_MIN) == [0]
+
+
+def test_first_success_stops():
+    builder = FakeBuilder(fail_above=1 << 30)
+    assert build_engine(builder, None, FakeConfig(), [1 << 20, 1 << 10]) == ('engine', 1 << 20)
+    assert builder.attempts == [1 << 20]
+
+
+def test_retries_after_memory_error():
+    builder = FakeBuilder(fail_above=100)
+    assert build_engine(builder, None, FakeConfig(), [400, 200, 50, 0]) == ('engine', 50)
+    assert builder.attempts == [400, 200, 50]
+
+
+def test_implicit_batch_retries():
+    builder = FakeBuilder(fail_above=100)
+    assert build_engine(builder, None, None, [400, 50]) == ('engine', 50)
+
+
+def test_all_attempts_fail():
+    builder = FakeBuilder(fail_above=-1)
+    e = assert_raises(RuntimeError, build_engine, builder, None, FakeConfig(), [20, 0], 'fp16_mode=True')
+    assert str(e).startswith('Failed to build the TensorRT engine (fp16_mode=True). Attempts: ')
+    assert 'workspace 20 bytes (MemoryError: out of memory)' in str(e)
+    assert 'workspace 0 bytes' in str(e)
+
+
+class LoggingBuilder(FakeBuilder):
+    """Returns None above fail_above bytes after logging the error, like the TensorRT builder"""
+
+    def __init__(self, fail_above, error):
+        super(LoggingBuilder, self).__init__(fail_above)
+        self.error = error
+        self.errors = []
+
+    def _fail(self):
+        self.errors.append(self.error)
+        return None
+
+
+def test_retries_after_logged_out_of_memory():
+    builder = LoggingBuilder(100, 'Requested amount of GPU memory (400 bytes) could not be allocated.')
+    assert build_engine(builder, None, FakeConfig(), [400, 50], errors=builder.errors) == ('engine', 50)
+    assert builder.attempts == [400, 50]
+
+
+def test_other_failures_not_retried():
+    builder = LoggingBuilder(-1, 'Could not find any implementation for node Foo.')
+    e = assert_raises(RuntimeError, build_engine, builder, None, FakeConfig(), [400, 50, 0], errors=builder.errors)
+    assert builder.attempts == [400]
+    assert 'build returned None: Could not find any implementation for node Foo.' in str(e)
+
+
+def test_build_returned_none_not_retried():
+    builder = FakeBuilder(fail_above=100)
+    builder._fail = lambda: None
+    assert_raises(RuntimeError, build_engine, builder, None, FakeConfig(), [400, 50])
+    assert builder.attempts == [400]
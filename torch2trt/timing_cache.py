@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import time
+import tensorrt as trt
+import torch
+from .file_lock import locked
+
+
+def timing_cache_supported(config):
+    return hasattr(config, 'create_timing_cache')
+
+
+def _device_name():
+    if torch.cuda.is_available():
+        return torch.cuda.get_device_name()
+    return None
+
+
+def _read(path):
+    if not os.path.exists(path):
+        return b''
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _write(path, data):
+    # readers without the lock never see a partial file
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_metadata(path):
+    if not os.path.exists(path + '.json'):
+        return {}
+    with open(path + '.json', 'r') as f:
+        return json.load(f)
+
+
+def _write_metadata(path, metadata):
+    with open(path + '.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+
+def load_timing_cache(config, path):
+    """Sets the timing cache of path on a builder config, an empty cache if the file does not exist"""
+    with locked(path):
+        data = _read(path)
+    cache = config.create_timing_cache(data)
+    config.set_timing_cache(cache, False)
+    return cache
+
+
+def save_timing_cache(config, path):
+    """Merges the timing cache of a builder config into the cache file.
+
+    Builders that ran in parallel since the file was loaded keep their entries.
+    """
+    with locked(path):
+        cache = config.create_timing_cache(_read(path))
+        cache.combine(config.get_timing_cache(), False)
+        _write(path, bytes(cache.serialize()))
+
+        metadata = read_metadata(path)
+        metadata.update({
+            'tensorrt_version': trt.__version__,
+            'device': _device_name(),
+            'builds': metadata.get('builds', 0) + 1,
+            'updated': time.time(),
+        })
+        _write_metadata(path, metadata)
+
+
+def merge_timing_caches(paths, output_path):
+    """Combines the timing cache files of parallel builds into output_path"""
+    builder = trt.Builder(trt.Logger(trt.Logger.ERROR))
+    config = builder.create_builder_config()
+    with locked(output_path):
+        cache = config.create_timing_cache(_read(output_path))
+        metadata = read_metadata(output_path)
+        builds = metadata.get('builds', 0)
+        for path in paths:
+            if os.path.abspath(path) == os.path.abspath(output_path):
+                continue  # already loaded, and locked
+            with locked(path):
+                cache.combine(config.create_timing_cache(_read(path)), False)
+                builds += read_metadata(path).get('builds', 0)
+        _write(output_path, bytes(cache.serialize()))
+
+        metadata.update({
+            'tensorrt_version': trt.__version__,
+            'device': _device_name(),
+            'builds': builds,
+            'updated': time.time(),
+        })
+        _write_metadata(output_path, metadata)
+
+
+def is_stale(path, max_age_days=None, max_bytes=None):
+    """Returns the reason a timing cache should be dropped, None if it is still useful"""
+    metadata = read_metadata(path)
+    if metadata.get('tensorrt_version', trt.__version__) != trt.__version__:
+        return 'built with TensorRT %s' % metadata['tensorrt_version']
+    if metadata.get('device', _device_name()) != _device_name():
+        return 'built on %s' % metadata['device']
+    if max_age_days is not None and time.time() - metadata.get('updated', time.time()) > max_age_days * 86400:
+        return 'older than %g days' % max_age_days
+    if max_bytes is not None and os.path.getsize(path) > max_bytes:
+        return 'larger than %d bytes' % max_bytes
+    return None
+
+
+def prune_timing_cache(path, max_age_days=None, max_bytes=None):
+    """Removes the timing cache file if it is stale, returns the reason or None"""
+    with locked(path):
+        reason = is_stale(path, max_age_days, max_bytes)
+        if reason is not None:
+            for file_path in [path, path + '.json']:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+    return reason
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect, merge and prune TensorRT timing cache files')
+    subparsers = parser.add_subparsers(dest='command')
+
+    inspect_parser = subparsers.add_parser('inspect', help='Print the size and origin of timing caches')
+    inspect_parser.add_argument('paths', nargs='+')
+
+    merge_parser = subparsers.add_parser('merge', help='Combine timing caches into one file')
+    merge_parser.add_argument('paths', nargs='+')
+    merge_parser.add_argument('--output', '-o', required=True)
+
+    prune_parser = subparsers.add_parser('prune', help='Remove timing caches from another TensorRT version or device, or too old or large')
+    prune_parser.add_argument('paths', nargs='+')
+    prune_parser.add_argument('--max-age-days', type=float, default=None)
+    prune_parser.add_argument('--max-bytes', type=int, default=None)
+
+    args = parser.parse_args()
+
+    if args.command == 'inspect':
+        print('| path | bytes | builds | tensorrt | device | updated | stale |')
+        for path in args.paths:
+            metadata = read_metadata(path)
+            updated = metadata.get('updated', None)
+            print('| %s | %d | %s | %s | %s | %s | %s |' % (
+                path, os.path.getsize(path), metadata.get('builds', '?'), metadata.get('tensorrt_version', '?'),
+                metadata.get('device', '?'), time.ctime(updated) if updated else '?', is_stale(path) or 'no'))
+    elif args.command == 'merge':
+        merge_timing_caches(args.paths, args.output)
+        print('Merged %d timing caches into %s' % (len(args.paths), args.output))
+    elif args.command == 'prune':
+        for path in args.paths:
+            reason = prune_timing_cache(path, args.max_age_days, args.max_bytes)
+            if reason is not None:
+                print('Removed %s (%s)' % (path, reason))
+    else:
+        parser.print_help()
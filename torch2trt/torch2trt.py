@@ -1,15 +1,33 @@
 import tensorrt as trt
 import torch
-from copy import copy
+from copy import copy, deepcopy
+from contextlib import nullcontext
 import numpy as np
+import hashlib
 import time
+import threading
+from contextvars import ContextVar
 from .calibration import TensorBatchDataset, DatasetCalibrator, DEFAULT_CALIBRATION_ALGORITHM
 from .shape_converter import ShapeConverter
+from .graph import NetworkGraph, run_graph_passes
+from .fold_batchnorm import fold_batchnorm_modules
+from .meta_tracing import meta_inputs, meta_parameters
+from .workspace import workspace_candidates, build_engine
+from .compatibility import build_metadata, check_compatibility
+from .preprocess import normalize_preprocess_spec, raw_input_shape, add_preprocessing, preprocess_metadata, preprocess_tensor
+from .timing_cache import timing_cache_supported, load_timing_cache, save_timing_cache
 
 # UTILITY FUNCTIONS
 
 support_dynamic_shape = True
 
+# context of the conversion in progress in this thread, used by helpers that only receive the network
+_current_context = ContextVar('torch2trt_current_context', default=None)
+
+
+def current_context():
+    return _current_context.get()
+
 
 def torch_dtype_to_trt(dtype):
     if dtype == torch.int8:
@@ -20,6 +38,8 @@ def torch_dtype_to_trt(dtype):
         return trt.float16
     elif dtype == torch.float32:
         return trt.float32
+    elif dtype == torch.uint8 and hasattr(trt, 'uint8'):
+        return trt.uint8  # TensorRT 8.5+, for network inputs and outputs
     else:
         raise TypeError('%s is not supported by tensorrt' % dtype)
 
@@ -33,6 +53,8 @@ def torch_dtype_from_trt(dtype):
         return torch.float16
     elif dtype == trt.float32:
         return torch.float32
+    elif hasattr(trt, 'uint8') and dtype == trt.uint8:
+        return torch.uint8
     else:
         raise TypeError('%s is not supported by torch' % dtype)
 
@@ -40,6 +62,8 @@ def torch_dtype_from_trt(dtype):
 def torch_device_to_trt(device):
     if device.type == torch.device('cuda').type:
         return trt.TensorLocation.DEVICE
+    elif device.type == 'meta':
+        return trt.TensorLocation.DEVICE  # shape only stand-in of a gpu tensor
     elif device.type == torch.device('cpu').type:
         return trt.TensorLocation.HOST
     else:
@@ -151,10 +175,16 @@ def trt_(network, *tensors):
         elif isinstance(t, torch.Tensor) and not hasattr(t, '_trt'):
             # add leaf tensor
             # don't exclude batch when adding constants...?
-            shape = tuple(t.shape)
-            weight = t.detach().cpu().numpy()
-            t._trt = network.add_constant(shape, weight).get_output(0)
-            trt_tensor = t._trt
+            ctx = current_context()
+            if ctx is not None and ctx.network is network:
+                # shared by every use of the same tensor in this conversion, the tensor
+                # object is the same at each use, so reusing it is not counted as a saving
+                trt_tensor = ctx.get_constant(t, count_saving=False)
+            else:
+                shape = tuple(t.shape)
+                weight = t.detach().cpu().numpy()
+                t._trt = network.add_constant(shape, weight).get_output(0)
+                trt_tensor = t._trt
 
         # or... add constant for scalar primitive
         elif isinstance(t, float) or isinstance(t, int):
@@ -207,6 +237,13 @@ def tensor_trt_get_shape_trt(network, tensor_trt, start=0, size=None, stride=1):
 # CONVERSION REGISTRY AND HOOKS
 
 
+# dtypes that can be viewed as numpy arrays after prefetching
+PREFETCH_DTYPES = (torch.float32, torch.float16, torch.float64, torch.int32, torch.int64, torch.int8, torch.uint8, torch.bool)
+
+# bytes of parameters flattened into one device buffer per transfer, bounds the extra device memory of prefetching
+PREFETCH_CHUNK_BYTES = 1 << 26
+
+
 CONVERTERS = {}
 
 
@@ -219,55 +256,87 @@ def get_arg(ctx, name, pos, default):
         return default
 
 
-def attach_converter(ctx, method, converter, method_str):
-    """Gets a function that executes PyTorch method and TensorRT converter"""
-    global DUMMY_CONVERTERS
+def call_converter(ctx, method, converter, method_str, args, kwargs):
+    """Executes PyTorch method and its TensorRT converter"""
+    skip = True
 
-    def wrapper(*args, **kwargs):
-        skip = True
+    # check if another (parent) converter has lock
+    if not ctx.lock:
+        if converter['is_real']:
+            ctx.lock = True  # only real converters can acquire lock
+        skip = False
 
-        # check if another (parent) converter has lock
-        if not ctx.lock:
-            if converter['is_real']:
-                ctx.lock = True  # only real converters can acquire lock
-            skip = False
+    # run original method
+    outputs = method(*args, **kwargs)
 
-        # run original method
-        outputs = method(*args, **kwargs)
+    if not skip:
+        ctx.num_converter_calls += 1
+        ctx.method_args = args
+        ctx.method_kwargs = kwargs
+        ctx.method_return = outputs
+        ctx.method_str = method_str
 
-        if not skip:
-            ctx.method_args = args
-            ctx.method_kwargs = kwargs
-            ctx.method_return = outputs
-            ctx.method_str = method_str
+        first_layer = ctx.network.num_layers if ctx.precision_overrides else None
 
-#             print('%s' % (converter.__name__,))
-            converter['converter'](ctx)
-            outputs = ctx.method_return
+#         print('%s' % (converter.__name__,))
+        converter['converter'](ctx)
 
-            # convert to None so conversion will fail for unsupported layers
-            ctx.method_args = None
-            ctx.method_kwargs = None
-            ctx.method_return = None
-            ctx.lock = False
+        if first_layer is not None:
+            ctx.apply_precision(first_layer)
+        outputs = ctx.method_return
 
-        return outputs
+        # convert to None so conversion will fail for unsupported layers
+        ctx.method_args = None
+        ctx.method_kwargs = None
+        ctx.method_return = None
+        ctx.lock = False
+
+    return outputs
+
+
+def attach_converter(ctx, method, converter, method_str):
+    """Gets a function that executes PyTorch method and TensorRT converter"""
+    def wrapper(*args, **kwargs):
+        return call_converter(ctx, method, converter, method_str, args, kwargs)
+
+    return wrapper
+
+
+def dispatch_converter(method, method_str):
+    """Gets a function that executes PyTorch method, and its converter in the conversion context of the calling thread"""
+    def wrapper(*args, **kwargs):
+        ctx = _current_context.get()
+        if ctx is None or method_str not in ctx.converters:
+            return method(*args, **kwargs)
+        return call_converter(ctx, method, ctx.converters[method_str], method_str, args, kwargs)
 
     return wrapper
 
 
+# patched methods: method string -> [original method, number of contexts using the patch]
+_installed_hooks = {}
+_hooks_lock = threading.Lock()
+
+
 class ConversionHook(object):
-    """Attaches TensorRT converter to PyTorch method call"""
+    """Patches a PyTorch method with a dispatcher to the converters of the active context.
+
+    The patch is shared by the contexts of all threads and removed when the last one exits.
+    """
 
-    def __init__(self, ctx, method, converter):
-        self.ctx = ctx
+    def __init__(self, method):
         self.method_str = method
-        self.converter = converter
+        self.num_entered = 0
 
     def _set_method(self, method):
         exec('%s = method' % self.method_str)
 
     def __enter__(self):
+        if self.method_str in _installed_hooks:
+            _installed_hooks[self.method_str][1] += 1
+            self.num_entered += 1
+            return
+
         if not self.method_str.startswith('torch.'):
             module_name = self.method_str.split('.')[0]
             try:
@@ -275,42 +344,257 @@ class ConversionHook(object):
             except:
                 print("module {} not found.".format(module_name))
         try:
-            self.method_impl = eval(self.method_str)
+            method_impl = eval(self.method_str)
         except AttributeError:
-            self.method_impl = None
+            method_impl = None
 
-        if self.method_impl:
-            self._set_method(attach_converter(
-                self.ctx, self.method_impl, self.converter, self.method_str))
+        if method_impl:
+            _installed_hooks[self.method_str] = [method_impl, 1]
+            self._set_method(dispatch_converter(method_impl, self.method_str))
+            self.num_entered += 1
 
     def __exit__(self, type, val, tb):
-        if self.method_impl:
-            self._set_method(self.method_impl)
+        if self.num_entered == 0:
+            return
+        self.num_entered -= 1
+        entry = _installed_hooks[self.method_str]
+        entry[1] -= 1
+        if entry[1] == 0:
+            self._set_method(entry[0])
+            del _installed_hooks[self.method_str]
 
 
 class ConversionContext(object):
     def __init__(self, network, converters=CONVERTERS):
         self.support_dynamic_shape = support_dynamic_shape
         self.network = network
+        self.converters = converters
         self.lock = False
         self.method_args = None
         self.method_kwargs = None
         self.method_return = None
-        self.hooks = [
-            ConversionHook(self, method, converter)
-            for method, converter in converters.items()
-        ]
+        self.refittable = False
+        self.parameter_names = {}
+        self.refit_map = []
+        self.read_parameters = {}  # name -> host copy of the parameters read by converters
+        self.refit_parameters = set()  # names of the parameters mapped by refit_map
+        self.weights = {}
+        self.prefetched = set()  # weights keys copied ahead of their first read
+        self.constants = {}  # key -> (tensor, constant, converter call that last used it)
+        self.num_converter_calls = 0
+        self.unsupported_methods = []
+        self.precision_overrides = {}
+        self.module_stack = []
+        self.stats = {
+            'host_copy_bytes_saved': 0,
+            'constant_bytes_saved': 0,
+        }
+        self.hooks = [ConversionHook(method) for method in converters]
+        self.context_tokens = []
 
     def __enter__(self):
-        for hook in self.hooks:
-            hook.__enter__()
+        self.context_tokens.append(_current_context.set(self))
+        with _hooks_lock:
+            for hook in self.hooks:
+                hook.__enter__()
         return self
 
     def __exit__(self, type, val, tb):
-        for hook in self.hooks:
-            hook.__exit__(type, val, tb)
+        with _hooks_lock:
+            for hook in self.hooks:
+                hook.__exit__(type, val, tb)
+        _current_context.reset(self.context_tokens.pop())
+
+    def prefetch_weights(self, module, chunk_bytes=PREFETCH_CHUNK_BYTES):
+        """Copies the device parameters and buffers of module to host memory in few large transfers.
+
+        The tensors of each dtype are flattened into contiguous device buffers of
+        about chunk_bytes, copied to pinned host memory, and exposed to get_weight
+        as numpy views.
+        """
+        tensors = {}
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            if tensor.is_cuda and tensor.dtype in PREFETCH_DTYPES:
+                tensors[id(tensor)] = tensor  # shared tensors are copied once
+
+        groups = {}
+        for tensor in tensors.values():
+            groups.setdefault((tensor.device, tensor.dtype), []).append(tensor)
+
+        chunks = []
+        for group in groups.values():
+            chunk, size = [], 0
+            for tensor in group:
+                if len(chunk) > 0 and size + tensor.numel() * tensor.element_size() > chunk_bytes:
+                    chunks.append(chunk)
+                    chunk, size = [], 0
+                chunk.append(tensor)
+                size += tensor.numel() * tensor.element_size()
+            chunks.append(chunk)
+
+        for chunk in chunks:
+            with torch.no_grad():
+                flat = torch.cat([tensor.detach().reshape(-1) for tensor in chunk])
+            host = torch.empty(flat.numel(), dtype=flat.dtype, pin_memory=True)
+            host.copy_(flat)
+            del flat
+
+            host_array = host.numpy()  # views keep the pinned buffer alive
+            offset = 0
+            for tensor in chunk:
+                numel = tensor.numel()
+                array = host_array[offset:offset + numel].reshape(tuple(tensor.shape))
+                key = (id(tensor), tensor._version)
+                self.weights[key] = (tensor, array)
+                self.prefetched.add(key)
+                offset += numel
+
+    def get_weight(self, tensor):
+        """Returns a host copy of tensor, shared by every converter reading the same weights.
+
+        The array is cached, callers must not modify it in place.
+        """
+        array = self._host_weight(tensor)
+        if self.refittable and id(tensor) in self.parameter_names:
+            self.read_parameters[self.parameter_names[id(tensor)]] = array
+        return array
+
+    def _host_weight(self, tensor):
+        # the version changes if the tensor is modified in place during the forward
+        key = (id(tensor), tensor._version)
+        if key in self.weights:
+            array = self.weights[key][1]
+            if key in self.prefetched:
+                self.prefetched.remove(key)  # the first read of a prefetched weight still needed its copy
+            else:
+                self.stats['host_copy_bytes_saved'] += array.nbytes
+            return array
+
+        if tensor.is_meta:
+            raise RuntimeError('Values of a tensor of shape %s computed during meta tracing are unknown, '
+                               'create constants without device=input.device or trace without meta_tracing.' % (tuple(tensor.shape), ))
+
+        array = tensor.detach().cpu().numpy()
+        self.weights[key] = (tensor, array)  # keep tensor alive so its id is not reused
+        return array
+
+    def alias_weight(self, alias, tensor):
+        """Makes get_weight(alias) return the host copy of tensor, e.g. for its meta stand-in"""
+        self.weights[(id(alias), alias._version)] = (alias, self._host_weight(tensor))
+        if id(tensor) in self.parameter_names:
+            self.parameter_names[id(alias)] = self.parameter_names[id(tensor)]
+
+    def get_constant(self, tensor, shape=None, count_saving=True):
+        """Returns a constant TensorRT tensor for tensor, added to the network only once.
+
+        Reuse by another converter call, e.g. a second call of a module or a tied
+        parameter, counts as constant_bytes_saved unless count_saving is False.
+        """
+        if shape is None:
+            shape = tuple(tensor.shape)
+        shape = tuple(shape)
+
+        key = (id(tensor), tensor._version, shape)
+        if key in self.constants:
+            _, constant_trt, last_call = self.constants[key]
+            if count_saving and last_call != self.num_converter_calls:
+                self.stats['constant_bytes_saved'] += tensor.numel() * tensor.element_size()
+            self.constants[key] = (tensor, constant_trt, self.num_converter_calls)
+            return constant_trt
+
+        array = self.get_weight(tensor).reshape(shape)
+        layer = self.network.add_constant(shape, array)
+        self.add_refit_layer(layer, 'constant', {'tensor': tensor})
+        constant_trt = layer.get_output(0)
+        self.constants[key] = (tensor, constant_trt, self.num_converter_calls)
+        return constant_trt
+
+    def track_parameters(self, module):
+        """Records parameter and buffer names so converted layers can be refit from the module"""
+        self.parameter_names = {}
+        for name, tensor in list(module.named_parameters()) + list(module.named_buffers()):
+            self.parameter_names[id(tensor)] = name
+
+    def track_modules(self, module):
+        """Keeps module_stack at the names of the submodules being called, returns the hook handles"""
+        # module may be called by other threads during the conversion
+        def push(name):
+            def hook(m, hook_inputs):
+                if current_context() is self:
+                    self.module_stack.append(name)
+            return hook
+
+        def pop(m, hook_inputs, output):
+            if current_context() is self:
+                self.module_stack.pop()
+
+        handles = []
+        for name, child in module.named_modules():
+            handles.append(child.register_forward_pre_hook(push(name)))
+            handles.append(child.register_forward_hook(pop))
+        return handles
+
+    def layer_precision(self):
+        """Returns the precision override of the method being converted, the method name wins over the innermost module"""
+        if self.method_str in self.precision_overrides:
+            return self.precision_overrides[self.method_str]
+        for name in reversed(self.module_stack):
+            if name in self.precision_overrides:
+                return self.precision_overrides[name]
+        return None
 
-    def add_inputs(self, torch_inputs, names=None, opt_shape_param=None):
+    def apply_precision(self, first_layer):
+        """Sets the precision override on the layers added since first_layer"""
+        dtype = self.layer_precision()
+        if dtype is None:
+            return
+        for i in range(first_layer, self.network.num_layers):
+            layer = self.network.get_layer(i)
+            outputs = [layer.get_output(j) for j in range(layer.num_outputs)]
+            if not all(output.dtype in (trt.float32, trt.float16) for output in outputs):
+                continue  # shape and index computations keep their types
+            layer.precision = dtype
+            for j in range(layer.num_outputs):
+                layer.set_output_type(j, dtype)
+
+    def add_refit_layer(self, layer, kind, tensors, **attrs):
+        """Maps the weights of a layer to the module parameters they were computed from"""
+        if not self.refittable:
+            return
+
+        params = {}
+        for key, tensor in tensors.items():
+            if tensor is None:
+                continue
+            if id(tensor) not in self.parameter_names:
+                return  # weights that are not module parameters can't be refit from the module
+            params[key] = self.parameter_names[id(tensor)]
+
+        self.refit_parameters.update(params.values())
+        self.refit_map.append({
+            'layer': layer.name,
+            'kind': kind,
+            'params': params,
+            'attrs': attrs,
+        })
+
+    def add_baked_parameters(self):
+        """Adds refit_map entries for the parameters read by converters without a refit entry.
+
+        Their values are baked into the engine, e.g. in plugins or in constants computed
+        from them, the entries keep a checksum so refit_from can refuse to refit when they change.
+        """
+        for name, array in sorted(self.read_parameters.items()):
+            if name in self.refit_parameters:
+                continue
+            self.refit_map.append({
+                'layer': None,
+                'kind': 'baked',
+                'params': {'tensor': name},
+                'attrs': {'checksum': weight_checksum(array)},
+            })
+
+    def add_inputs(self, torch_inputs, names=None, opt_shape_param=None, preprocess=None):
         if names is None:
             names = ['input_%d' % i for i in range(len(torch_inputs))]
         self.input_names = names
@@ -331,6 +615,19 @@ class ConversionContext(object):
                         input_shape = tuple(torch_input.shape)
                 else:
                     input_shape = tuple(torch_input.shape)[1:]
+
+                spec = preprocess[i] if preprocess is not None else None
+                if spec is not None:
+                    # the engine input is the raw buffer, the preprocessing layers produce the model input
+                    raw_trt = self.network.add_input(
+                        name=names[i],
+                        shape=raw_input_shape(spec, input_shape),
+                        dtype=torch_dtype_to_trt(spec['dtype']),
+                    )
+                    raw_trt.location = torch_device_to_trt(torch_input.device)
+                    torch_input._trt = add_preprocessing(self.network, spec, raw_trt, input_shape)
+                    continue
+
                 trt_tensor = self.network.add_input(
                     name=names[i],
                     shape=input_shape,
@@ -343,9 +640,18 @@ class ConversionContext(object):
         if names is None:
             names = ['output_%d' % i for i in range(len(torch_outputs))]
         self.output_names = names
+        self.output_dtypes = []
 
         for i, torch_output in enumerate(torch_outputs):
+            if not hasattr(torch_output, '_trt'):
+                message = 'Output %d (%s) was not converted to TensorRT.' % (i, names[i])
+                if len(self.unsupported_methods) > 0:
+                    message += ' Methods without converter: %s.' % ', '.join(sorted(set(self.unsupported_methods)))
+                message += ' Use torch2trt.print_coverage(module, inputs) to find their call sites,' \
+                    ' or torch2trt.torch2trt_partitioned to run them in PyTorch.'
+                raise RuntimeError(message)
             trt_tensor = torch_output._trt
+            self.output_dtypes.append(str(torch_output.dtype))
             trt_tensor.name = names[i]
             trt_tensor.location = torch_device_to_trt(torch_output.device)
             if not support_dynamic_shape:
@@ -353,33 +659,203 @@ class ConversionContext(object):
             self.network.mark_output(trt_tensor)
 
 
+def pack_projection_weights(arrays, roles, embed_dim, scale):
+    """Stacks the weights of the attention roles ('q', 'k', 'v') projected by one GEMM.
+
+    arrays maps each role to its own weight or to the packed in_proj weight of
+    all three roles, the q rows are multiplied by scale.
+    """
+    rows = []
+    for role in roles:
+        array = arrays[role]
+        if array.shape[0] == 3 * embed_dim:
+            index = 'qkv'.index(role)
+            array = array[index * embed_dim:(index + 1) * embed_dim]
+        if role == 'q':
+            array = array * scale
+        rows.append(array)
+    return np.ascontiguousarray(np.concatenate(rows, axis=0))
+
+
+def weight_checksum(array):
+    return hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()
+
+
+def refit_layer_weights(entry, tensors):
+    """Computes the weights of a refit map entry from named module tensors"""
+    params = dict((key, tensors[name].detach().cpu().numpy()) for key, name in entry['params'].items())
+
+    if entry['kind'] == 'kernel_bias':
+        weights = {trt.WeightsRole.KERNEL: params['weight']}
+        if 'bias' in params:
+            weights[trt.WeightsRole.BIAS] = params['bias']
+    elif entry['kind'] == 'batchnorm':
+        scale = params['weight'] / np.sqrt(params['running_var'] + entry['attrs']['eps'])
+        shift = params['bias'] - params['running_mean'] * scale
+        weights = {trt.WeightsRole.SCALE: scale, trt.WeightsRole.SHIFT: shift}
+    elif entry['kind'] == 'constant':
+        weights = {trt.WeightsRole.CONSTANT: params['tensor']}
+    elif entry['kind'] == 'attention_projection':
+        attrs = entry['attrs']
+        weights = {trt.WeightsRole.CONSTANT: pack_projection_weights(
+            params, attrs['roles'], attrs['embed_dim'], attrs['scale'])}
+    else:
+        raise ValueError('Unknown refit layer kind %s' % entry['kind'])
+
+    return weights
+
+
+class OutputAllocator(getattr(trt, 'IOutputAllocator', object)):
+    """Allocates the outputs whose shape depends on the data (e.g. nms) while the engine runs, TensorRT 8.5+"""
+
+    def __init__(self, device):
+        super(OutputAllocator, self).__init__()
+        self.device = device
+        self.buffers = {}
+        self.shapes = {}
+
+    def reallocate_output(self, tensor_name, memory, size, alignment):
+        # new buffers for each call, the outputs are returned to the caller
+        buffer = torch.empty((max(size, 1), ), dtype=torch.uint8, device=self.device)
+        self.buffers[tensor_name] = buffer
+        return buffer.data_ptr()
+
+    def notify_shape(self, tensor_name, shape):
+        self.shapes[tensor_name] = tuple(shape)
+
+    def output(self, tensor_name, dtype):
+        shape = self.shapes[tensor_name]
+        buffer = self.buffers.get(tensor_name, None)
+        if buffer is None:
+            return torch.empty(size=shape, dtype=dtype, device=self.device)
+        num_bytes = int(np.prod(shape)) * torch.tensor([], dtype=dtype).element_size()
+        return buffer[:num_bytes].view(dtype).view(shape)
+
+
+class BuildLogger(trt.ILogger):
+    """Prints messages like trt.Logger(min_severity) and keeps the errors, so build_engine can tell why a build failed"""
+
+    def __init__(self, min_severity):
+        trt.ILogger.__init__(self)
+        self.min_severity = min_severity
+        self.errors = []
+
+    def log(self, severity, msg):
+        if int(severity) <= int(trt.ILogger.Severity.ERROR):
+            self.errors.append(msg)
+        if int(severity) <= int(self.min_severity):
+            print('[TensorRT] %s' % msg)
+
+
 class TRTModule(torch.nn.Module):
-    def __init__(self, engine=None, input_names=None, output_names=None):
+    def __init__(self, engine=None, input_names=None, output_names=None, refit_map=None, arena=None):
         super(TRTModule, self).__init__()
         self._register_state_dict_hook(TRTModule._on_state_dict)
         self.engine = engine
+        self.arena = arena  # DeviceMemoryArena lending the context its device memory
         if self.engine is not None:
-            self.context = self.engine.create_execution_context()
+            self._create_context()
 
         self.input_names = input_names
         self.output_names = output_names
+        self.refit_map = refit_map
+        self.metadata = {}
+        self.rebuild_source = None  # module, input shapes and torch2trt arguments to rebuild the engine
+        self.fallback = None  # runs while the engine is rebuilt
+        self.rebuild_thread = None
+
+    def _create_context(self, engine=None):
+        """Creates the execution context of engine (the engine of this module by default)"""
+        engine = self.engine if engine is None else engine
+        if self.arena is not None:
+            self.arena.attach(self, engine)  # waits until no call uses the arena
+        else:
+            self.context = engine.create_execution_context()
 
     def _on_state_dict(self, state_dict, prefix, local_metadata):
+        if self.rebuild_thread is not None:
+            self.rebuild_thread.join()  # the rebuilt engine is the one to save
+        if self.engine is None:
+            raise RuntimeError('The engine could not be rebuilt, there is no engine to save.')
         state_dict[prefix + 'engine'] = bytearray(self.engine.serialize())
         state_dict[prefix + 'input_names'] = self.input_names
         state_dict[prefix + 'output_names'] = self.output_names
+        state_dict[prefix + 'refit_map'] = self.refit_map
+        state_dict[prefix + 'metadata'] = self.metadata
+        if self.rebuild_source is not None:
+            state_dict[prefix + 'rebuild_source'] = self.rebuild_source
 
     def _load_from_state_dict(self, state_dict, prefix, local_metadata, strict, missing_keys, unexpected_keys, error_msgs):
         engine_bytes = state_dict[prefix + 'engine']
 
-        with trt.Logger() as logger, trt.Runtime(logger) as runtime:
-            self.engine = runtime.deserialize_cuda_engine(engine_bytes)
-            self.context = self.engine.create_execution_context()
-
         self.input_names = state_dict[prefix + 'input_names']
         self.output_names = state_dict[prefix + 'output_names']
+        self.refit_map = state_dict.get(prefix + 'refit_map', None)
+        self.metadata = state_dict.get(prefix + 'metadata', {})
+        self.rebuild_source = state_dict.get(prefix + 'rebuild_source', None)
+
+        problems = check_compatibility(self.metadata)
+        if len(problems) == 0:
+            with trt.Logger() as logger, trt.Runtime(logger) as runtime:
+                self.engine = runtime.deserialize_cuda_engine(engine_bytes)
+            if self.engine is not None:
+                self._create_context()
+                return
+            # e.g. engines saved without metadata by another TensorRT version
+            problems = ['TensorRT failed to deserialize it']
+
+        if self.rebuild_source is None:
+            raise RuntimeError('The engine can not run here (%s), and it was saved without rebuild_source.' % ', '.join(problems))
+        print('Warning: the engine can not run here (%s), rebuilding it in the background.' % ', '.join(problems))
+        self.engine = None
+        self.context = None
+        self.start_rebuild()
+
+    def start_rebuild(self):
+        """Rebuilds the engine from rebuild_source in a thread, the source module runs calls until it is done"""
+        source = self.rebuild_source
+
+        # the device this module is loaded on, e.g. the device of a TRTReplicaModule replica
+        device = self.arena.device if self.arena is not None else torch.device('cuda')
+        if device.index is None:
+            device = torch.device('cuda', torch.cuda.current_device())
+        module = source['module']
+        tensors = list(module.parameters()) + list(module.buffers())
+        if len(tensors) > 0 and tensors[0].device != device:
+            module = deepcopy(module).to(device)
+
+        fallback = module
+        specs = source['kwargs'].get('preprocess', None)
+        if specs is not None:
+            # callers pass the raw inputs of the engine
+            def fallback(*inputs):
+                inputs = [x if spec is None else preprocess_tensor(spec, x, shape[2:])
+                          for x, spec, (shape, dtype) in zip(inputs, specs, source['inputs'])]
+                return module(*inputs)
+        self.__dict__['fallback'] = fallback  # not a submodule, it is not part of the state
+
+        def rebuild():
+            try:
+                with torch.cuda.device(device):
+                    inputs = [torch.zeros(shape, dtype=dtype, device=device) for shape, dtype in source['inputs']]
+                    module_trt = torch2trt(module, inputs, **source['kwargs'])
+                    # calls still run the fallback, the context can be swapped first
+                    self._create_context(module_trt.engine)
+            except Exception as e:
+                print('Warning: engine rebuild failed (%s), calls keep running in PyTorch.' % e)
+                return
+            self.refit_map = module_trt.refit_map
+            self.metadata = module_trt.metadata
+            self.engine = module_trt.engine
+            self.fallback = None  # last, calls use the engine from here on
+
+        self.rebuild_thread = threading.Thread(target=rebuild, daemon=True)
+        self.rebuild_thread.start()
 
     def forward(self, *inputs):
+        if self.fallback is not None:
+            return self.fallback(*inputs)
+
         batch_size = inputs[0].shape[0]
         bindings = [None] * (len(self.input_names) + len(self.output_names))
 
@@ -391,25 +867,46 @@ class TRTModule(torch.nn.Module):
 
         # create output tensors
         outputs = [None] * len(self.output_names)
+        dtypes = [None] * len(self.output_names)
+        allocator = None
         for i, output_name in enumerate(self.output_names):
             idx = self.engine.get_binding_index(output_name)
             dtype = torch_dtype_from_trt(self.engine.get_binding_dtype(idx))
+            dtypes[i] = dtype
             if support_dynamic_shape:
                 shape = tuple(self.context.get_binding_shape(idx))
             else:
                 shape = (batch_size, ) + \
                     tuple(self.engine.get_binding_shape(idx))
             device = torch_device_from_trt(self.engine.get_location(idx))
+            if any(size < 0 for size in shape):
+                # data dependent shape, known once the engine ran
+                if not hasattr(trt, 'IOutputAllocator'):
+                    raise RuntimeError('Output %s has a data dependent shape, it needs TensorRT 8.5+' % output_name)
+                if allocator is None:
+                    allocator = OutputAllocator(device)
+                continue
             output = torch.empty(size=shape, dtype=dtype, device=device)
             outputs[i] = output
             bindings[idx] = output.data_ptr()
 
-        if support_dynamic_shape:
-            self.context.execute_async_v2(
-                bindings, torch.cuda.current_stream().cuda_stream)
+        if self.arena is not None:
+            with self.arena.reserve(self) as device_memory:
+                self.context.device_memory = device_memory
+                self._execute(batch_size, bindings, allocator)
         else:
-            self.context.execute_async(
-                batch_size, bindings, torch.cuda.current_stream().cuda_stream)
+            self._execute(batch_size, bindings, allocator)
+
+        if allocator is not None:
+            for i, output_name in enumerate(self.output_names):
+                if outputs[i] is None:
+                    outputs[i] = allocator.output(output_name, dtypes[i])
+
+        # TensorRT has no int64, e.g. indices come back as int32
+        output_dtypes = self.metadata.get('output_dtypes', None)
+        if output_dtypes is not None:
+            outputs = [output.long() if output.dtype == torch.int32 and dtype == 'torch.int64' else output
+                       for output, dtype in zip(outputs, output_dtypes)]
 
         outputs = tuple(outputs)
         if len(outputs) == 1:
@@ -417,10 +914,67 @@ class TRTModule(torch.nn.Module):
 
         return outputs
 
+    def _execute(self, batch_size, bindings, allocator=None):
+        if allocator is not None:
+            # only enqueueV3 allocates the outputs of data dependent shape, through the allocator
+            for idx, binding in enumerate(bindings):
+                name = self.engine.get_binding_name(idx)
+                if binding is None:
+                    self.context.set_output_allocator(name, allocator)
+                else:
+                    self.context.set_tensor_address(name, binding)
+            self.context.execute_async_v3(torch.cuda.current_stream().cuda_stream)
+        elif support_dynamic_shape:
+            self.context.execute_async_v2(
+                bindings, torch.cuda.current_stream().cuda_stream)
+        else:
+            self.context.execute_async(
+                batch_size, bindings, torch.cuda.current_stream().cuda_stream)
+
     def enable_profiling(self):
         if not self.context.profiler:
             self.context.profiler = trt.Profiler()
 
+    def refit_from(self, module):
+        """Updates the engine weights from a module with the same topology, without rebuilding"""
+        if self.refit_map is None:
+            raise RuntimeError('Engine was not built with refittable=True')
+
+        tensors = dict(module.named_parameters())
+        tensors.update(dict(module.named_buffers()))
+
+        logger = trt.Logger(trt.Logger.ERROR)
+        refitter = trt.Refitter(self.engine, logger)
+
+        changed = []
+        for entry in self.refit_map:
+            if entry['kind'] != 'baked':
+                continue
+            name = entry['params']['tensor']
+            if weight_checksum(tensors[name].detach().cpu().numpy()) != entry['attrs']['checksum']:
+                changed.append(name)
+        if len(changed) > 0:
+            raise RuntimeError('Weights %s are baked into the engine and changed, they can not be refit, '
+                               'rebuild the engine instead.' % ', '.join(changed))
+
+        # refitter only keeps pointers, arrays must outlive refit_cuda_engine
+        arrays = []
+        for entry in self.refit_map:
+            if entry['kind'] == 'baked':
+                continue
+            for role, array in refit_layer_weights(entry, tensors).items():
+                array = np.ascontiguousarray(array)
+                arrays.append(array)
+                refitter.set_weights(entry['layer'], role, array)
+
+        missing_layers, missing_roles = refitter.get_missing()
+        if len(missing_layers) > 0:
+            raise RuntimeError('Missing weights for refit: %s' % ', '.join(
+                '%s (%s)' % (layer, role) for layer, role in zip(missing_layers, missing_roles)))
+
+        if not refitter.refit_cuda_engine():
+            raise RuntimeError('Failed to refit engine')
+
 
 def torch2trt(module,
               inputs,
@@ -435,18 +989,64 @@ def torch2trt(module,
               keep_network=True,
               int8_mode=False,
               int8_calib_dataset=None,
-              int8_calib_algorithm=DEFAULT_CALIBRATION_ALGORITHM):
+              int8_calib_algorithm=DEFAULT_CALIBRATION_ALGORITHM,
+              refittable=False,
+              prefetch_weights=False,
+              optimize_network=False,
+              fold_batchnorm=False,
+              precision_overrides=None,
+              frontend='hooks',
+              meta_tracing=False,
+              timing_cache=None,
+              rebuild_source=None,
+              preprocess=None):
 
     inputs_in = inputs
 
+    if preprocess is not None:
+        assert support_dynamic_shape, 'preprocess needs explicit batch networks'
+        assert not int8_mode, 'int8 calibration is not supported with preprocess'
+        if isinstance(preprocess, dict):
+            preprocess = [preprocess]  # first input
+        preprocess = list(preprocess) + [None] * (len(inputs) - len(preprocess))
+        preprocess = [None if spec is None else normalize_preprocess_spec(spec) for spec in preprocess]
+
+    # arguments to build the same engine again on another machine
+    rebuild_kwargs = dict(
+        input_names=input_names, output_names=output_names, max_batch_size=max_batch_size,
+        fp16_mode=fp16_mode, max_workspace_size=max_workspace_size, opt_shape_param=opt_shape_param,
+        strict_type_constraints=strict_type_constraints, refittable=refittable,
+        optimize_network=optimize_network, fold_batchnorm=fold_batchnorm,
+        precision_overrides=precision_overrides, frontend=frontend,
+        preprocess=preprocess)
+    source_module = module
+
     # copy inputs to avoid modifications to source data
-    if support_dynamic_shape:
+    if meta_tracing:
+        inputs = meta_inputs(inputs)
+    elif support_dynamic_shape:
         inputs = [tensor.clone() for tensor in inputs]
     else:
         inputs = [tensor.clone()[0:1]
                   for tensor in inputs]  # only run single entry
 
-    logger = trt.Logger(log_level)
+    num_folded = 0
+    if fold_batchnorm:
+        if refittable:
+            print("fold_batchnorm is ignored for refittable engines.")
+        elif meta_tracing:
+            print("fold_batchnorm is ignored with meta_tracing.")
+        else:
+            module, num_folded = fold_batchnorm_modules(module, [tensor.clone() for tensor in inputs])
+
+    graph_module = None
+    if frontend == 'fx':
+        from .fx_frontend import capture_graph, convert_graph
+        graph_module = capture_graph(module, len(inputs))
+    else:
+        assert frontend == 'hooks', 'frontend must be "hooks" or "fx"'
+
+    logger = BuildLogger(log_level)
     builder = trt.Builder(logger)
     if support_dynamic_shape:
         EXPLICIT_BATCH = 1 << (int)(
@@ -455,30 +1055,72 @@ def torch2trt(module,
     else:
         network = builder.create_network()
 
-    with ShapeConverter(), ConversionContext(network) as ctx:
+    if graph_module is None:
+        shape_converter, converters = ShapeConverter(), CONVERTERS
+    else:
+        # the captured graph calls the converters, no method is patched
+        shape_converter, converters = nullcontext(), {}
+
+    with shape_converter, ConversionContext(network, converters=converters) as ctx:
+
+        ctx.stats['batchnorm_folded'] = num_folded
+
+        if refittable:
+            ctx.refittable = True
+            ctx.track_parameters(module)
+
+        if prefetch_weights:
+            ctx.prefetch_weights(module)
+
+        module_handles = []
+        if precision_overrides:
+            for dtype in precision_overrides.values():
+                assert dtype in (torch.float32, torch.float16), 'Precision overrides must be torch.float32 or torch.float16'
+            ctx.precision_overrides = {key: torch_dtype_to_trt(dtype) for key, dtype in precision_overrides.items()}
+            if graph_module is None:
+                module_handles = ctx.track_modules(module)
 
         if isinstance(inputs, list):
             inputs = tuple(inputs)
         if not isinstance(inputs, tuple):
             inputs = (inputs, )
-        ctx.add_inputs(inputs, input_names, opt_shape_param)
+        ctx.add_inputs(inputs, input_names, opt_shape_param, preprocess)
 
-        outputs = module(*inputs)
+        runner = module if graph_module is None else graph_module
+        parameters = meta_parameters(ctx, runner) if meta_tracing else nullcontext()
+
+        try:
+            with parameters:
+                if graph_module is not None:
+                    outputs = convert_graph(ctx, graph_module, inputs)
+                else:
+                    outputs = module(*inputs)
+        finally:
+            for handle in module_handles:
+                handle.remove()
 
         if not isinstance(outputs, tuple) and not isinstance(outputs, list):
             outputs = (outputs, )
         ctx.mark_outputs(outputs, output_names)
 
+        if optimize_network:
+            ctx.network_graph = NetworkGraph(network)  # keeps rewritten weights alive until the build
+            ctx.stats.update(run_graph_passes(ctx.network_graph, refittable))
+
         torch.cuda.empty_cache()
 
-        builder.max_workspace_size = max_workspace_size
+        if precision_overrides:
+            # layer precisions are only obeyed with strict types, and fp16 layers need fp16 kernels
+            strict_type_constraints = True
+            fp16_mode = fp16_mode or torch.float16 in precision_overrides.values()
+
         builder.fp16_mode = fp16_mode
         builder.max_batch_size = max_batch_size
         builder.strict_type_constraints = strict_type_constraints
+        builder.refittable = refittable
 
         if support_dynamic_shape:
             config = builder.create_builder_config()
-            config.max_workspace_size = max_workspace_size
             profile = builder.create_optimization_profile()
 
             if input_names is None:
@@ -492,11 +1134,27 @@ def torch2trt(module,
                     opt_shape = tuple(input_tensor.shape)
                     min_shape = opt_shape
                     max_shape = opt_shape
+                if preprocess is not None and preprocess[input_index] is not None:
+                    spec = preprocess[input_index]
+                    min_shape, opt_shape, max_shape = [raw_input_shape(spec, shape) for shape in (min_shape, opt_shape, max_shape)]
                 profile.set_shape(
                     input_names[input_index], min_shape, opt_shape, max_shape)
             config.add_optimization_profile(profile)
             if fp16_mode:
                 config.set_flag(trt.BuilderFlag.FP16)
+            if strict_type_constraints:
+                config.set_flag(trt.BuilderFlag.STRICT_TYPES)
+            if refittable:
+                config.set_flag(trt.BuilderFlag.REFIT)
+
+            if timing_cache is not None and not timing_cache_supported(config):
+                print("timing_cache needs TensorRT 8 or newer, it is ignored.")
+                timing_cache = None
+            if timing_cache is not None:
+                load_timing_cache(config, timing_cache)
+        elif timing_cache is not None:
+            print("timing_cache is ignored without dynamic shape support.")
+            timing_cache = None
 
     if int8_mode:
 
@@ -504,34 +1162,84 @@ def torch2trt(module,
         if int8_calib_dataset is None:
             int8_calib_dataset = TensorBatchDataset(inputs_in)
 
+        # the calibration buffers are allocated like the inputs passed in, inputs may be meta stand-ins
+        if any(tensor.is_meta for tensor in inputs_in):
+            raise RuntimeError('int8_mode needs inputs on the GPU for calibration, not meta tensors.')
+
         if support_dynamic_shape:
             config.set_flag(trt.BuilderFlag.INT8)
             config.int8_calibrator = DatasetCalibrator(
-                inputs, int8_calib_dataset, batch_size=1, algorithm=int8_calib_algorithm)
+                inputs_in, int8_calib_dataset, batch_size=1, algorithm=int8_calib_algorithm)
         else:
             builder.int8_mode = True
             # @TODO(jwelsh):  Should we set batch_size=max_batch_size?  Need to investigate memory consumption
             builder.int8_calibrator = DatasetCalibrator(
-                inputs, int8_calib_dataset, batch_size=1, algorithm=int8_calib_algorithm)
+                inputs_in, int8_calib_dataset, batch_size=1, algorithm=int8_calib_algorithm)
 
-    if support_dynamic_shape:
-        engine = builder.build_engine(network, config)
-    else:
-        engine = builder.build_cuda_engine(network)
+    if not support_dynamic_shape:
+        config = None
 
-    module_trt = TRTModule(engine, ctx.input_names, ctx.output_names)
+    description = 'fp16_mode=%s, int8_mode=%s, refittable=%s, %d layers' % (
+        fp16_mode, int8_mode, refittable, network.num_layers)
+    t0 = time.time()
+    engine, workspace = build_engine(
+        builder, network, config, workspace_candidates(max_workspace_size), description, logger.errors)
+    ctx.stats['build_seconds'] = time.time() - t0
+
+    if timing_cache is not None and engine is not None:
+        save_timing_cache(config, timing_cache)
+
+    if refittable:
+        ctx.add_baked_parameters()
+    refit_map = ctx.refit_map if refittable else None
+    module_trt = TRTModule(engine, ctx.input_names, ctx.output_names, refit_map)
 
     if keep_network:
         module_trt.network = network
 
+    module_trt.conversion_stats = ctx.stats
+
+    if opt_shape_param is not None:
+        profiles = [[list(shape) for shape in param] for param in opt_shape_param]
+    else:
+        profiles = [[list(tensor.shape)] * 3 for tensor in inputs]
+    builder_flags = {
+        'fp16_mode': fp16_mode,
+        'int8_mode': int8_mode,
+        'strict_type_constraints': strict_type_constraints,
+        'refittable': refittable,
+        'max_batch_size': max_batch_size,
+    }
+    module_trt.metadata.update(build_metadata(builder_flags, profiles))
+    module_trt.metadata['max_workspace_size'] = workspace
+    module_trt.metadata['output_dtypes'] = ctx.output_dtypes
+    if preprocess is not None:
+        module_trt.metadata['preprocess'] = [None if spec is None else preprocess_metadata(spec) for spec in preprocess]
+
+    if rebuild_source is not None:
+        assert rebuild_source in ('module', 'fx'), 'rebuild_source must be "module" or "fx"'
+        if int8_mode:
+            print("Engines rebuilt from rebuild_source are not calibrated for int8.")
+        if rebuild_source == 'fx':
+            from .fx_frontend import capture_graph
+            graph_module = capture_graph(source_module, len(inputs_in))
+            if graph_module is not None:
+                source_module = graph_module
+        module_trt.rebuild_source = {
+            'module': source_module,
+            'inputs': [(tuple(tensor.shape), tensor.dtype) for tensor in inputs_in],
+            'kwargs': rebuild_kwargs,
+        }
+
     return module_trt
 
 
 # DEFINE ALL CONVERSION FUNCTIONS
 
 
-def tensorrt_converter(method, is_real=True):
+def tensorrt_converter(method, is_real=True, is_supported=None):
+    """Registers converter for method, is_supported(ctx) tells if a call can be converted without building it"""
     def register_converter(converter):
-        CONVERTERS[method] = {'converter': converter, 'is_real': is_real}
+        CONVERTERS[method] = {'converter': converter, 'is_real': is_real, 'is_supported': is_supported}
         return converter
     return register_converter
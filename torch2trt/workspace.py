@@ -0,0 +1,106 @@
+import re
+import numbers
+import torch
+
+
+# 'auto' starts at half of the free device memory, capped, and divides by WORKSPACE_BACKOFF on failure
+AUTO_WORKSPACE_MAX = 1 << 32
+AUTO_WORKSPACE_MIN = 1 << 24
+WORKSPACE_BACKOFF = 4
+
+# only builds that failed for lack of memory are retried with a smaller workspace
+OUT_OF_MEMORY = re.compile(
+    r'out of memory|insufficient (workspace|memory)|could not be allocated|memory allocation', re.IGNORECASE)
+
+
+def free_device_memory():
+    if hasattr(torch.cuda, 'mem_get_info'):
+        return torch.cuda.mem_get_info()[0]
+    props = torch.cuda.get_device_properties(torch.cuda.current_device())
+    return props.total_memory - torch.cuda.memory_reserved()
+
+
+def workspace_candidates(policy, free_memory=None):
+    """Returns the workspace sizes to try for a policy, largest first.
+
+    policy is a size in bytes, a fraction of the free device memory, or 'auto'.
+
+    >>> workspace_candidates(1 << 20)
+    [1048576]
+    >>> import numpy as np
+    >>> workspace_candidates(np.int64(1 << 20))
+    [1048576]
+    >>> workspace_candidates(0.5, free_memory=1 << 30)
+    [536870912]
+    >>> workspace_candidates('auto', free_memory=1 << 28)
+    [134217728, 33554432, 0]
+    >>> workspace_candidates(True)
+    Traceback (most recent call last):
+    ...
+    AssertionError: max_workspace_size must be a size in bytes, a fraction of free memory or "auto", not True
+    """
+    assert not isinstance(policy, bool), \
+        'max_workspace_size must be a size in bytes, a fraction of free memory or "auto", not %s' % policy
+    if isinstance(policy, numbers.Integral):
+        return [int(policy)]
+
+    if free_memory is None:
+        free_memory = free_device_memory()
+
+    if isinstance(policy, numbers.Real):
+        assert 0.0 < policy <= 1.0, 'A workspace fraction must be in (0, 1]'
+        return [int(policy * free_memory)]
+
+    assert policy == 'auto', 'max_workspace_size must be a size in bytes, a fraction of free memory or "auto"'
+    workspaces = []
+    workspace = min(free_memory // 2, AUTO_WORKSPACE_MAX)
+    while workspace >= AUTO_WORKSPACE_MIN:
+        workspaces.append(workspace)
+        workspace //= WORKSPACE_BACKOFF
+    return workspaces + [0]
+
+
+def build_engine(builder, network, config, workspaces, description=None, errors=None):
+    """Builds the engine with each workspace size in turn while the builds run out of memory.
+
+    config is None for implicit batch networks. errors is the list the builder's logger
+    appends its error messages to, they tell an out of memory tactic failure from any other.
+    Returns the engine and the workspace size it was built with, raises a RuntimeError
+    listing the attempts at the first failure that is not out of memory or if all fail.
+    """
+    attempts = []
+    for workspace in workspaces:
+        builder.max_workspace_size = workspace
+        num_errors = len(errors) if errors is not None else 0
+        out_of_memory = False
+        try:
+            if config is not None:
+                config.max_workspace_size = workspace
+                engine = builder.build_engine(network, config)
+            else:
+                engine = builder.build_cuda_engine(network)
+            reason = 'build returned None'
+        except MemoryError as e:
+            engine = None
+            reason = '%s: %s' % (type(e).__name__, e)
+            out_of_memory = True
+        except RuntimeError as e:
+            engine = None
+            reason = '%s: %s' % (type(e).__name__, e)
+
+        if engine is not None:
+            return engine, workspace
+
+        if errors is not None and len(errors) > num_errors:
+            reason += ': ' + '; '.join(errors[num_errors:])
+        out_of_memory = out_of_memory or OUT_OF_MEMORY.search(reason) is not None
+
+        attempts.append('workspace %d bytes (%s)' % (workspace, reason))
+        if not out_of_memory or workspace == workspaces[-1]:
+            break
+        print('Warning: engine build with workspace %d bytes failed (%s), retrying.' % (workspace, reason))
+
+    message = 'Failed to build the TensorRT engine'
+    if description is not None:
+        message += ' (%s)' % description
+    raise RuntimeError(message + '. Attempts: ' + ', '.join(attempts))